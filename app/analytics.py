@@ -0,0 +1,252 @@
+"""Computes statistics over a client's Cogspeed tests.
+
+The metrics of a client's tests are fetched as columns in one query and every
+statistic is computed with vectorised NumPy, so the dashboard and other
+consumers share one implementation instead of each reimplementing it.
+"""
+
+import math
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+from scipy import stats
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models import CogspeedTestResultModel
+from app.schemas import CogspeedTestResult
+from app.singleflight import single_flight
+from app.summary import TIME_OF_DAY
+from app.utils import parse_test_date
+
+__all__ = [
+    "METRICS",
+    "TIME_OF_DAY_BUCKETS",
+    "fetch_columns",
+    "downsample",
+    "hours_of_day",
+    "lttb",
+    "nullable",
+    "parse_dates",
+    "rolling",
+    "shared_columns",
+    "slope_per_day",
+    "time_of_day_stats",
+]
+
+# The numeric result fields which can be analysed
+METRICS = tuple(
+    name
+    for name, field in CogspeedTestResultModel.model_fields.items()
+    if field.annotation in (int, float) and name != "status_code"
+)
+
+TIME_OF_DAY_BUCKETS = (*TIME_OF_DAY, "night")
+
+_DAY = np.timedelta64(1, "D")
+
+
+async def fetch_columns(
+    session: AsyncSession,
+    client_id: str,
+    metrics: Sequence[str],
+    since: str | None = None,
+    until: str | None = None,
+) -> tuple[list[str], np.ndarray, dict[str, np.ndarray]]:
+    """Returns the dates and metrics of the client's tests, ordered by date.
+
+    Dates are returned both as stored and parsed to datetime64 in UTC, NaT
+    where a date is not ISO 8601.
+    """
+    query = (
+        select(
+            CogspeedTestResult.date,
+            *(getattr(CogspeedTestResult, metric) for metric in metrics),
+        )
+        .where(CogspeedTestResult.client_id == client_id)
+        .order_by(CogspeedTestResult.date, CogspeedTestResult.id)
+    )
+    if since is not None:
+        query = query.where(CogspeedTestResult.date >= since)
+    if until is not None:
+        query = query.where(CogspeedTestResult.date < until)
+
+    rows = (await session.execute(query)).all()
+    columns = list(zip(*rows)) or [()] * (len(metrics) + 1)
+    values = {
+        metric: np.asarray(column, dtype=np.float64)
+        for metric, column in zip(metrics, columns[1:])
+    }
+    dates = list(columns[0])
+    return dates, parse_dates(dates), values
+
+
+async def shared_columns(
+    session_factory: async_sessionmaker[AsyncSession],
+    client_id: str,
+    metrics: Sequence[str],
+    since: str | None = None,
+    until: str | None = None,
+) -> tuple[list[str], np.ndarray, dict[str, np.ndarray]]:
+    """Like `fetch_columns`, but concurrent identical calls share one query.
+
+    The result is shared between the callers, so it must not be modified.
+    """
+
+    async def fetch() -> tuple[list[str], np.ndarray, dict[str, np.ndarray]]:
+        async with session_factory() as session:
+            return await fetch_columns(session, client_id, metrics, since, until)
+
+    key = ("analytics", client_id, tuple(metrics), since, until)
+    return await single_flight.do(key, fetch)
+
+
+def parse_dates(dates: Iterable[str]) -> np.ndarray:
+    """Parses ISO 8601 dates into datetime64[ms], in UTC."""
+    dates = list(dates)
+    try:
+        # The app sends UTC dates ending in Z, which NumPy parses in one call
+        return np.array([d.removesuffix("Z") for d in dates], dtype="datetime64[ms]")
+    except ValueError:
+        parsed = [parse_test_date(d) for d in dates]
+        return np.array(
+            [np.datetime64("NaT") if d is None else d for d in parsed],
+            dtype="datetime64[ms]",
+        )
+
+
+def hours_of_day(dates: np.ndarray) -> np.ndarray:
+    """Returns the hour of each date, -1 for NaT."""
+    hours = dates.astype("datetime64[h]") - dates.astype("datetime64[D]")
+    return np.where(np.isnat(dates), -1, hours.astype(np.int64))
+
+
+def time_of_day_stats(
+    dates: np.ndarray, values: np.ndarray, confidence: float = 0.95
+) -> list[dict[str, Any]]:
+    """Returns the count, mean, standard deviation and confidence interval
+    half-width of the values in each time of day bucket.
+    """
+    hours = hours_of_day(dates)
+    conditions = [np.isin(hours, list(r)) for r in TIME_OF_DAY.values()]
+    conditions.append(hours >= 0)
+    bucket = np.select(conditions, np.arange(len(conditions)), default=-1)
+
+    valid = (bucket >= 0) & ~np.isnan(values)
+    bucket, values = bucket[valid], values[valid]
+    size = len(TIME_OF_DAY_BUCKETS)
+
+    counts = np.bincount(bucket, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.bincount(bucket, weights=values, minlength=size) / counts
+        m2 = np.bincount(bucket, weights=(values - means[bucket]) ** 2, minlength=size)
+        std = np.sqrt(m2 / (counts - 1))
+        t = stats.t.ppf((1 + confidence) / 2, counts - 1)
+        ci = t * std / np.sqrt(counts)
+
+    # Means need one test, the spread two
+    means[counts < 1] = np.nan
+    std[counts < 2] = ci[counts < 2] = np.nan
+    return [
+        {"bucket": name, "count": int(count), "mean": mean, "std": s, "ci": h}
+        for name, count, mean, s, h in zip(
+            TIME_OF_DAY_BUCKETS,
+            counts.tolist(),
+            nullable(means),
+            nullable(std),
+            nullable(ci),
+        )
+    ]
+
+
+def rolling(values: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the rolling mean and standard deviation over `window` tests.
+
+    The first `window - 1` entries are NaN.
+    """
+    mean = np.full(len(values), np.nan)
+    std = np.full(len(values), np.nan)
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        mean[window - 1 :] = windows.mean(axis=1)
+        if window > 1:
+            std[window - 1 :] = windows.std(axis=1, ddof=1)
+    return mean, std
+
+
+def slope_per_day(dates: np.ndarray, values: np.ndarray) -> float | None:
+    """Returns the least squares slope of the values over time, per day."""
+    valid = ~np.isnat(dates) & ~np.isnan(values)
+    if valid.sum() < 2:
+        return None
+    days = (dates[valid] - dates[valid].min()) / _DAY
+    if np.ptp(days) == 0:
+        return None
+    slope, _ = np.polyfit(days, values[valid], 1)
+    return float(slope)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Returns the indexes of at most `threshold` points which preserve the
+    shape of a line, chosen by largest-triangle-three-buckets.
+
+    The first and last points are kept. The points in between are split into
+    `threshold - 2` buckets and from each the point forming the largest
+    triangle with the point kept from the previous bucket and the mean of the
+    next bucket is kept, which keeps peaks and troughs that sampling every nth
+    point would miss.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.intp) + 1
+    # Appending the last point makes it the next "bucket" of the last bucket
+    edges = np.append(edges, n)
+    indexes = np.empty(threshold, dtype=np.intp)
+    indexes[0], indexes[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_x = x[end : edges[i + 2]].mean()
+        next_y = y[end : edges[i + 2]]
+        next_y = next_y[~np.isnan(next_y)]
+        next_y = next_y.mean() if len(next_y) else y[a]
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        indexes[i + 1] = a
+    return indexes
+
+
+def downsample(
+    dates: np.ndarray, series: Iterable[np.ndarray], max_points: int | None
+) -> np.ndarray | None:
+    """Returns the indexes of at most `max_points` tests to keep, so each
+    series keeps the shape of its line, or None to keep all.
+
+    The points are split between the series and the points kept for each are
+    merged, so the series stay aligned. When there are too few points to give
+    every series three, they are all picked from the first series.
+    """
+    series = list(series)
+    if max_points is None or not series or len(series[0]) <= max_points:
+        return None
+    # Tests with an unparseable date are placed by their order instead
+    if np.isnat(dates).any():
+        x = np.arange(len(dates), dtype=np.float64)
+    else:
+        x = dates.astype(np.int64).astype(np.float64)
+    if (per_series := max_points // len(series)) < 3:
+        series, per_series = series[:1], max_points
+    return np.unique(np.concatenate([lttb(x, y, per_series) for y in series]))
+
+
+def nullable(values: np.ndarray) -> list[float | None]:
+    """Converts an array to a JSON friendly list, with NaN as None."""
+    return [None if math.isnan(value) else value for value in values.tolist()]
@@ -0,0 +1,173 @@
+"""Reads and writes the monthly archive files of old tests' rounds.
+
+Rounds are rarely read once a test is a few months old, but kept in the
+database they keep growing its indexes, VACUUM and backups. `archive_rounds`
+in app/rounds.py moves them into one file per month under
+`rounds_archive_dir`, and marks each test with its month in
+`cogspeed_test_results.rounds_archive`.
+
+An archive file holds the packed blob (see app/rounds.py) of each test's
+rounds, followed by an index of where each blob is:
+
+    header  magic "CRA", version, number of tests, offset of the index
+    blobs   the packed rounds of each test
+    index   for each test, its client ID, test ID, blob offset and length
+
+Files are memory mapped, so reading a test's rounds only pages in its blob,
+and never modified in place: archiving more tests of a month writes a new
+file which atomically replaces the old one.
+"""
+
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterator
+
+from app.config import settings
+
+__all__ = [
+    "ArchiveWriter",
+    "RoundsArchive",
+    "archive_path",
+    "open_archive",
+    "read_archived_blob",
+]
+
+MAGIC = b"CRA"
+VERSION = 1
+
+_HEADER = struct.Struct("<3sBIQ")  # magic, version, number of tests, index offset
+_LENGTH = struct.Struct("<H")
+_LOCATION = struct.Struct("<QI")  # blob offset and length
+
+ArchiveKey = tuple[str, str]  # client ID, test ID
+
+
+def archive_path(month: str) -> Path:
+    """Returns the path of the archive of a month, formatted as YYYY-MM."""
+    return Path(settings.rounds_archive_dir) / f"rounds-{month}.cra"
+
+
+class RoundsArchive:
+    """A memory mapped archive file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as file:
+            self.stat = os.fstat(file.fileno())
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = self._read_index()
+
+    def _read_index(self) -> dict[ArchiveKey, tuple[int, int]]:
+        magic, version, count, offset = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a rounds archive")
+
+        def read_string() -> str:
+            nonlocal offset
+            (length,) = _LENGTH.unpack_from(self._mmap, offset)
+            offset += _LENGTH.size
+            value = self._mmap[offset : offset + length].decode()
+            offset += length
+            return value
+
+        index: dict[ArchiveKey, tuple[int, int]] = {}
+        for _ in range(count):
+            key = read_string(), read_string()
+            index[key] = _LOCATION.unpack_from(self._mmap, offset)
+            offset += _LOCATION.size
+        return index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: ArchiveKey) -> bool:
+        return key in self._index
+
+    def get(self, client_id: str, test_id: str) -> memoryview | None:
+        """Returns the packed rounds of a test, without copying them."""
+        if (location := self._index.get((client_id, test_id))) is None:
+            return None
+        offset, length = location
+        return memoryview(self._mmap)[offset : offset + length]
+
+    def items(self) -> Iterator[tuple[ArchiveKey, memoryview]]:
+        for client_id, test_id in self._index:
+            yield (client_id, test_id), self.get(client_id, test_id)  # type: ignore
+
+
+class ArchiveWriter:
+    """Writes an archive file, which replaces `path` when the writer is closed
+    without an error.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._tmp_path = path.with_name(f".{path.name}.tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(bytes(_HEADER.size))
+        self._index: dict[ArchiveKey, tuple[int, int]] = {}
+
+    def add(self, client_id: str, test_id: str, blob: bytes | memoryview) -> None:
+        self._index[client_id, test_id] = self._file.tell(), len(blob)
+        self._file.write(blob)
+
+    def commit(self) -> None:
+        index_offset = self._file.tell()
+        for (client_id, test_id), location in self._index.items():
+            for value in (client_id.encode(), test_id.encode()):
+                self._file.write(_LENGTH.pack(len(value)) + value)
+            self._file.write(_LOCATION.pack(*location))
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(self._index), index_offset))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+# Open archives by month, reopened when the archive job replaces the file
+_archives: dict[str, RoundsArchive] = {}
+
+
+def open_archive(month: str) -> RoundsArchive | None:
+    path = archive_path(month)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        _archives.pop(month, None)
+        return None
+
+    archive = _archives.get(month)
+    if (
+        archive is None
+        or archive.path != path
+        or (archive.stat.st_ino, archive.stat.st_mtime_ns)
+        != (stat.st_ino, stat.st_mtime_ns)
+    ):
+        archive = _archives[month] = RoundsArchive(path)
+    return archive
+
+
+def read_archived_blob(month: str, client_id: str, test_id: str) -> memoryview | None:
+    """Returns the packed rounds of an archived test, or None if the archive
+    file of its month, or the test in it, is missing.
+    """
+    if (archive := open_archive(month)) is None:
+        return None
+    return archive.get(client_id, test_id)
@@ -0,0 +1,165 @@
+"""Takes online snapshots of the SQLite database and restores them.
+
+Copying `db.sqlite` while the API, the dashboard and sqlite-web have it open
+can produce a corrupt copy, so snapshots are taken with SQLite's online backup
+API instead. It copies `backup_pages_per_step` pages at a time and sleeps for
+`backup_step_sleep` seconds between steps, so each step only briefly holds a
+read lock and writers keep going; in WAL mode readers never block writers
+anyway.
+
+SQLite restarts a backup when another connection writes to the database
+during it. If that happens more than `backup_max_restarts` times, e.g. under
+constant ingestion, the backup is finished in a single step, which copies one
+consistent snapshot of the database.
+
+Snapshots are written to `backup_dir` as `db-<UTC time>.sqlite`, checked with
+`PRAGMA quick_check`, and only the newest `backup_keep` are kept.
+"""
+
+import datetime
+import logging
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+__all__ = [
+    "backup_database",
+    "database_path",
+    "list_snapshots",
+    "prune_snapshots",
+    "restore_database",
+]
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = "db-"
+SNAPSHOT_SUFFIX = ".sqlite"
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def database_path(url: str | None = None) -> Path:
+    """Returns the path of the SQLite file of a database URL."""
+    database = make_url(url or settings.database_url).database
+    if database in (None, "", ":memory:"):
+        raise ValueError("In-memory databases cannot be backed up")
+    return Path(database)
+
+
+def list_snapshots(backup_dir: Path) -> list[Path]:
+    """Returns the snapshots in `backup_dir`, oldest first."""
+    return sorted(backup_dir.glob(f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}"))
+
+
+def prune_snapshots(backup_dir: Path, keep: int) -> list[Path]:
+    """Deletes all but the newest `keep` snapshots. Returns the deleted ones."""
+    snapshots = list_snapshots(backup_dir)
+    deleted = snapshots[: max(len(snapshots) - keep, 0)]
+    for snapshot in deleted:
+        snapshot.unlink()
+    return deleted
+
+
+def _copy(
+    source: sqlite3.Connection,
+    target: sqlite3.Connection,
+    pages: int,
+    sleep: float,
+    max_restarts: int,
+) -> None:
+    restarts = 0
+    last_remaining: int | None = None
+
+    def progress(_status: int, remaining: int, _total: int) -> None:
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > max_restarts:
+                raise _TooManyRestarts
+        last_remaining = remaining
+        if remaining:
+            # Lets writers take the lock between steps
+            time.sleep(sleep)
+
+    try:
+        source.backup(target, pages=pages, progress=progress)
+    except _TooManyRestarts:
+        logger.info("Backup restarted %d times, copying in one step", restarts)
+        source.backup(target, pages=-1)
+
+
+def backup_database(
+    source: Path | None = None,
+    backup_dir: Path | None = None,
+    keep: int | None = None,
+    pages: int | None = None,
+    sleep: float | None = None,
+    max_restarts: int | None = None,
+) -> Path:
+    """Takes a snapshot of the database, prunes old snapshots, and returns the
+    path of the new one.
+    """
+    source = source or database_path()
+    backup_dir = Path(backup_dir or settings.backup_dir)
+    keep = settings.backup_keep if keep is None else keep
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    name = f"{now:%Y%m%dT%H%M%S}{now.microsecond // 1000:03d}Z"
+    path = backup_dir / f"{SNAPSHOT_PREFIX}{name}{SNAPSHOT_SUFFIX}"
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    backup_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    try:
+        with closing(sqlite3.connect(f"{source.as_uri()}?mode=ro", uri=True)) as src:
+            src.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout}")
+            with closing(sqlite3.connect(tmp_path)) as target:
+                _copy(
+                    src,
+                    target,
+                    pages=pages or settings.backup_pages_per_step,
+                    sleep=settings.backup_step_sleep if sleep is None else sleep,
+                    max_restarts=(
+                        settings.backup_max_restarts
+                        if max_restarts is None
+                        else max_restarts
+                    ),
+                )
+                # Snapshots are standalone files, without a WAL to go with them
+                target.execute("PRAGMA journal_mode=DELETE")
+                (check,) = target.execute("PRAGMA quick_check").fetchone()
+                if check != "ok":
+                    raise sqlite3.DatabaseError(f"The snapshot is corrupt: {check}")
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    logger.info(
+        "Backed up %s to %s in %.1fs", source, path, time.perf_counter() - started
+    )
+    prune_snapshots(backup_dir, keep)
+    return path
+
+
+def restore_database(snapshot: Path, target: Path | None = None) -> None:
+    """Replaces the contents of the database with a snapshot.
+
+    The restore runs in one step, which locks the database until it is done.
+    Stop the API first, as its in-process caches would otherwise serve data
+    from before the restore.
+    """
+    target = target or database_path()
+    with closing(sqlite3.connect(f"{snapshot.as_uri()}?mode=ro", uri=True)) as src:
+        (check,) = src.execute("PRAGMA quick_check").fetchone()
+        if check != "ok":
+            raise sqlite3.DatabaseError(f"The snapshot is corrupt: {check}")
+        with closing(sqlite3.connect(target)) as dst:
+            dst.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout}")
+            src.backup(dst, pages=-1)
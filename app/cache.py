@@ -0,0 +1,182 @@
+"""Implements the in-process caches used by the app."""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.schemas import Client
+
+__all__ = ["ByteLRUCache", "TTLCache", "on_client_changed"]
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+F = TypeVar("F", bound=Callable[[str], Any])
+
+_client_invalidators: list[Callable[[str], Any]] = []
+
+
+def on_client_changed(invalidate: F) -> F:
+    """Registers a function to call with the ID of every client updated or
+    deleted through the ORM, to drop what the caches hold about the client.
+
+    The functions are called once the change is committed. Before that, other
+    requests still read the old row and could cache it again.
+    """
+    _client_invalidators.append(invalidate)
+    return invalidate
+
+
+@event.listens_for(Client, "after_update")
+@event.listens_for(Client, "after_delete")
+def _record_changed_client(_mapper, _connection, target: Client) -> None:
+    if (session := object_session(target)) is not None:
+        session.info.setdefault("changed_clients", set()).add(target.client_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_clients(session: Session) -> None:
+    for client_id in session.info.pop("changed_clients", ()):
+        for invalidate in _client_invalidators:
+            invalidate(client_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_clients(session: Session) -> None:
+    session.info.pop("changed_clients", None)
+
+
+class TTLCache(Generic[K, V]):
+    """A bounded LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        entry = self._data.pop(key, None)
+        return None if entry is None else entry[1]
+
+    def invalidate(self, predicate: Callable[[K], bool]) -> int:
+        """Removes every entry whose key matches the predicate."""
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class ByteLRUCache(Generic[K, V]):
+    """An LRU cache bounded by the total size of its values in bytes.
+
+    Keys are tuples whose first item names a group, e.g. a client ID, so every
+    entry of a group can be dropped at once. Every drop bumps the group's
+    generation, which lets a writer detect that the group changed while it was
+    computing a value and skip caching a stale one. Entries also expire after
+    `ttl` seconds.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, int, V]] = OrderedDict()
+        self._groups: dict[Hashable, set[K]] = {}
+        self._generations: dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def generation(self, group: Hashable) -> int:
+        return self._generations.get(group, 0)
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: K, value: V, size: int, generation: int | None = None) -> None:
+        """Caches a value, unless its group changed since `generation`."""
+        group = key[0]  # type: ignore[index]
+        if generation is not None and generation != self.generation(group):
+            return
+        if size > self.max_bytes:
+            return
+
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self._groups.setdefault(group, set()).add(key)
+        self.size += size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._data)))
+
+    def invalidate_group(self, group: Hashable) -> int:
+        """Removes every entry of the group. Returns the number removed."""
+        self._generations[group] = self.generation(group) + 1
+        keys = self._groups.pop(group, set())
+        for key in keys:
+            self.size -= self._data.pop(key)[1]
+        return len(keys)
+
+    def _remove(self, key: K) -> None:
+        self.size -= self._data.pop(key)[1]
+        group = key[0]  # type: ignore[index]
+        keys = self._groups[group]
+        keys.discard(key)
+        if not keys:
+            del self._groups[group]
+
+    def clear(self) -> None:
+        for group in list(self._groups):
+            self.invalidate_group(group)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
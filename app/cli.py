@@ -0,0 +1,160 @@
+"""Implements maintenance commands for the database.
+
+python -m app.cli pack-rounds
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from app.backup import backup_database, list_snapshots, restore_database
+from app.config import settings
+from app.database import AsyncSessionLocal, create_db_and_tables, engine
+from app.norms import rebuild_norms
+from app.rounds import archive_rounds, pack_stored_rounds, unpack_stored_rounds
+from app.summary import rebuild_summaries
+
+
+async def pack_rounds_command(args: argparse.Namespace) -> None:
+    await create_db_and_tables()
+    count = await pack_stored_rounds(AsyncSessionLocal, chunk_size=args.chunk_size)
+    print(f"Packed the rounds of {count} tests.")
+
+
+async def unpack_rounds_command(args: argparse.Namespace) -> None:
+    await create_db_and_tables()
+    count = await unpack_stored_rounds(AsyncSessionLocal, chunk_size=args.chunk_size)
+    print(f"Unpacked the rounds of {count} tests.")
+
+
+async def archive_rounds_command(args: argparse.Namespace) -> None:
+    await create_db_and_tables()
+    # created_at is stored in UTC, without a timezone
+    before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+        days=args.older_than_days
+    )
+    count = await archive_rounds(AsyncSessionLocal, before, chunk_size=args.chunk_size)
+    print(f"Archived the rounds of {count} tests to {settings.rounds_archive_dir}.")
+
+    if args.vacuum:
+        # Returns the freed pages to the file system, VACUUM cannot run in a
+        # transaction
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.exec_driver_sql("VACUUM")
+        print("Vacuumed the database.")
+
+
+async def backup_command(args: argparse.Namespace) -> None:
+    while True:
+        try:
+            path = await asyncio.to_thread(backup_database, keep=args.keep)
+            print(f"Backed up the database to {path}.")
+        except Exception:
+            if not args.schedule:
+                raise
+            logging.exception("Backing up the database failed")
+        if not args.schedule:
+            return
+        await asyncio.sleep(args.interval)
+
+
+async def restore_command(args: argparse.Namespace) -> None:
+    snapshot = args.snapshot
+    if snapshot is None:
+        if not (snapshots := list_snapshots(Path(settings.backup_dir))):
+            raise SystemExit(f"There are no snapshots in {settings.backup_dir}")
+        snapshot = snapshots[-1]
+    await asyncio.to_thread(restore_database, snapshot)
+    print(f"Restored the database from {snapshot}.")
+
+
+async def rebuild_summary_command(args: argparse.Namespace) -> None:
+    await create_db_and_tables()
+    count = await rebuild_summaries(AsyncSessionLocal, chunk_size=args.chunk_size)
+    print(f"Rebuilt the summaries from {count} tests.")
+
+
+async def rebuild_norms_command(args: argparse.Namespace) -> None:
+    await create_db_and_tables()
+    count = await rebuild_norms(AsyncSessionLocal, chunk_size=args.chunk_size)
+    print(f"Rebuilt the norms from {count} tests.")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(required=True)
+
+    pack = commands.add_parser(
+        "pack-rounds", help="Move rounds stored as rows into packed blobs."
+    )
+    pack.add_argument("--chunk-size", type=int, default=500)
+    pack.set_defaults(command=pack_rounds_command)
+
+    unpack = commands.add_parser(
+        "unpack-rounds", help="Move packed rounds back into rows."
+    )
+    unpack.add_argument("--chunk-size", type=int, default=500)
+    unpack.set_defaults(command=unpack_rounds_command)
+
+    archive = commands.add_parser(
+        "archive-rounds",
+        help="Move the rounds of old tests into monthly archive files.",
+    )
+    archive.add_argument(
+        "--older-than-days", type=int, default=settings.rounds_archive_after_days
+    )
+    archive.add_argument("--chunk-size", type=int, default=500)
+    archive.add_argument(
+        "--vacuum", action="store_true", help="Shrink the database file afterwards."
+    )
+    archive.set_defaults(command=archive_rounds_command)
+
+    backup = commands.add_parser(
+        "backup",
+        help="Take an online snapshot of the database, without stopping the API.",
+    )
+    backup.add_argument(
+        "--schedule",
+        action="store_true",
+        help="Keep taking a snapshot every --interval seconds.",
+    )
+    backup.add_argument("--interval", type=float, default=settings.backup_interval)
+    backup.add_argument("--keep", type=int, default=settings.backup_keep)
+    backup.set_defaults(command=backup_command)
+
+    restore = commands.add_parser(
+        "restore",
+        help="Replace the database with a snapshot. Stop the API first.",
+    )
+    restore.add_argument(
+        "snapshot", type=Path, nargs="?", help="The newest snapshot by default."
+    )
+    restore.set_defaults(command=restore_command)
+
+    rebuild = commands.add_parser(
+        "rebuild-summary",
+        help="Recompute the per-client summaries from every stored test.",
+    )
+    rebuild.add_argument("--chunk-size", type=int, default=1000)
+    rebuild.set_defaults(command=rebuild_summary_command)
+
+    norms = commands.add_parser(
+        "rebuild-norms",
+        help="Recompute the population norms from every stored test.",
+    )
+    norms.add_argument("--chunk-size", type=int, default=1000)
+    norms.set_defaults(command=rebuild_norms_command)
+
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    asyncio.run(args.command(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Implements the JSON codec used by the hot routes.
+
+FastAPI parses request bodies with `json.loads` and then validates the
+resulting Python objects, and re-validates response models before
+serialising them. The hot routes instead validate the raw body bytes and
+serialise response models straight to bytes, using the codec selected by
+`CEREBRUM_JSON_CODEC`:
+
+* ``pydantic`` parses and serialises in pydantic-core without building
+  intermediate Python objects (the default).
+* ``orjson`` parses and serialises with orjson, if it is installed.
+* ``stdlib`` uses the `json` module, as FastAPI does.
+
+Every codec produces the same bytes as FastAPI's default response path.
+"""
+
+import json
+from functools import lru_cache
+from typing import Any, Callable, Mapping, Protocol
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+from app.compression import read_body
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+__all__ = [
+    "CODECS",
+    "ModelResponse",
+    "get_codec",
+    "json_body",
+    "json_body_openapi",
+    "openapi_schemas",
+]
+
+
+class JSONCodec(Protocol):
+    def decode(self, body: bytes, adapter: TypeAdapter[Any]) -> Any: ...
+
+    def encode(self, value: Any, adapter: TypeAdapter[Any]) -> bytes: ...
+
+
+class PydanticCodec:
+    def decode(self, body: bytes, adapter: TypeAdapter[Any]) -> Any:
+        return adapter.validate_json(body)
+
+    def encode(self, value: Any, adapter: TypeAdapter[Any]) -> bytes:
+        return adapter.dump_json(value, by_alias=True)
+
+
+class ORJSONCodec:
+    def decode(self, body: bytes, adapter: TypeAdapter[Any]) -> Any:
+        try:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Let pydantic report the error in its usual format
+            return adapter.validate_json(body)
+        return adapter.validate_python(data)
+
+    def encode(self, value: Any, adapter: TypeAdapter[Any]) -> bytes:
+        return orjson.dumps(adapter.dump_python(value, mode="json", by_alias=True))
+
+
+class StdlibCodec:
+    def decode(self, body: bytes, adapter: TypeAdapter[Any]) -> Any:
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError:
+            return adapter.validate_json(body)
+        return adapter.validate_python(data)
+
+    def encode(self, value: Any, adapter: TypeAdapter[Any]) -> bytes:
+        data = adapter.dump_python(value, mode="json", by_alias=True)
+        return json.dumps(
+            data, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode()
+
+
+CODECS: dict[str, JSONCodec] = {"pydantic": PydanticCodec(), "stdlib": StdlibCodec()}
+if orjson is not None:
+    CODECS["orjson"] = ORJSONCodec()
+
+
+def get_codec(name: str | None = None) -> JSONCodec:
+    name = name or settings.json_codec
+    if name not in CODECS:
+        raise RuntimeError(f"The {name!r} JSON codec is not available")
+    return CODECS[name]
+
+
+@lru_cache(maxsize=None)
+def get_adapter(tp: Any) -> TypeAdapter[Any]:
+    return TypeAdapter(tp)
+
+
+def json_body(tp: Any) -> Callable[[Request], Any]:
+    """Returns a dependency which validates the raw request body as `tp`.
+
+    The body may be compressed, see app/compression.py. Validation errors are
+    raised as the same 422 response FastAPI produces.
+    """
+    adapter = get_adapter(tp)
+
+    async def dependency(request: Request) -> Any:
+        body = await read_body(request)
+        try:
+            return get_codec().decode(body, adapter)
+        except ValidationError as e:
+            errors = [
+                {**error, "loc": ("body", *error["loc"])}
+                for error in e.errors(include_url=False)
+            ]
+            raise RequestValidationError(errors, body=body) from None
+
+    return dependency
+
+
+# Schemas referenced by `json_body_openapi`, merged into the OpenAPI components
+openapi_schemas: dict[str, Any] = {}
+
+
+def json_body_openapi(tp: Any) -> dict[str, Any]:
+    """Returns the `openapi_extra` documenting a `json_body` request body."""
+    schema = get_adapter(tp).json_schema(
+        by_alias=True, ref_template="#/components/schemas/{model}"
+    )
+    openapi_schemas.update(schema.pop("$defs", {}))
+    if "title" in schema and schema.get("type") == "object":
+        openapi_schemas[schema["title"]] = schema
+        schema = {"$ref": f"#/components/schemas/{schema['title']}"}
+
+    return {
+        "requestBody": {
+            "content": {"application/json": {"schema": schema}},
+            "required": True,
+        }
+    }
+
+
+class ModelResponse(Response):
+    """Serialises a pydantic model, or a list of them, straight to JSON bytes."""
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+        tp: Any = None,
+    ) -> None:
+        if tp is None:
+            tp = type(content) if isinstance(content, BaseModel) else Any
+        self.adapter = get_adapter(tp)
+        super().__init__(content, status_code, headers, self.media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        return get_codec().encode(content, self.adapter)
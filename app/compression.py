@@ -0,0 +1,301 @@
+"""Compresses response bodies and decompresses request bodies.
+
+Uploads may be sent with `Content-Encoding: gzip`, or `zstd` if the
+`zstandard` package is installed. They are decompressed as they are read and
+rejected with a 413 as soon as they grow past `request_body_max_bytes`, so a
+small compressed body cannot expand into an unbounded one.
+
+`CompressionMiddleware` compresses responses of at least
+`compression_minimum_size` bytes, and every streamed response such as the
+exports, with the best encoding the client accepts. Streamed responses are
+flushed chunk by chunk so the client still receives them incrementally.
+"""
+
+import zlib
+from typing import Protocol
+
+from fastapi import HTTPException, Request, status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+__all__ = [
+    "CompressionMiddleware",
+    "negotiate_encoding",
+    "read_body",
+    "supported_encodings",
+]
+
+# Media types worth compressing, Parquet for example already is compressed
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class Decompressor(Protocol):
+    def decompress(self, data: bytes, max_length: int) -> bytes: ...
+
+    @property
+    def eof(self) -> bool: ...
+
+
+class GzipCompressor:
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class GzipDecompressor:
+    def __init__(self) -> None:
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        return self._decompressor.decompress(data, max_length)
+
+    @property
+    def eof(self) -> bool:
+        return self._decompressor.eof
+
+
+class ZstdCompressor:
+    def __init__(self, level: int) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class ZstdDecompressor:
+    def __init__(self) -> None:
+        # Bounds the memory a frame can ask for, as browsers do
+        self._decompressor = zstandard.ZstdDecompressor(
+            max_window_size=8 * 1024 * 1024
+        ).decompressobj()
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        # The decompression object has no output limit, so it is fed a little
+        # input at a time. 256 bytes expand to at most a few MiB.
+        output = bytearray()
+        for offset in range(0, len(data), 256):
+            if len(output) >= max_length:
+                break
+            output += self._decompressor.decompress(data[offset : offset + 256])
+        return bytes(output)
+
+    @property
+    def eof(self) -> bool:
+        return self._decompressor.eof
+
+
+def supported_encodings() -> list[str]:
+    """Returns the supported content encodings, most preferred first."""
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def _decompressor(encoding: str) -> Decompressor:
+    if encoding == "gzip":
+        return GzipDecompressor()
+    if encoding == "zstd" and zstandard is not None:
+        return ZstdDecompressor()
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail=f"Unsupported Content-Encoding {encoding!r}, "
+        f"expected one of {', '.join(supported_encodings())}",
+        headers={"Accept-Encoding": ", ".join(supported_encodings())},
+    )
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413, detail=f"The request body is larger than {max_size} bytes"
+    )
+
+
+async def read_body(request: Request, max_size: int | None = None) -> bytes:
+    """Reads the request body, decompressing it according to its
+    Content-Encoding, and raises a 413 once it exceeds `max_size` bytes.
+    """
+    max_size = max_size or settings.request_body_max_bytes
+    encoding = request.headers.get("content-encoding", "identity").strip().lower()
+
+    body = bytearray()
+    if encoding == "identity":
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > max_size:
+                raise _too_large(max_size)
+        return bytes(body)
+
+    decompressor = _decompressor(encoding)
+    try:
+        async for chunk in request.stream():
+            # Output is only held back once the body is already too large
+            body += decompressor.decompress(chunk, max_size + 1 - len(body))
+            if len(body) > max_size:
+                raise _too_large(max_size)
+    except (zlib.error, *((zstandard.ZstdError,) if zstandard else ())) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The request body is not valid {encoding}: {e}",
+        ) from None
+
+    if not decompressor.eof:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The request body is a truncated {encoding} stream",
+        )
+    return bytes(body)
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Returns the preferred supported encoding of an Accept-Encoding header."""
+    weights: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip()] = weight
+
+    candidates = [
+        encoding
+        for encoding in supported_encodings()
+        if weights.get(encoding, weights.get("*", 0.0)) > 0
+    ]
+    return max(
+        candidates,
+        key=lambda encoding: weights.get(encoding, weights.get("*", 0.0)),
+        default=None,
+    )
+
+
+def _compressor(encoding: str) -> Compressor:
+    if encoding == "zstd":
+        return ZstdCompressor(settings.compression_zstd_level)
+    return GzipCompressor(settings.compression_gzip_level)
+
+
+class CompressionMiddleware:
+    """Compresses responses with the encoding negotiated from Accept-Encoding."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int | None = None) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        if (encoding := negotiate_encoding(accept_encoding)) is None:
+            await self.app(scope, receive, send)
+            return
+
+        minimum_size = self.minimum_size
+        if minimum_size is None:
+            minimum_size = settings.compression_minimum_size
+        responder = _CompressionResponder(send, encoding, minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int) -> None:
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Message | None = None
+        self.compressor: Compressor | None = None
+        self.passthrough = False
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        media_type = headers.get("content-type", "")
+        return (
+            self.start is not None
+            and self.start["status"] not in (204, 304)
+            and "content-encoding" not in headers
+            and media_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def _start_compressing(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # A strong ETag names the exact bytes sent, which compression changes
+        if (etag := headers.get("etag")) is not None and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        self.compressor = _compressor(self.encoding)
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.compressor is None:
+            assert self.start is not None
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not self._compressible(headers) or (
+                not more_body and len(body) < self.minimum_size
+            ):
+                self.passthrough = True
+                if "content-encoding" not in headers:
+                    headers.add_vary_header("Accept-Encoding")
+                await self._send(self.start)
+                await self._send(message)
+                return
+
+            self._start_compressing(headers)
+            assert self.compressor is not None
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+
+            del headers["Content-Length"]
+            await self._send(self.start)
+
+        if more_body:
+            body = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            body = self.compressor.compress(body) + self.compressor.finish()
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
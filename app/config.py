@@ -0,0 +1,103 @@
+"""Loads the runtime settings for the app.
+
+Every setting can be overridden with an environment variable prefixed with
+``CEREBRUM_``, e.g. ``CEREBRUM_SQLITE_BUSY_TIMEOUT=10000``.
+"""
+
+from typing import Literal
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+__all__ = ["Settings", "settings"]
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="CEREBRUM_", env_file=".env", extra="ignore"
+    )
+
+    database_url: str = "sqlite+aiosqlite:////data/db.sqlite"
+
+    # SQLite connection profile, applied to every new connection
+    sqlite_journal_mode: Literal[
+        "WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"
+    ] = "WAL"
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    sqlite_busy_timeout: int = 5000  # milliseconds
+    # Negative cache sizes are in KiB, positive sizes are in pages
+    sqlite_cache_size: int = -20000
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # bytes
+    sqlite_temp_store: Literal["DEFAULT", "FILE", "MEMORY"] = "MEMORY"
+
+    # Connection pool
+    pool_size: int = 5
+    pool_max_overflow: int = 10
+    pool_timeout: float = 30.0  # seconds to wait for a connection checkout
+
+    # Group commit of Cogspeed test uploads
+    write_batch_max_size: int = 64
+    write_batch_max_delay: float = 0.002  # seconds
+
+    # JSON codec of the hot routes, see app/codec.py
+    json_codec: Literal["pydantic", "orjson", "stdlib"] = "pydantic"
+
+    # Store new rounds as one row per round, or packed into a blob on the result
+    rounds_storage: Literal["rows", "packed"] = "rows"
+
+    # Monthly archive files of the rounds of old tests, see app/archive.py
+    rounds_archive_dir: str = "/data/archive"
+    rounds_archive_after_days: int = 90
+
+    # Online snapshots of the database, see app/backup.py
+    backup_dir: str = "/data/backups"
+    backup_keep: int = 7  # newest snapshots kept
+    backup_interval: float = 24 * 60 * 60  # seconds between scheduled snapshots
+    backup_pages_per_step: int = 256
+    backup_step_sleep: float = 0.05  # seconds, lets writers in between steps
+    backup_max_restarts: int = 3  # before copying the rest in one step
+
+    # Largest number of tests accepted by the batch upload endpoint
+    upload_batch_max_size: int = 500
+
+    # Largest request body, after decompressing it, see app/compression.py
+    request_body_max_bytes: int = 16 * 1024 * 1024
+
+    # Compression of responses with the encoding the client accepts
+    compression_minimum_size: int = 1024  # bytes, smaller responses are not worth it
+    compression_gzip_level: int = 6
+    compression_zstd_level: int = 3
+
+    # Most tests compared at once by the rounds analysis endpoint
+    rounds_analysis_max_tests: int = 500
+
+    # Largest page of the test history endpoint
+    history_page_max_size: int = 500
+
+    # Rows read and encoded at a time by the streaming exports
+    export_chunk_size: int = 1000
+    # Exports end this long before now, so tests whose write transaction is
+    # still open are left to the next export; longer than any write transaction
+    export_watermark_lag: int = 60  # seconds
+
+    # Population norms, see app/norms.py
+    norms_compression: int = 200  # centroids kept by each t-digest
+    norms_min_cohort_size: int = 30  # smaller cohorts fall back to wider ones
+    norms_cache_ttl: float = 60.0  # seconds
+
+    # Recently seen Idempotency-Key headers on test uploads
+    idempotency_cache_size: int = 10_000
+    idempotency_key_ttl: float = 24 * 60 * 60  # seconds
+
+    # Cache of verified (client ID, API key) pairs
+    auth_cache_size: int = 10_000
+    auth_cache_ttl: float = 60.0  # seconds
+
+    # Cache of the responses of read endpoints, dropped when the client writes
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_ttl: float = 300.0  # seconds, bounds staleness across workers
+
+    # Key for admin-only endpoints, which are disabled when unset
+    admin_api_key: str | None = None
+
+
+settings = Settings()
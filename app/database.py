@@ -3,14 +3,61 @@
 Utilises dependency injections to pass the database connection into the app.
 """
 
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from typing import Any, AsyncGenerator
 
+from sqlalchemy import Connection, event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app.config import Settings, settings
 from app.schemas import Base
 
-SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:////data/db.sqlite"
 
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
+def sqlite_pragmas(profile: Settings) -> dict[str, str | int]:
+    """Returns the pragmas applied to every new SQLite connection."""
+    return {
+        "journal_mode": profile.sqlite_journal_mode,
+        "synchronous": profile.sqlite_synchronous,
+        "busy_timeout": profile.sqlite_busy_timeout,
+        "cache_size": profile.sqlite_cache_size,
+        "mmap_size": profile.sqlite_mmap_size,
+        "temp_store": profile.sqlite_temp_store,
+    }
+
+
+def create_sqlite_engine(
+    url: str, profile: Settings = settings, **kwargs: Any
+) -> AsyncEngine:
+    """Creates an async engine tuned for many processes sharing one SQLite file.
+
+    WAL lets readers run alongside the single writer, and the busy timeout makes
+    writers wait for the lock instead of failing with `database is locked`.
+    """
+    if make_url(url).database not in (None, "", ":memory:"):
+        kwargs.setdefault("pool_size", profile.pool_size)
+        kwargs.setdefault("max_overflow", profile.pool_max_overflow)
+        kwargs.setdefault("pool_timeout", profile.pool_timeout)
+
+    async_engine = create_async_engine(url, **kwargs)
+    pragmas = sqlite_pragmas(profile)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return async_engine
+
+
+engine = create_sqlite_engine(settings.database_url)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine, class_=AsyncSession, autocommit=False, autoflush=False
@@ -22,6 +69,41 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-async def create_db_and_tables() -> None:
-    async with engine.begin() as conn:
+def get_session_factory() -> async_sessionmaker[AsyncSession]:
+    """Returns the session factory, for work which outlives the request.
+
+    Streaming responses are sent after the request's dependencies have exited,
+    so they open their own session.
+    """
+    return AsyncSessionLocal
+
+
+def add_missing_columns(conn: Connection) -> None:
+    """Adds nullable columns which are missing from existing tables.
+
+    `create_all` only creates missing tables, so this keeps databases created
+    by older versions of the app in step with the schemas.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                spec = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {spec}")
+
+
+def add_missing_indexes(conn: Connection) -> None:
+    """Creates indexes which are missing from existing tables."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def create_db_and_tables(db_engine: AsyncEngine = engine) -> None:
+    async with db_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(add_missing_indexes)
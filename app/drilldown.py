@@ -0,0 +1,211 @@
+"""Analyses the rounds of one or more Cogspeed tests.
+
+The rounds of the selected tests are read as columns, whether they are stored
+as rows, packed into blobs or archived, and laid out as (tests, rounds)
+arrays padded past each test's last round. Every analysis is then computed
+for all the tests at once with vectorised NumPy, so comparing hundreds of
+tests costs little more than drilling into one.
+"""
+
+from typing import Any, NamedTuple, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.archive import read_archived_blob
+from app.rounds import unpack_round_columns
+from app.schemas import CogspeedTestResult, CogspeedTestRound
+
+__all__ = [
+    "MACHINE_PACED",
+    "ROUND_STATUSES",
+    "RoundMatrix",
+    "block_transitions",
+    "fetch_round_matrix",
+    "mean_by_round",
+    "round_matrix",
+    "status_counts",
+]
+
+ROUND_STATUSES = ("correct", "incorrect", "no response")
+MACHINE_PACED = "machine-paced"
+
+_COLUMNS = (
+    "round_number",
+    "status",
+    "round_type_normalized",
+    "duration",
+    "correct_rolling_mean_ratio",
+    "time_taken",
+    "ratio",
+)
+
+
+class RoundMatrix(NamedTuple):
+    """The rounds of several tests as (tests, rounds) arrays, in round order.
+
+    Rounds past the end of a test are NaN, or None for the string columns.
+    """
+
+    test_ids: list[str]
+    counts: np.ndarray
+    round_number: np.ndarray
+    status: np.ndarray
+    round_type: np.ndarray
+    duration: np.ndarray
+    rolling_mean_ratio: np.ndarray
+    time_taken: np.ndarray
+    ratio: np.ndarray
+
+
+async def fetch_round_matrix(
+    session: AsyncSession, client_id: str, test_ids: Sequence[str]
+) -> RoundMatrix:
+    """Loads the rounds of the client's tests, whichever way they are stored.
+
+    Tests the client does not have are left out.
+    """
+    test_ids = list(dict.fromkeys(test_ids))
+    query = select(
+        CogspeedTestResult.id,
+        CogspeedTestResult.rounds_blob,
+        CogspeedTestResult.rounds_archive,
+    ).where(
+        CogspeedTestResult.client_id == client_id,
+        CogspeedTestResult.id.in_(test_ids),
+    )
+    found: set[str] = set()
+    columns: dict[str, dict[str, Sequence[Any]]] = {}
+    for test_id, blob, month in await session.execute(query):
+        found.add(test_id)
+        if blob is None and month is not None:
+            blob = read_archived_blob(month, client_id, test_id)
+        if blob is not None:
+            columns[test_id] = unpack_round_columns(blob)
+
+    if row_test_ids := [t for t in found if t not in columns]:
+        # Served by the primary key of the rounds, (client_id, test_id, round)
+        query = (
+            select(
+                CogspeedTestRound.test_id,
+                *(getattr(CogspeedTestRound, name) for name in _COLUMNS),
+            )
+            .where(
+                CogspeedTestRound.client_id == client_id,
+                CogspeedTestRound.test_id.in_(row_test_ids),
+            )
+            .order_by(CogspeedTestRound.test_id, CogspeedTestRound.round_number)
+        )
+        rows = (await session.execute(query)).all()
+        if rows:
+            ids, *values = zip(*rows)
+            ids = np.asarray(ids, dtype=object)
+            starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+            ends = np.r_[starts[1:], len(ids)]
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                columns[ids[start]] = {
+                    name: column[start:end] for name, column in zip(_COLUMNS, values)
+                }
+
+    empty: dict[str, Sequence[Any]] = {name: () for name in _COLUMNS}
+    return round_matrix(
+        [t for t in test_ids if t in found],
+        [columns.get(t, empty) for t in test_ids if t in found],
+    )
+
+
+def _parse_ratios(values: np.ndarray) -> np.ndarray:
+    """Parses rolling mean ratios, stored as text, with "n/a" as NaN."""
+    text = values.astype(str)
+    text[np.isin(text, ("n/a", "None", ""))] = "nan"
+    try:
+        return text.astype(np.float64)
+    except ValueError:
+        parsed = np.full(len(text), np.nan)
+        for i, value in enumerate(text.tolist()):
+            try:
+                parsed[i] = float(value)
+            except ValueError:
+                pass
+        return parsed
+
+
+def round_matrix(
+    test_ids: list[str], columns: Sequence[dict[str, Sequence[Any]]]
+) -> RoundMatrix:
+    """Lays out the round columns of each test as (tests, rounds) arrays."""
+    counts = np.array([len(c["round_number"]) for c in columns], dtype=np.intp)
+    width = int(counts.max(initial=0))
+    # The (test, round) position of every round of every test
+    rows = np.repeat(np.arange(len(columns)), counts)
+    cols = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    def gather(name: str, dtype: Any, fill: Any) -> np.ndarray:
+        flat = [np.asarray(c[name], dtype=dtype) for c in columns]
+        matrix = np.full((len(columns), width), fill, dtype=dtype)
+        if flat:
+            matrix[rows, cols] = np.concatenate(flat)
+        return matrix
+
+    ratios = gather("correct_rolling_mean_ratio", object, None)
+    rolling_mean_ratio = np.full(ratios.shape, np.nan)
+    rolling_mean_ratio[rows, cols] = _parse_ratios(ratios[rows, cols])
+
+    return RoundMatrix(
+        test_ids=test_ids,
+        counts=counts,
+        round_number=gather("round_number", np.float64, np.nan),
+        status=gather("status", object, None),
+        round_type=gather("round_type_normalized", object, None),
+        duration=gather("duration", np.float64, np.nan),
+        rolling_mean_ratio=rolling_mean_ratio,
+        time_taken=gather("time_taken", np.float64, np.nan),
+        ratio=gather("ratio", np.float64, np.nan),
+    )
+
+
+def status_counts(matrix: RoundMatrix, machine_paced: bool = False) -> np.ndarray:
+    """Returns the number of rounds of each test with each of ROUND_STATUSES,
+    as a (tests, statuses) array, optionally of the machine-paced rounds only.
+    """
+    status = matrix.status
+    if machine_paced:
+        status = np.where(matrix.round_type == MACHINE_PACED, status, None)
+    return np.stack([(status == name).sum(axis=1) for name in ROUND_STATUSES], axis=-1)
+
+
+def block_transitions(
+    matrix: RoundMatrix,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Returns where the round duration changes between consecutive
+    machine-paced rounds, i.e. where a test moves to a faster or slower block.
+
+    Returns the index of the test, the number of the first round of the new
+    block, and the durations before and after, for every transition.
+    """
+    paced = (matrix.round_type == MACHINE_PACED) & (matrix.duration > 0)
+    duration = np.where(paced, matrix.duration, np.nan)
+    # The index of the last machine-paced round before each round, or -1
+    last = np.where(paced, np.arange(duration.shape[1]), -1)
+    np.maximum.accumulate(last, axis=1, out=last)
+    previous = np.full_like(last, -1)
+    previous[:, 1:] = last[:, :-1]
+    previous_duration = np.take_along_axis(duration, np.maximum(previous, 0), axis=1)
+
+    tests, rounds = np.nonzero(
+        paced & (previous >= 0) & (duration != previous_duration)
+    )
+    return (
+        tests,
+        matrix.round_number[tests, rounds],
+        previous_duration[tests, rounds],
+        duration[tests, rounds],
+    )
+
+
+def mean_by_round(values: np.ndarray) -> np.ndarray:
+    """Returns the mean of the nth round of every test, ignoring NaN."""
+    valid = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(valid, values, 0).sum(axis=0) / valid.sum(axis=0)
@@ -0,0 +1,275 @@
+"""Streams exports of Cogspeed test results and rounds.
+
+Rows are read with a server-side cursor and encoded one chunk at a time, so
+an export uses constant memory however many tests it covers. Exports are
+bounded by a watermark on `created_at`: passing the watermark of one export
+as `since` to the next only exports the tests stored in between.
+
+`created_at` is set when a test is inserted, not when it is committed, so the
+watermark lags the database's clock by `export_watermark_lag` seconds. A test
+committed after one export started is then still newer than its watermark.
+"""
+
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Literal, Protocol
+
+from sqlalchemy import String, func, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.codec import get_adapter, get_codec
+from app.models import CogspeedTestResultModel, CogspeedTestRoundModel
+from app.rounds import fetch_rounds
+from app.schemas import CogspeedTestResult, CogspeedTestRound
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None  # type: ignore
+
+__all__ = [
+    "EXPORT_FORMATS",
+    "ExportFormat",
+    "ExportKind",
+    "export_columns",
+    "format_watermark",
+    "get_watermark",
+    "iter_export",
+    "parquet_available",
+    "parse_watermark",
+]
+
+ExportFormat = Literal["ndjson", "csv", "parquet"]
+ExportKind = Literal["results", "rounds"]
+
+EXPORT_FORMATS: dict[str, tuple[str, str]] = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+RESULT_COLUMNS = [
+    *(name for name in CogspeedTestResultModel.model_fields if name != "rounds"),
+    "created_at",
+]
+ROUND_COLUMNS = ["client_id", "test_id", *CogspeedTestRoundModel.model_fields]
+
+# created_at is written by SQLite as CURRENT_TIMESTAMP, in UTC
+_SQLITE_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+
+def export_columns(kind: ExportKind) -> list[str]:
+    return RESULT_COLUMNS if kind == "results" else ROUND_COLUMNS
+
+
+def parse_watermark(since: datetime) -> str:
+    """Formats a `since` datetime like the stored `created_at` values."""
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc)
+    return since.strftime(_SQLITE_TIMESTAMP)
+
+
+def format_watermark(watermark: str) -> str:
+    return datetime.strptime(watermark, _SQLITE_TIMESTAMP).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+
+
+async def get_watermark(session: AsyncSession, lag: int) -> str:
+    """Returns the end of an export, `lag` seconds before the database's time.
+
+    Tests committed from now on get a `created_at` at or after the watermark,
+    as long as no write transaction lasts longer than `lag`.
+    """
+    end = func.datetime("now", f"-{lag} seconds")
+    return (await session.execute(select(type_coerce(end, String)))).scalar_one()
+
+
+async def _iter_result_rows(
+    session: AsyncSession,
+    client_id: str | None,
+    since: str | None,
+    watermark: str,
+    columns: list[str],
+    chunk_size: int,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    created_at = type_coerce(CogspeedTestResult.created_at, String)
+    query = select(*(getattr(CogspeedTestResult, name) for name in columns)).where(
+        created_at < watermark
+    )
+    if client_id is not None:
+        query = query.where(CogspeedTestResult.client_id == client_id)
+    if since is not None:
+        query = query.where(created_at >= since)
+    query = query.order_by(
+        CogspeedTestResult.created_at,
+        CogspeedTestResult.client_id,
+        CogspeedTestResult.id,
+    )
+
+    result = await session.stream(query.execution_options(yield_per=chunk_size))
+    async for partition in result.mappings().partitions(chunk_size):
+        yield [dict(row) for row in partition]
+
+
+async def _iter_rows(
+    session: AsyncSession,
+    kind: ExportKind,
+    client_id: str | None,
+    since: str | None,
+    watermark: str,
+    chunk_size: int,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    if kind == "results":
+        async for rows in _iter_result_rows(
+            session, client_id, since, watermark, RESULT_COLUMNS, chunk_size
+        ):
+            yield rows
+        return
+
+    # Rounds are loaded a chunk of tests at a time, whichever way they are stored
+    async for tests in _iter_result_rows(
+        session, client_id, since, watermark, ["client_id", "id"], chunk_size
+    ):
+        by_client: dict[str, list[str]] = {}
+        for test in tests:
+            by_client.setdefault(test["client_id"], []).append(test["id"])
+
+        round_rows: list[dict[str, Any]] = []
+        for test_client_id, test_ids in by_client.items():
+            rounds = await fetch_rounds(session, test_client_id, test_ids)
+            for test_id in test_ids:
+                metadata = {"client_id": test_client_id, "test_id": test_id}
+                round_rows.extend(metadata | r.model_dump() for r in rounds[test_id])
+        yield round_rows
+
+
+class Encoder(Protocol):
+    def encode(self, rows: list[dict[str, Any]]) -> bytes: ...
+
+    def close(self) -> bytes: ...
+
+
+class NDJSONEncoder:
+    def __init__(self, columns: list[str]) -> None:
+        self.adapter = get_adapter(dict[str, Any])
+
+    def encode(self, rows: list[dict[str, Any]]) -> bytes:
+        codec = get_codec()
+        return b"".join(codec.encode(row, self.adapter) + b"\n" for row in rows)
+
+    def close(self) -> bytes:
+        return b""
+
+
+class CSVEncoder:
+    def __init__(self, columns: list[str]) -> None:
+        self.buffer = io.StringIO()
+        self.writer = csv.DictWriter(self.buffer, fieldnames=columns)
+        self.writer.writeheader()
+
+    def encode(self, rows: list[dict[str, Any]]) -> bytes:
+        self.writer.writerows(rows)
+        return self._drain()
+
+    def close(self) -> bytes:
+        return self._drain()
+
+    def _drain(self) -> bytes:
+        data = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+class _Sink(io.RawIOBase):
+    """A write-only file which hands out what has been written since last time."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _arrow_type(column: Any) -> Any:
+    python_type = column.type.python_type
+    if python_type is bool:
+        return pa.bool_()
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    if python_type is datetime:
+        return pa.timestamp("us")
+    return pa.string()
+
+
+class ParquetEncoder:
+    """Writes one Parquet row group per chunk of rows."""
+
+    def __init__(self, columns: list[str]) -> None:
+        table = CogspeedTestResult.__table__
+        if "test_id" in columns:
+            table = CogspeedTestRound.__table__
+        self.schema = pa.schema(
+            [(name, _arrow_type(table.c[name])) for name in columns]
+        )
+        self.sink = _Sink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema, compression="zstd")
+
+    def encode(self, rows: list[dict[str, Any]]) -> bytes:
+        if "correct_rolling_mean_ratio" in self.schema.names:
+            for row in rows:
+                row["correct_rolling_mean_ratio"] = str(
+                    row["correct_rolling_mean_ratio"]
+                )
+        self.writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+ENCODERS: dict[ExportFormat, Callable[[list[str]], Encoder]] = {
+    "ndjson": NDJSONEncoder,
+    "csv": CSVEncoder,
+    "parquet": ParquetEncoder,
+}
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+async def iter_export(
+    session_factory: async_sessionmaker[AsyncSession],
+    format: ExportFormat,
+    kind: ExportKind,
+    client_id: str | None,
+    since: str | None,
+    watermark: str,
+    chunk_size: int,
+) -> AsyncIterator[bytes]:
+    """Yields the encoded export a chunk of rows at a time."""
+    encoder = ENCODERS[format](export_columns(kind))
+    async with session_factory() as session:
+        async for rows in _iter_rows(
+            session, kind, client_id, since, watermark, chunk_size
+        ):
+            if rows and (data := encoder.encode(rows)):
+                yield data
+    if data := encoder.close():
+        yield data
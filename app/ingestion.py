@@ -0,0 +1,80 @@
+"""Writes Cogspeed test results and their rounds to the database.
+
+Rows are inserted with executemany-style core inserts rather than by building
+an ORM object for every result and round. Inserts ignore tests which are
+already stored, so a client retrying an upload does not cause an error.
+
+Newly stored tests are added to their clients' running summaries and to the
+population norms in the same transaction, see app/summary.py and app/norms.py.
+"""
+
+from typing import Any, Literal
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import CogspeedTestResultModel
+from app.norms import update_norms
+from app.rounds import pack_rounds
+from app.schemas import CogspeedTestResult, CogspeedTestRound
+from app.summary import update_summaries
+
+__all__ = ["insert_tests", "result_row", "round_rows"]
+
+results_table = CogspeedTestResult.__table__
+rounds_table = CogspeedTestRound.__table__
+
+
+def result_row(test: CogspeedTestResultModel, packed: bool = False) -> dict[str, Any]:
+    row = test.model_dump(exclude={"rounds"})
+    if packed:
+        row["rounds_blob"] = pack_rounds(test.rounds)
+    return row
+
+
+def round_rows(test: CogspeedTestResultModel) -> list[dict[str, Any]]:
+    metadata = {"client_id": test.client_id, "test_id": test.id}
+    return [metadata | r.model_dump() for r in test.rounds]
+
+
+async def insert_tests(
+    session: AsyncSession,
+    tests: list[CogspeedTestResultModel],
+    rounds_storage: Literal["rows", "packed"] | None = None,
+) -> list[bool]:
+    """Adds the tests and their rounds to the session's transaction.
+
+    Returns whether each test was newly stored. Tests already in the database,
+    or repeated earlier in `tests`, are skipped along with their rounds.
+    """
+    if not tests:
+        return []
+    packed = (rounds_storage or settings.rounds_storage) == "packed"
+
+    query = (
+        insert(results_table)
+        .on_conflict_do_nothing()
+        .returning(results_table.c.client_id, results_table.c.id)
+    )
+    result = await session.execute(query, [result_row(test, packed) for test in tests])
+    inserted = {(client_id, test_id) for client_id, test_id in result}
+
+    stored: list[bool] = []
+    new_tests: list[CogspeedTestResultModel] = []
+    rounds: list[dict[str, Any]] = []
+    for test in tests:
+        key = (test.client_id, test.id)
+        stored.append(key in inserted)
+        if key in inserted:
+            inserted.remove(key)
+            new_tests.append(test)
+            if not packed:
+                rounds.extend(round_rows(test))
+
+    if rounds:
+        await session.execute(insert(rounds_table).on_conflict_do_nothing(), rounds)
+    await update_summaries(session, (vars(test) for test in new_tests))
+    await update_norms(session, (vars(test) for test in new_tests))
+
+    return stored
@@ -9,8 +9,11 @@ import fastapi
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.codec import openapi_schemas
+from app.compression import CompressionMiddleware
 from app.database import create_db_and_tables
-from app.routers import clients, cogspeed
+from app.routers import analytics, clients, cogspeed, export, metrics, norms
+from app.write_queue import write_queue
 
 
 @asynccontextmanager
@@ -19,6 +22,8 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    await write_queue.close()
+
 
 app = fastapi.FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -28,8 +33,26 @@ app.add_middleware(
     allow_headers=["*"],
     allow_credentials=True,
 )
+app.add_middleware(CompressionMiddleware)
 app.include_router(clients.router)
 app.include_router(cogspeed.router)
+app.include_router(analytics.router)
+app.include_router(export.router)
+app.include_router(metrics.router)
+app.include_router(norms.router)
+
+
+def openapi() -> dict:
+    """Adds the schemas of request bodies parsed by app/codec.py to the docs."""
+    if app.openapi_schema is None:
+        schema = fastapi.FastAPI.openapi(app)
+        components = schema.setdefault("components", {}).setdefault("schemas", {})
+        for name, definition in openapi_schemas.items():
+            components.setdefault(name, definition)
+    return app.openapi_schema  # type: ignore
+
+
+app.openapi = openapi  # type: ignore
 
 
 @app.get("/")
@@ -4,6 +4,8 @@ Synced with the database schemas.
 """
 
 from datetime import date
+from typing import Any, Literal
+
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 __all__ = [
@@ -14,6 +16,18 @@ __all__ = [
     "LoginResponseModel",
     "CogspeedTestRoundModel",
     "CogspeedTestResultModel",
+    "CogspeedTestBatchItemModel",
+    "CogspeedTestPageModel",
+    "CogspeedSummaryModel",
+    "CogspeedTimeOfDayModel",
+    "CogspeedTimeOfDayStatsModel",
+    "CogspeedTrendModel",
+    "CogspeedSeriesModel",
+    "CogspeedBlockTransitionModel",
+    "CogspeedTestRoundsAnalysisModel",
+    "CogspeedRoundsAnalysisModel",
+    "CogspeedCohortModel",
+    "CogspeedPercentileModel",
 ]
 
 
@@ -129,3 +143,130 @@ class CogspeedTestResultModel(BaseModel):
     local_time: str = Field(alias="localTime")
 
     rounds: list[CogspeedTestRoundModel]
+
+
+class CogspeedTestBatchItemModel(BaseModel):
+    id: str = Field(..., description="The ID of the uploaded test")
+    status: Literal["created", "already_stored", "rejected", "duplicate"] = Field(
+        ..., description="What happened to the test"
+    )
+    status_code: int = Field(..., description="The equivalent single upload status")
+    detail: str | None = Field(None, description="Why the test was not created")
+
+
+class CogspeedTestPageModel(BaseModel):
+    items: list[dict[str, Any]] = Field(
+        ..., description="The tests, with only the requested fields"
+    )
+    next_cursor: str | None = Field(
+        ...,
+        description="Pass as `cursor` to fetch the next page, null on the last page",
+    )
+
+
+class CogspeedSummaryModel(BaseModel):
+    metric: str = Field(..., examples=["blocking_round_duration"])
+    bucket: str = Field(
+        ...,
+        description="'all', or the UTC time of day: morning, midday, evening or night",
+    )
+    count: int
+    mean: float
+    std: float | None = Field(..., description="Null with fewer than two tests")
+    ci: float | None = Field(
+        ..., description="Half-width of the confidence interval of the mean"
+    )
+    min: float
+    max: float
+
+
+class CogspeedTimeOfDayModel(BaseModel):
+    bucket: Literal["morning", "midday", "evening", "night"]
+    count: int
+    mean: float | None = Field(..., description="Null without tests")
+    std: float | None = Field(..., description="Null with fewer than two tests")
+    ci: float | None = Field(
+        ..., description="Half-width of the confidence interval of the mean"
+    )
+
+
+class CogspeedTimeOfDayStatsModel(BaseModel):
+    metric: str
+    confidence: float
+    buckets: list[CogspeedTimeOfDayModel]
+
+
+class CogspeedTrendModel(BaseModel):
+    metric: str
+    window: int = Field(..., description="Number of tests in each rolling window")
+    slope_per_day: float | None = Field(
+        ..., description="Least squares change of the metric per day"
+    )
+    dates: list[str]
+    values: list[float | None]
+    rolling_mean: list[float | None] = Field(
+        ..., description="Null until a full window of tests"
+    )
+    rolling_std: list[float | None]
+
+
+class CogspeedSeriesModel(BaseModel):
+    dates: list[str]
+    series: dict[str, list[float | None]] = Field(
+        ..., description="The values of each metric, aligned with the dates"
+    )
+
+
+class CogspeedBlockTransitionModel(BaseModel):
+    round_number: int = Field(..., description="The first round of the new block")
+    from_duration: float
+    to_duration: float
+
+
+class CogspeedTestRoundsAnalysisModel(BaseModel):
+    test_id: str
+    round_numbers: list[int]
+    round_types: list[str | None]
+    statuses: list[str | None]
+    response_times: list[float | None] = Field(
+        ..., description="Time taken by each round, in milliseconds"
+    )
+    rolling_mean_ratios: list[float | None] = Field(
+        ..., description="Null where the app had none, e.g. before machine pacing"
+    )
+    ratios: list[float | None]
+    status_counts: dict[str, int] = Field(
+        ..., description="Number of correct, incorrect and no response rounds"
+    )
+    machine_paced_status_counts: dict[str, int]
+    block_transitions: list[CogspeedBlockTransitionModel] = Field(
+        ..., description="Changes of duration between machine-paced rounds"
+    )
+
+
+class CogspeedRoundsAnalysisModel(BaseModel):
+    tests: list[CogspeedTestRoundsAnalysisModel]
+    mean_response_times: list[float | None] = Field(
+        ..., description="Mean time taken by the nth round of the tests"
+    )
+
+
+class CogspeedCohortModel(BaseModel):
+    age_band: str = Field(..., examples=["30-39"], description="'*' for any age")
+    gender: str = Field(..., examples=["female"], description="'*' for any gender")
+    handedness: str = Field(
+        ..., examples=["right"], description="'*' for any handedness"
+    )
+
+
+class CogspeedPercentileModel(BaseModel):
+    metric: str
+    value: float
+    percentile: float = Field(
+        ..., description="Percentage of the cohort's tests at or below the value"
+    )
+    median: float = Field(..., description="The cohort's median")
+    cohort: CogspeedCohortModel = Field(
+        ..., description="The narrowest cohort of the client with enough tests"
+    )
+    cohort_size: int = Field(..., description="Number of tests in the cohort")
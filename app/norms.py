@@ -0,0 +1,310 @@
+"""Maintains population norms of Cogspeed metrics.
+
+For every cohort of clients with the same age band, gender and handedness,
+`cogspeed_norms` holds a t-digest of each norm metric over the cohort's tests.
+Every test is also added to the wider cohorts which match any handedness, any
+gender and handedness, and everyone, so small cohorts can fall back to a
+wider one. The ingestion path merges newly stored tests into the digests, and
+lookups read a cached digest, so finding a client's percentile costs the same
+however many tests are stored.
+"""
+
+import datetime
+from typing import Any, Iterable, Mapping
+
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.cache import TTLCache, on_client_changed
+from app.config import settings
+from app.schemas import Client, CogspeedNorm, CogspeedTestResult
+from app.singleflight import single_flight
+from app.sketch import TDigest
+from app.utils import parse_test_date
+
+__all__ = [
+    "ANY",
+    "NORM_METRICS",
+    "age_band",
+    "client_cohort",
+    "find_norm",
+    "get_demographics",
+    "rebuild_norms",
+    "update_norms",
+    "widen",
+]
+
+norms_table = CogspeedNorm.__table__
+
+NORM_METRICS = ("blocking_round_duration", "cognitive_processing_index")
+
+ANY = "*"
+
+# Upper bounds of the age bands, the last band is open ended
+AGE_BANDS = (20, 30, 40, 50, 60, 70)
+
+Cohort = tuple[str, str, str]  # age band, gender, handedness
+NormKey = tuple[str, str, str, str]  # age band, gender, handedness, metric
+
+norms_cache: TTLCache[NormKey, TDigest] = TTLCache(
+    maxsize=4096, ttl=settings.norms_cache_ttl
+)
+# Maps client IDs to their date of birth, gender and handedness
+demographics_cache: TTLCache[str, tuple[datetime.date, str, str]] = TTLCache(
+    maxsize=settings.auth_cache_size, ttl=settings.norms_cache_ttl
+)
+
+
+@on_client_changed
+def _forget_demographics(client_id: str) -> None:
+    demographics_cache.pop(client_id)
+
+
+def age_band(date_of_birth: datetime.date, on: datetime.date) -> str:
+    before_birthday = (on.month, on.day) < (date_of_birth.month, date_of_birth.day)
+    age = on.year - date_of_birth.year - before_birthday
+    lower = 0
+    for upper in AGE_BANDS:
+        if age < upper:
+            return f"<{upper}" if lower == 0 else f"{lower}-{upper - 1}"
+        lower = upper
+    return f"{lower}+"
+
+
+def _normalise(value: str | None) -> str:
+    return (value or "").strip().lower() or "unknown"
+
+
+def client_cohort(
+    demographics: tuple[datetime.date, str, str], on: datetime.date
+) -> Cohort:
+    date_of_birth, gender, handedness = demographics
+    return age_band(date_of_birth, on), gender, handedness
+
+
+def widen(cohort: Cohort) -> list[Cohort]:
+    """Returns the cohort followed by the wider cohorts containing it."""
+    band, gender, handedness = cohort
+    return [
+        (band, gender, handedness),
+        (band, gender, ANY),
+        (band, ANY, ANY),
+        (ANY, ANY, ANY),
+    ]
+
+
+async def get_demographics(
+    session: AsyncSession, client_ids: Iterable[str]
+) -> dict[str, tuple[datetime.date, str, str]]:
+    found: dict[str, tuple[datetime.date, str, str]] = {}
+    missing: list[str] = []
+    for client_id in client_ids:
+        if (cached := demographics_cache.get(client_id)) is not None:
+            found[client_id] = cached
+        else:
+            missing.append(client_id)
+
+    if missing:
+        query = select(
+            Client.client_id, Client.date_of_birth, Client.gender, Client.handedness
+        ).where(Client.client_id.in_(missing))
+        for client_id, date_of_birth, gender, handedness in await session.execute(
+            query
+        ):
+            found[client_id] = (
+                date_of_birth,
+                _normalise(gender),
+                _normalise(handedness),
+            )
+            demographics_cache.set(client_id, found[client_id])
+    return found
+
+
+def _collect(
+    tests: Iterable[Mapping[str, Any]],
+    demographics: Mapping[str, tuple[datetime.date, str, str]],
+) -> dict[NormKey, list[float]]:
+    """Groups the norm metrics of tests by every cohort they belong to.
+
+    A test is placed in the age band of the client when the test was taken.
+    Tests of unknown clients are skipped.
+    """
+    today = datetime.date.today()
+    values: dict[NormKey, list[float]] = {}
+    for test in tests:
+        if (client := demographics.get(test["client_id"])) is None:
+            continue
+        taken = parse_test_date(test["date"])
+        cohort = client_cohort(client, taken.date() if taken else today)
+        for wider in widen(cohort):
+            for metric in NORM_METRICS:
+                if test[metric] is not None:
+                    values.setdefault((*wider, metric), []).append(test[metric])
+    return values
+
+
+async def _load_digests(
+    session: AsyncSession, keys: list[NormKey]
+) -> dict[NormKey, TDigest]:
+    columns = (
+        norms_table.c.age_band,
+        norms_table.c.gender,
+        norms_table.c.handedness,
+        norms_table.c.metric,
+    )
+    query = select(*columns, norms_table.c.digest).where(tuple_(*columns).in_(keys))
+    return {
+        (band, gender, handedness, metric): TDigest.from_bytes(digest)
+        for band, gender, handedness, metric, digest in await session.execute(query)
+    }
+
+
+async def _store_digests(
+    session: AsyncSession, digests: Mapping[NormKey, TDigest]
+) -> None:
+    if not digests:
+        return
+    query = insert(norms_table)
+    query = query.on_conflict_do_update(
+        index_elements=[
+            norms_table.c.age_band,
+            norms_table.c.gender,
+            norms_table.c.handedness,
+            norms_table.c.metric,
+        ],
+        set_={
+            "count": query.excluded.count,
+            "digest": query.excluded.digest,
+            "updated_at": func.now(),
+        },
+    )
+    await session.execute(
+        query,
+        [
+            {
+                "age_band": band,
+                "gender": gender,
+                "handedness": handedness,
+                "metric": metric,
+                "count": round(digest.count),
+                "digest": digest.to_bytes(),
+            }
+            for (band, gender, handedness, metric), digest in digests.items()
+        ],
+    )
+
+
+async def update_norms(
+    session: AsyncSession, tests: Iterable[Mapping[str, Any]]
+) -> None:
+    """Adds newly stored tests to the digests of their cohorts.
+
+    Runs in the inserting transaction, which already holds SQLite's write lock,
+    so no other writer can change the digests between reading and writing them.
+    """
+    tests = list(tests)
+    if not tests:
+        return
+
+    demographics = await get_demographics(
+        session, {test["client_id"] for test in tests}
+    )
+    values = _collect(tests, demographics)
+    if not values:
+        return
+
+    digests = await _load_digests(session, list(values))
+    for key, new_values in values.items():
+        if key not in digests:
+            digests[key] = TDigest(settings.norms_compression)
+        digests[key].add(new_values)
+        norms_cache.pop(key)
+    await _store_digests(session, digests)
+
+
+async def _load_digest(
+    session_factory: async_sessionmaker[AsyncSession], key: NormKey
+) -> TDigest | None:
+    query = select(norms_table.c.digest).where(
+        norms_table.c.age_band == key[0],
+        norms_table.c.gender == key[1],
+        norms_table.c.handedness == key[2],
+        norms_table.c.metric == key[3],
+    )
+    async with session_factory() as session:
+        if (data := (await session.execute(query)).scalar()) is None:
+            return None
+    digest = TDigest.from_bytes(data)
+    norms_cache.set(key, digest)
+    return digest
+
+
+async def get_digest(
+    session_factory: async_sessionmaker[AsyncSession], key: NormKey
+) -> TDigest | None:
+    """Returns the cached digest of a cohort, loading it if needed. Concurrent
+    loads of the same digest, as when a cached digest expires under load, share
+    one query.
+    """
+    if (digest := norms_cache.get(key)) is not None:
+        return digest
+    return await single_flight.do(
+        ("norms", *key), lambda: _load_digest(session_factory, key)
+    )
+
+
+async def find_norm(
+    session_factory: async_sessionmaker[AsyncSession], cohort: Cohort, metric: str
+) -> tuple[Cohort, TDigest] | None:
+    """Returns the narrowest cohort containing `cohort` which has at least
+    `norms_min_cohort_size` tests, or the widest cohort with any tests.
+    """
+    found = None
+    for wider in widen(cohort):
+        if (digest := await get_digest(session_factory, (*wider, metric))) is None:
+            continue
+        found = wider, digest
+        if digest.count >= settings.norms_min_cohort_size:
+            break
+    return found
+
+
+async def rebuild_norms(
+    session_factory: async_sessionmaker[AsyncSession], chunk_size: int = 1000
+) -> int:
+    """Recomputes every digest from the stored tests. Returns the number of tests.
+
+    Runs in one transaction, so readers keep seeing the old norms until the
+    rebuild commits.
+    """
+    query = (
+        select(
+            CogspeedTestResult.client_id,
+            CogspeedTestResult.date,
+            *(getattr(CogspeedTestResult, metric) for metric in NORM_METRICS),
+        )
+        .order_by(CogspeedTestResult.client_id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    total = 0
+    digests: dict[NormKey, TDigest] = {}
+    async with session_factory() as session:
+        await session.execute(delete(norms_table))
+
+        result = await session.stream(query)
+        async for partition in result.mappings().partitions(chunk_size):
+            demographics = await get_demographics(
+                session, {test["client_id"] for test in partition}
+            )
+            for key, values in _collect(partition, demographics).items():
+                if key not in digests:
+                    digests[key] = TDigest(settings.norms_compression)
+                digests[key].add(values)
+            total += len(partition)
+
+        await _store_digests(session, digests)
+        await session.commit()
+    norms_cache.clear()
+    return total
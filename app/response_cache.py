@@ -0,0 +1,108 @@
+"""Caches the responses of a client's read endpoints until the client writes.
+
+Responses are cached per client, path and query string, and carry an ETag, so
+a poller sending `If-None-Match` gets a 304 without the route running, and
+so without a database query. The write paths drop every cached response of
+the client they write to; entries also expire after `response_cache_ttl`
+seconds, which bounds how stale another worker process's cache can get.
+
+Routes opt in with the `cached_response` dependency:
+
+    cache: ResponseCacheLookup = Depends(cached_response)
+    ...
+    if cache.response is not None:
+        return cache.response
+    ...
+    return cache.store(ModelResponse(...))
+"""
+
+import hashlib
+from typing import NamedTuple
+
+from fastapi import Depends, Request, Response, status
+from app.cache import ByteLRUCache, on_client_changed
+from app.config import settings
+from app.security import get_client_id_from_api_key
+
+__all__ = [
+    "ResponseCacheLookup",
+    "cached_response",
+    "invalidate_client_responses",
+    "response_cache",
+]
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+    status_code: int
+    media_type: str | None
+
+
+# Keys are (client ID, path, query string)
+response_cache: ByteLRUCache[tuple[str, str, str], CachedResponse] = ByteLRUCache(
+    max_bytes=settings.response_cache_max_bytes, ttl=settings.response_cache_ttl
+)
+
+
+@on_client_changed
+def invalidate_client_responses(client_id: str) -> None:
+    response_cache.invalidate_group(client_id)
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in tags or "*" in tags
+
+
+def _headers(etag: str) -> dict[str, str]:
+    # Clients may keep the response but must revalidate it before reuse
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+class ResponseCacheLookup:
+    """The cached response of a request, if any, and a way to cache a new one."""
+
+    def __init__(self, request: Request, client_id: str) -> None:
+        self.key = (client_id, request.url.path, str(request.query_params))
+        self.if_none_match = request.headers.get("if-none-match")
+        self.generation = response_cache.generation(client_id)
+        self.response: Response | None = None
+
+        if (cached := response_cache.get(self.key)) is not None:
+            self.response = self._respond(cached)
+
+    def _respond(self, cached: CachedResponse) -> Response:
+        if _matches(self.if_none_match, cached.etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=_headers(cached.etag)
+            )
+        return Response(
+            cached.body,
+            status_code=cached.status_code,
+            headers=_headers(cached.etag),
+            media_type=cached.media_type,
+        )
+
+    def store(self, response: Response) -> Response:
+        """Caches a freshly rendered response, unless the client wrote since the
+        lookup, and returns it or a 304 if the client already has it.
+        """
+        body = bytes(response.body)
+        cached = CachedResponse(
+            _etag(body), body, response.status_code, response.media_type
+        )
+        response_cache.set(self.key, cached, len(body), generation=self.generation)
+        return self._respond(cached)
+
+
+async def cached_response(
+    request: Request, client_id: str = Depends(get_client_id_from_api_key)
+) -> ResponseCacheLookup:
+    return ResponseCacheLookup(request, client_id)
@@ -0,0 +1,455 @@
+"""Stores and loads the rounds of Cogspeed tests.
+
+Rounds are either stored as one row per round in `cogspeed_test_rounds`, or,
+in the packed storage mode, as a single columnar blob on the test result row.
+The blob holds a fixed-width array for every numeric column and dictionary
+indexes for the string columns, which makes it several times smaller than the
+row-per-round layout and needs no index of its own. Integer columns and
+dictionary indexes are 32 or 16 bits wide unless a test needs wider ones,
+and integer columns with nulls mark them in a bitmap, so any round stored as
+a row can also be packed.
+
+The rounds of old tests can also be moved out of the database into monthly
+archive files, see app/archive.py. Readers should use `fetch_rounds`, which
+loads rounds from wherever they are stored.
+"""
+
+import struct
+import uuid
+import zlib
+from datetime import datetime
+from typing import Any, Iterable, Literal
+
+import numpy as np
+from sqlalchemy import bindparam, delete, func, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.archive import ArchiveWriter, archive_path, open_archive, read_archived_blob
+from app.models import CogspeedTestRoundModel
+from app.schemas import CogspeedTestResult, CogspeedTestRound
+
+__all__ = [
+    "archive_rounds",
+    "fetch_rounds",
+    "pack_rounds",
+    "pack_stored_rounds",
+    "unpack_round_columns",
+    "unpack_rounds",
+    "unpack_stored_rounds",
+]
+
+MAGIC = b"CR"
+VERSION = 2
+FLAG_ZLIB = 0b1
+
+results_table = CogspeedTestResult.__table__
+rounds_table = CogspeedTestRound.__table__
+
+_PREFIX = struct.Struct("<2sBB")  # magic, version, flags
+_HEADER = struct.Struct("<2sBBI")  # and the number of rounds
+_HEADER_V1 = struct.Struct("<2sBBH")
+# Version 1 blobs store integers as 32 bits, with this value as null
+_NULL_INT_V1 = np.iinfo(np.int32).min
+_INT32 = np.iinfo(np.int32)
+
+# Column kinds, stored as one byte before each column
+_INT = ord("i")
+_INT64 = ord("l")
+_FLOAT = ord("f")
+_STR = ord("s")
+_STR32 = ord("S")
+_UUID = ord("u")
+
+# Dictionary indexes of each width, and the index of null
+_STR_WIDTHS = {_STR: ("<u2", 0xFFFF), _STR32: ("<u4", 0xFFFFFFFF)}
+
+ColumnKind = Literal["int", "float", "str", "uuid"]
+
+COLUMNS: tuple[tuple[str, ColumnKind], ...] = (
+    ("round_number", "int"),
+    ("status", "str"),
+    ("round_type_normalized", "str"),
+    ("answer_location", "int"),
+    ("location_clicked", "int"),
+    ("query_number", "str"),
+    ("duration", "float"),
+    ("correct_rolling_mean_ratio", "str"),
+    ("round_type", "int"),
+    ("time_taken", "float"),
+    ("is_correct_or_incorrect_from_previous", "str"),
+    ("ratio", "float"),
+    ("id", "uuid"),
+    ("time_epoch", "float"),
+)
+
+
+def _is_canonical_uuid(value: str) -> bool:
+    try:
+        return str(uuid.UUID(value)) == value
+    except ValueError:
+        return False
+
+
+def pack_rounds(rounds: list[CogspeedTestRoundModel], compress: bool = True) -> bytes:
+    """Packs the rounds of a test into a columnar blob."""
+    strings: dict[str, int] = {}
+
+    def index(value: Any) -> int:
+        if value is None:
+            return -1
+        return strings.setdefault(str(value), len(strings))
+
+    columns: list[bytes] = []
+    for name, kind in COLUMNS:
+        values = [getattr(r, name) for r in rounds]
+        if kind == "uuid" and not all(map(_is_canonical_uuid, values)):
+            kind = "str"
+
+        if kind == "int":
+            nulls = np.array([v is None for v in values], dtype=bool)
+            ints = np.array([0 if v is None else v for v in values], dtype=np.int64)
+            code, dtype = _INT, "<i4"
+            if len(ints) and (ints.min() < _INT32.min or ints.max() > _INT32.max):
+                code, dtype = _INT64, "<i8"
+            has_nulls = bool(nulls.any())
+            columns.append(bytes([code, has_nulls]) + ints.astype(dtype).tobytes())
+            if has_nulls:
+                columns.append(np.packbits(nulls).tobytes())
+        elif kind == "float":
+            columns.append(bytes([_FLOAT]) + np.array(values, dtype="<f8").tobytes())
+        elif kind == "uuid":
+            columns.append(
+                bytes([_UUID]) + b"".join(uuid.UUID(v).bytes for v in values)
+            )
+        else:
+            indexes = np.array([index(v) for v in values], dtype=np.int64)
+            code = _STR if indexes.max(initial=-1) < 0xFFFF else _STR32
+            dtype, null = _STR_WIDTHS[code]
+            indexes[indexes < 0] = null
+            columns.append(bytes([code]) + indexes.astype(dtype).tobytes())
+
+    dictionary = [struct.pack("<I", len(strings))]
+    for value in strings:
+        encoded = value.encode()
+        dictionary.append(struct.pack("<I", len(encoded)) + encoded)
+
+    body = b"".join(dictionary + columns)
+    flags = 0
+    if compress:
+        body = zlib.compress(body)
+        flags |= FLAG_ZLIB
+    return _HEADER.pack(MAGIC, VERSION, flags, len(rounds)) + body
+
+
+def unpack_round_columns(blob: bytes | memoryview) -> dict[str, np.ndarray | list[Any]]:
+    """Unpacks a blob into arrays for the numeric columns and lists otherwise.
+
+    Nullable integer columns are returned as lists so None can be kept.
+    Blobs of either version of the format are read.
+    """
+    magic, version, flags = _PREFIX.unpack_from(blob)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError("Not a packed rounds blob")
+    header, size = (_HEADER_V1, "<H") if version == 1 else (_HEADER, "<I")
+    *_, n = header.unpack_from(blob)
+    size_bytes = struct.calcsize(size)
+
+    body = memoryview(blob)[header.size :]
+    if flags & FLAG_ZLIB:
+        body = memoryview(zlib.decompress(body))
+
+    (count,) = struct.unpack_from(size, body)
+    offset = size_bytes
+    strings: list[str | None] = []
+    for _ in range(count):
+        (length,) = struct.unpack_from(size, body, offset)
+        offset += size_bytes
+        strings.append(bytes(body[offset : offset + length]).decode())
+        offset += length
+
+    columns: dict[str, np.ndarray | list[Any]] = {}
+    for name, _ in COLUMNS:
+        kind = body[offset]
+        offset += 1
+        if kind in (_INT, _INT64):
+            has_nulls = False
+            if version > 1:
+                has_nulls = bool(body[offset])
+                offset += 1
+            dtype = "<i4" if kind == _INT else "<i8"
+            array = np.frombuffer(body, dtype=dtype, count=n, offset=offset)
+            offset += array.nbytes
+            if version == 1:
+                nulls = array == _NULL_INT_V1
+            elif has_nulls:
+                bitmap = np.frombuffer(
+                    body, dtype=np.uint8, count=(n + 7) // 8, offset=offset
+                )
+                nulls = np.unpackbits(bitmap, count=n).astype(bool)
+                offset += len(bitmap)
+            else:
+                nulls = np.zeros(n, dtype=bool)
+            if nulls.any():
+                columns[name] = [
+                    None if null else v
+                    for v, null in zip(array.tolist(), nulls.tolist())
+                ]
+            else:
+                columns[name] = array
+        elif kind == _FLOAT:
+            columns[name] = np.frombuffer(body, dtype="<f8", count=n, offset=offset)
+            offset += 8 * n
+        elif kind == _UUID:
+            columns[name] = [
+                str(
+                    uuid.UUID(
+                        bytes=bytes(body[offset + 16 * i : offset + 16 * (i + 1)])
+                    )
+                )
+                for i in range(n)
+            ]
+            offset += 16 * n
+        elif kind in _STR_WIDTHS:
+            dtype, null = _STR_WIDTHS[kind]
+            indexes = np.frombuffer(body, dtype=dtype, count=n, offset=offset)
+            offset += indexes.nbytes
+            columns[name] = [
+                None if i == null else strings[i] for i in indexes.tolist()
+            ]
+        else:
+            raise ValueError(f"Unknown column kind {kind!r}")
+
+    return columns
+
+
+def unpack_rounds(blob: bytes | memoryview) -> list[CogspeedTestRoundModel]:
+    """Unpacks a blob into round models."""
+    columns = unpack_round_columns(blob)
+    values = [c.tolist() if isinstance(c, np.ndarray) else c for c in columns.values()]
+    return [
+        CogspeedTestRoundModel.model_validate(dict(zip(columns, row)))
+        for row in zip(*values)
+    ]
+
+
+async def fetch_rounds(
+    session: AsyncSession, client_id: str, test_ids: list[str]
+) -> dict[str, list[CogspeedTestRoundModel]]:
+    """Loads the rounds of the client's tests, whichever way they are stored."""
+    rounds: dict[str, list[CogspeedTestRoundModel]] = {
+        test_id: [] for test_id in test_ids
+    }
+    if not test_ids:
+        return rounds
+
+    query = select(
+        CogspeedTestResult.id,
+        CogspeedTestResult.rounds_blob,
+        CogspeedTestResult.rounds_archive,
+    ).where(
+        CogspeedTestResult.client_id == client_id,
+        CogspeedTestResult.id.in_(test_ids),
+        or_(
+            CogspeedTestResult.rounds_blob.is_not(None),
+            CogspeedTestResult.rounds_archive.is_not(None),
+        ),
+    )
+    for test_id, blob, month in await session.execute(query):
+        if blob is None:
+            blob = read_archived_blob(month, client_id, test_id)
+        if blob is not None:
+            rounds[test_id] = unpack_rounds(blob)
+
+    row_test_ids = [test_id for test_id, r in rounds.items() if not r]
+    if row_test_ids:
+        query = (
+            select(CogspeedTestRound)
+            .where(
+                CogspeedTestRound.client_id == client_id,
+                CogspeedTestRound.test_id.in_(row_test_ids),
+            )
+            .order_by(CogspeedTestRound.test_id, CogspeedTestRound.round_number)
+        )
+        for row in (await session.execute(query)).scalars():
+            rounds[row.test_id].append(
+                CogspeedTestRoundModel.model_validate(row, from_attributes=True)
+            )
+
+    return rounds
+
+
+async def pack_stored_rounds(
+    session_factory: async_sessionmaker[AsyncSession], chunk_size: int = 500
+) -> int:
+    """Moves rounds stored as rows into packed blobs. Returns the number of tests."""
+    rows_exist = (
+        select(CogspeedTestRound.test_id)
+        .where(
+            CogspeedTestRound.client_id == CogspeedTestResult.client_id,
+            CogspeedTestRound.test_id == CogspeedTestResult.id,
+        )
+        .exists()
+    )
+    query = (
+        select(CogspeedTestResult.client_id, CogspeedTestResult.id)
+        .where(CogspeedTestResult.rounds_blob.is_(None), rows_exist)
+        .limit(chunk_size)
+    )
+
+    total = 0
+    while True:
+        async with session_factory() as session:
+            keys = (await session.execute(query)).all()
+            if not keys:
+                return total
+
+            for client_id, test_ids in _group_by_client(keys).items():
+                rounds = await fetch_rounds(session, client_id, test_ids)
+                await session.execute(
+                    update(results_table)
+                    .where(
+                        results_table.c.client_id == bindparam("b_client_id"),
+                        results_table.c.id == bindparam("b_id"),
+                    )
+                    .values(rounds_blob=bindparam("b_blob")),
+                    [
+                        {
+                            "b_client_id": client_id,
+                            "b_id": test_id,
+                            "b_blob": pack_rounds(r),
+                        }
+                        for test_id, r in rounds.items()
+                    ],
+                )
+                await session.execute(
+                    delete(rounds_table).where(
+                        rounds_table.c.client_id == client_id,
+                        rounds_table.c.test_id.in_(test_ids),
+                    )
+                )
+            await session.commit()
+            total += len(keys)
+
+
+async def unpack_stored_rounds(
+    session_factory: async_sessionmaker[AsyncSession], chunk_size: int = 500
+) -> int:
+    """Moves packed rounds back into rows. Returns the number of tests."""
+    query = (
+        select(
+            CogspeedTestResult.client_id,
+            CogspeedTestResult.id,
+            CogspeedTestResult.rounds_blob,
+        )
+        .where(CogspeedTestResult.rounds_blob.is_not(None))
+        .limit(chunk_size)
+    )
+
+    total = 0
+    while True:
+        async with session_factory() as session:
+            tests = (await session.execute(query)).all()
+            if not tests:
+                return total
+
+            rows = [
+                {"client_id": client_id, "test_id": test_id} | r.model_dump()
+                for client_id, test_id, blob in tests
+                for r in unpack_rounds(blob)
+            ]
+            if rows:
+                await session.execute(
+                    sqlite_insert(rounds_table).on_conflict_do_nothing(),
+                    rows,
+                )
+            await session.execute(
+                update(results_table)
+                .where(
+                    results_table.c.client_id == bindparam("b_client_id"),
+                    results_table.c.id == bindparam("b_id"),
+                )
+                .values(rounds_blob=None),
+                [{"b_client_id": c, "b_id": t} for c, t, _ in tests],
+            )
+            await session.commit()
+            total += len(tests)
+
+
+async def archive_rounds(
+    session_factory: async_sessionmaker[AsyncSession],
+    before: datetime,
+    chunk_size: int = 500,
+) -> int:
+    """Moves the rounds of the tests stored before `before` into the archive
+    files of the months they were stored in. Returns the number of tests.
+
+    Each month's file is written before its tests are marked as archived, so
+    if the job is interrupted the tests keep their rounds in the database and
+    are archived again by the next run. Only one job may run at a time.
+    """
+    month = func.strftime("%Y-%m", CogspeedTestResult.created_at)
+    rows_exist = (
+        select(CogspeedTestRound.test_id)
+        .where(
+            CogspeedTestRound.client_id == CogspeedTestResult.client_id,
+            CogspeedTestRound.test_id == CogspeedTestResult.id,
+        )
+        .exists()
+    )
+    query = select(month, CogspeedTestResult.client_id, CogspeedTestResult.id).where(
+        CogspeedTestResult.created_at < before,
+        CogspeedTestResult.rounds_archive.is_(None),
+        or_(CogspeedTestResult.rounds_blob.is_not(None), rows_exist),
+    )
+    async with session_factory() as session:
+        by_month: dict[str, list[tuple[str, str]]] = {}
+        for test_month, client_id, test_id in await session.execute(query):
+            by_month.setdefault(test_month, []).append((client_id, test_id))
+
+    total = 0
+    for test_month, keys in sorted(by_month.items()):
+        chunks = [keys[i : i + chunk_size] for i in range(0, len(keys), chunk_size)]
+
+        with ArchiveWriter(archive_path(test_month)) as writer:
+            # Keep the tests archived by earlier runs
+            if (existing := open_archive(test_month)) is not None:
+                new_keys = set(keys)
+                for (client_id, test_id), blob in existing.items():
+                    if (client_id, test_id) not in new_keys:
+                        writer.add(client_id, test_id, blob)
+
+            for chunk in chunks:
+                async with session_factory() as session:
+                    for client_id, test_ids in _group_by_client(chunk).items():
+                        rounds = await fetch_rounds(session, client_id, test_ids)
+                        for test_id, r in rounds.items():
+                            writer.add(client_id, test_id, pack_rounds(r))
+
+        for chunk in chunks:
+            async with session_factory() as session:
+                for client_id, test_ids in _group_by_client(chunk).items():
+                    await session.execute(
+                        update(results_table)
+                        .where(
+                            results_table.c.client_id == client_id,
+                            results_table.c.id.in_(test_ids),
+                        )
+                        .values(rounds_archive=test_month, rounds_blob=None)
+                    )
+                    await session.execute(
+                        delete(rounds_table).where(
+                            rounds_table.c.client_id == client_id,
+                            rounds_table.c.test_id.in_(test_ids),
+                        )
+                    )
+                await session.commit()
+        total += len(keys)
+    return total
+
+
+def _group_by_client(keys: Iterable[tuple[str, str]]) -> dict[str, list[str]]:
+    grouped: dict[str, list[str]] = {}
+    for client_id, test_id in keys:
+        grouped.setdefault(client_id, []).append(test_id)
+    return grouped
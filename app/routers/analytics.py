@@ -0,0 +1,228 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.analytics import (
+    METRICS,
+    downsample,
+    nullable,
+    rolling,
+    shared_columns,
+    slope_per_day,
+    time_of_day_stats,
+)
+from app.codec import ModelResponse
+from app.config import settings
+from app.database import get_db, get_session_factory
+from app.drilldown import (
+    ROUND_STATUSES,
+    block_transitions,
+    fetch_round_matrix,
+    mean_by_round,
+    status_counts,
+)
+from app.models import (
+    CogspeedBlockTransitionModel,
+    CogspeedRoundsAnalysisModel,
+    CogspeedSeriesModel,
+    CogspeedTestRoundsAnalysisModel,
+    CogspeedTimeOfDayModel,
+    CogspeedTimeOfDayStatsModel,
+    CogspeedTrendModel,
+)
+from app.response_cache import ResponseCacheLookup, cached_response
+from app.security import get_client_id_from_api_key
+
+router = APIRouter(prefix="/clients/cogspeed/analytics")
+
+SINCE = Query(None, description="Only tests on or after this date")
+UNTIL = Query(None, description="Only tests before this date")
+MAX_POINTS = Query(
+    None,
+    ge=3,
+    description="Downsample each line to about this many points, e.g. the chart's "
+    "width in pixels, keeping its shape with largest-triangle-three-buckets",
+)
+
+
+def parse_metrics(metrics: str) -> list[str]:
+    names = list(dict.fromkeys(name.strip() for name in metrics.split(",")))
+    if unknown := [name for name in names if name not in METRICS]:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown metrics: {', '.join(unknown)}",
+        )
+    return names
+
+
+@router.get("/time-of-day", response_model=CogspeedTimeOfDayStatsModel)
+async def get_time_of_day_stats(
+    metric: str = "blocking_round_duration",
+    confidence: float = Query(0.95, gt=0, lt=1),
+    since: str | None = SINCE,
+    until: str | None = UNTIL,
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+    client_id: str = Depends(get_client_id_from_api_key),
+    cache: ResponseCacheLookup = Depends(cached_response),
+) -> Response:
+    """Returns the mean and confidence interval of a metric for the tests taken
+    in the morning (06-12 UTC), at midday (12-17), in the evening (17-23) and
+    at night.
+    """
+    if cache.response is not None:
+        return cache.response
+
+    (metric,) = parse_metrics(metric)
+    _, times, values = await shared_columns(
+        session_factory, client_id, [metric], since, until
+    )
+    buckets = time_of_day_stats(times, values[metric], confidence)
+    response = ModelResponse(
+        CogspeedTimeOfDayStatsModel(
+            metric=metric,
+            confidence=confidence,
+            buckets=[CogspeedTimeOfDayModel(**bucket) for bucket in buckets],
+        )
+    )
+    return cache.store(response)
+
+
+@router.get("/trend", response_model=CogspeedTrendModel)
+async def get_trend(
+    metric: str = "blocking_round_duration",
+    window: int = Query(7, ge=1, le=365),
+    since: str | None = SINCE,
+    until: str | None = UNTIL,
+    max_points: int | None = MAX_POINTS,
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+    client_id: str = Depends(get_client_id_from_api_key),
+    cache: ResponseCacheLookup = Depends(cached_response),
+) -> Response:
+    """Returns a metric with its rolling mean and standard deviation over the
+    last `window` tests, and its overall change per day. Downsampling only
+    drops points from the response, the statistics use every test.
+    """
+    if cache.response is not None:
+        return cache.response
+
+    (metric,) = parse_metrics(metric)
+    dates, times, values = await shared_columns(
+        session_factory, client_id, [metric], since, until
+    )
+    mean, std = rolling(values[metric], window)
+    slope = slope_per_day(times, values[metric])
+    series = values[metric]
+    if (keep := downsample(times, [series, mean], max_points)) is not None:
+        dates = [dates[i] for i in keep.tolist()]
+        series, mean, std = series[keep], mean[keep], std[keep]
+    response = ModelResponse(
+        CogspeedTrendModel(
+            metric=metric,
+            window=window,
+            slope_per_day=slope,
+            dates=dates,
+            values=nullable(series),
+            rolling_mean=nullable(mean),
+            rolling_std=nullable(std),
+        )
+    )
+    return cache.store(response)
+
+
+@router.get("/series", response_model=CogspeedSeriesModel)
+async def get_series(
+    metrics: str = Query(
+        "blocking_round_duration", description="Comma separated metrics"
+    ),
+    since: str | None = SINCE,
+    until: str | None = UNTIL,
+    max_points: int | None = MAX_POINTS,
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+    client_id: str = Depends(get_client_id_from_api_key),
+    cache: ResponseCacheLookup = Depends(cached_response),
+) -> Response:
+    """Returns the time series of one or more metrics, as columns. When
+    downsampled, `max_points` is split between the metrics and the points kept
+    for any metric are kept for all of them.
+    """
+    if cache.response is not None:
+        return cache.response
+
+    names = parse_metrics(metrics)
+    dates, times, values = await shared_columns(
+        session_factory, client_id, names, since, until
+    )
+    keep = downsample(times, [values[name] for name in names], max_points)
+    if keep is not None:
+        dates = [dates[i] for i in keep.tolist()]
+        values = {name: values[name][keep] for name in names}
+    response = ModelResponse(
+        CogspeedSeriesModel(
+            dates=dates,
+            series={name: nullable(values[name]) for name in names},
+        )
+    )
+    return cache.store(response)
+
+
+@router.get("/rounds", response_model=CogspeedRoundsAnalysisModel)
+async def get_rounds_analysis(
+    test_ids: str = Query(..., description="Comma separated test IDs"),
+    db: AsyncSession = Depends(get_db),
+    client_id: str = Depends(get_client_id_from_api_key),
+    cache: ResponseCacheLookup = Depends(cached_response),
+) -> Response:
+    """Returns the rounds of one or more tests: the response time and ratios
+    of each round, how many rounds were correct, incorrect or unanswered, and
+    where the machine-paced blocks changed speed.
+    """
+    if cache.response is not None:
+        return cache.response
+
+    ids = list(dict.fromkeys(t.strip() for t in test_ids.split(",") if t.strip()))
+    if len(ids) > settings.rounds_analysis_max_tests:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.rounds_analysis_max_tests} tests can be analysed at once.",
+        )
+
+    matrix = await fetch_round_matrix(db, client_id, ids)
+    if missing := [t for t in ids if t not in matrix.test_ids]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tests not found: {', '.join(missing)}",
+        )
+
+    counts = status_counts(matrix).tolist()
+    paced_counts = status_counts(matrix, machine_paced=True).tolist()
+    transitions: list[list[CogspeedBlockTransitionModel]] = [[] for _ in ids]
+    for test, round_number, before, after in zip(
+        *(column.tolist() for column in block_transitions(matrix))
+    ):
+        transitions[test].append(
+            CogspeedBlockTransitionModel(
+                round_number=round_number, from_duration=before, to_duration=after
+            )
+        )
+
+    tests = []
+    for i, (test_id, n) in enumerate(zip(matrix.test_ids, matrix.counts.tolist())):
+        tests.append(
+            CogspeedTestRoundsAnalysisModel(
+                test_id=test_id,
+                round_numbers=matrix.round_number[i, :n].astype(int).tolist(),
+                round_types=matrix.round_type[i, :n].tolist(),
+                statuses=matrix.status[i, :n].tolist(),
+                response_times=nullable(matrix.time_taken[i, :n]),
+                rolling_mean_ratios=nullable(matrix.rolling_mean_ratio[i, :n]),
+                ratios=nullable(matrix.ratio[i, :n]),
+                status_counts=dict(zip(ROUND_STATUSES, counts[i])),
+                machine_paced_status_counts=dict(zip(ROUND_STATUSES, paced_counts[i])),
+                block_transitions=transitions[i],
+            )
+        )
+    response = ModelResponse(
+        CogspeedRoundsAnalysisModel(
+            tests=tests, mean_response_times=nullable(mean_by_round(matrix.time_taken))
+        )
+    )
+    return cache.store(response)
@@ -1,12 +1,14 @@
 import secrets
 import uuid
 
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.codec import ModelResponse, json_body, json_body_openapi
 from app.database import get_db
 from app.models import ClientCreateModel, LoginBodyModel, LoginResponseModel
+from app.response_cache import ResponseCacheLookup, cached_response
 from app.schemas import Client
 from app.security import get_client_id_from_api_key
 from app.utils import create_hash
@@ -14,10 +16,15 @@ from app.utils import create_hash
 router = APIRouter()
 
 
-@router.post("/clients/login")
+@router.post(
+    "/clients/login",
+    response_model=LoginResponseModel,
+    openapi_extra=json_body_openapi(LoginBodyModel),
+)
 async def login(
-    body: LoginBodyModel, db: AsyncSession = Depends(get_db)
-) -> LoginResponseModel:
+    body: LoginBodyModel = Depends(json_body(LoginBodyModel)),
+    db: AsyncSession = Depends(get_db),
+) -> ModelResponse:
     hash_password = create_hash(body.password)
     email_address = body.email.lower().strip()
 
@@ -29,17 +36,27 @@ async def login(
     client = result.scalar_one_or_none()
 
     if client is None:
-        return LoginResponseModel(
-            success=False, error="Client does not exist", client=None
+        return ModelResponse(
+            LoginResponseModel(
+                success=False, error="Client does not exist", client=None
+            )
         )
 
-    return LoginResponseModel(success=True, client=client, error=None)  # type: ignore
+    return ModelResponse(
+        LoginResponseModel(success=True, client=client, error=None)  # type: ignore
+    )
 
 
-@router.post("/clients/signup", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/clients/signup",
+    status_code=status.HTTP_201_CREATED,
+    response_model=LoginResponseModel,
+    openapi_extra=json_body_openapi(ClientCreateModel),
+)
 async def client_signup(
-    client: ClientCreateModel, db: AsyncSession = Depends(get_db)
-) -> LoginResponseModel:
+    client: ClientCreateModel = Depends(json_body(ClientCreateModel)),
+    db: AsyncSession = Depends(get_db),
+) -> ModelResponse:
     query = select(Client).where(Client.email == client.email.lower().strip())
     result = await db.execute(query)
     existing_client = result.scalar_one_or_none()
@@ -62,21 +79,37 @@ async def client_signup(
     await db.commit()
     await db.refresh(db_client)
 
-    return LoginResponseModel(success=True, error=None, client=db_client)  # type: ignore
+    return ModelResponse(
+        LoginResponseModel(success=True, error=None, client=db_client),  # type: ignore
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
-@router.get("/clients/fetch", status_code=status.HTTP_200_OK)
+@router.get(
+    "/clients/fetch",
+    status_code=status.HTTP_200_OK,
+    response_model=LoginResponseModel,
+)
 async def get_client(
     x_api_key: str = Header(),
     client_id: str = Depends(get_client_id_from_api_key),
     db: AsyncSession = Depends(get_db),
-) -> LoginResponseModel:
+    cache: ResponseCacheLookup = Depends(cached_response),
+) -> Response:
+    if cache.response is not None:
+        return cache.response
+
     query = select(Client).where(
         Client.client_id == client_id, Client.api_key == x_api_key
     )
     result = await db.execute(query)
     client = result.scalar_one_or_none()
     if not client:
-        return LoginResponseModel(success=False, error="Client not found", client=None)
+        return ModelResponse(
+            LoginResponseModel(success=False, error="Client not found", client=None)
+        )
 
-    return LoginResponseModel(success=True, error=None, client=client)  # type: ignore
+    response = ModelResponse(
+        LoginResponseModel(success=True, error=None, client=client)  # type: ignore
+    )
+    return cache.store(response)
@@ -1,36 +1,299 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import base64
+import binascii
+import json
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import TTLCache
+from app.codec import ModelResponse, json_body, json_body_openapi
+from app.config import settings
 from app.database import get_db
-from app.models import CogspeedTestResultModel
-from app.schemas import CogspeedTestResult, CogspeedTestRound
+from app.ingestion import insert_tests
+from app.models import (
+    CogspeedSummaryModel,
+    CogspeedTestBatchItemModel,
+    CogspeedTestPageModel,
+    CogspeedTestResultModel,
+)
+from app.response_cache import (
+    ResponseCacheLookup,
+    cached_response,
+    invalidate_client_responses,
+)
+from app.rounds import fetch_rounds
+from app.schemas import CogspeedTestResult
 from app.security import get_client_id_from_api_key
+from app.summary import fetch_summary
+from app.write_queue import CogspeedWriteQueue, get_write_queue
 
 
 router = APIRouter()
 
+# Maps (client ID, Idempotency-Key) to the ID of the test uploaded with that key
+idempotency_keys: TTLCache[tuple[str, str], str] = TTLCache(
+    maxsize=settings.idempotency_cache_size, ttl=settings.idempotency_key_ttl
+)
+
+
+RESULT_FIELDS = tuple(
+    name for name in CogspeedTestResultModel.model_fields if name != "rounds"
+)
+
 
-@router.post("/clients/cogspeed/tests", status_code=status.HTTP_201_CREATED)
+def client_id_mismatch(client_id: str, test: CogspeedTestResultModel) -> str:
+    return f"The client ID in the header ('{client_id}') does not match the client ID in the body ('{test.client_id}')."
+
+
+@router.post(
+    "/clients/cogspeed/tests",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=json_body_openapi(CogspeedTestResultModel),
+)
 async def post_cogspeed_test(
-    test: CogspeedTestResultModel,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    idempotency_key: str | None = Header(None),
+    write_queue: CogspeedWriteQueue = Depends(get_write_queue),
     client_id: str = Depends(get_client_id_from_api_key),
+    test: CogspeedTestResultModel = Depends(json_body(CogspeedTestResultModel)),
 ) -> int:
+    """Uploads a test.
+
+    Uploading a test which is already stored, e.g. when a client retries after
+    a timeout, responds with 200 instead of 201 and writes nothing.
+    """
     if client_id != test.client_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"The client ID in the header ('{client_id}') does not match the client ID in the body ('{test.client_id}').",
+            detail=client_id_mismatch(client_id, test),
         )
 
-    metadata = {"client_id": test.client_id, "test_id": test.id}
-    rounds = [metadata | r.model_dump() for r in test.rounds]
+    if idempotency_key is not None:
+        key = (client_id, idempotency_key)
+        if (test_id := idempotency_keys.get(key)) is not None:
+            if test_id != test.id:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="The Idempotency-Key was already used for another test.",
+                )
+            response.status_code = status.HTTP_200_OK
+            return status.HTTP_200_OK
 
-    db_cogspeed_test_result = CogspeedTestResult(
-        rounds=[CogspeedTestRound(**r) for r in rounds],
-        **test.model_dump(exclude={"rounds"}),
-    )
-    db.add(db_cogspeed_test_result)
-    await db.commit()
-    await db.refresh(db_cogspeed_test_result)
+    stored = await write_queue.submit(test)
+    if stored:
+        invalidate_client_responses(client_id)
+
+    if idempotency_key is not None:
+        idempotency_keys.set((client_id, idempotency_key), test.id)
 
+    if not stored:
+        response.status_code = status.HTTP_200_OK
+        return status.HTTP_200_OK
     return status.HTTP_201_CREATED
+
+
+@router.post(
+    "/clients/cogspeed/tests/batch",
+    status_code=status.HTTP_201_CREATED,
+    response_model=list[CogspeedTestBatchItemModel],
+    openapi_extra=json_body_openapi(list[CogspeedTestResultModel]),
+)
+async def post_cogspeed_tests_batch(
+    db: AsyncSession = Depends(get_db),
+    client_id: str = Depends(get_client_id_from_api_key),
+    tests: list[CogspeedTestResultModel] = Depends(
+        json_body(list[CogspeedTestResultModel])
+    ),
+) -> ModelResponse:
+    """Uploads many tests at once, e.g. when a device syncs tests run offline.
+
+    The tests are written in one transaction and a status is returned for each.
+    Tests which are already stored are skipped.
+    """
+    if len(tests) > settings.upload_batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.upload_batch_max_size} tests can be uploaded at once.",
+        )
+
+    items: list[CogspeedTestBatchItemModel | None] = []
+    accepted: list[CogspeedTestResultModel] = []
+    seen: set[str] = set()
+    for test in tests:
+        if client_id != test.client_id:
+            item = CogspeedTestBatchItemModel(
+                id=test.id,
+                status="rejected",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=client_id_mismatch(client_id, test),
+            )
+        elif test.id in seen:
+            item = CogspeedTestBatchItemModel(
+                id=test.id,
+                status="duplicate",
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The test appears more than once in the batch.",
+            )
+        else:
+            accepted.append(test)
+            seen.add(test.id)
+            item = None
+        items.append(item)
+
+    stored_flags = await insert_tests(db, accepted)
+    await db.commit()
+    if any(stored_flags):
+        invalidate_client_responses(client_id)
+    stored = iter(stored_flags)
+
+    for i, test in enumerate(tests):
+        if items[i] is not None:
+            continue
+        if next(stored):
+            items[i] = CogspeedTestBatchItemModel(
+                id=test.id, status="created", status_code=status.HTTP_201_CREATED
+            )
+        else:
+            items[i] = CogspeedTestBatchItemModel(
+                id=test.id, status="already_stored", status_code=status.HTTP_200_OK
+            )
+
+    return ModelResponse(
+        items,
+        status_code=status.HTTP_201_CREATED,
+        tp=list[CogspeedTestBatchItemModel],
+    )
+
+
+def encode_cursor(date: str, test_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([date, test_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        date, test_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return str(date), str(test_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from None
+
+
+def parse_fields(fields: str | None) -> list[str]:
+    """Returns the requested result fields, always including the cursor fields."""
+    if fields is None:
+        return list(RESULT_FIELDS)
+
+    names = ["id", "date"]
+    for name in fields.split(","):
+        if (name := name.strip()) and name not in names:
+            names.append(name)
+
+    if unknown := [name for name in names if name not in RESULT_FIELDS]:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields: {', '.join(unknown)}",
+        )
+    return names
+
+
+@router.get(
+    "/clients/cogspeed/tests",
+    response_model=CogspeedTestPageModel,
+)
+async def get_cogspeed_tests(
+    limit: int = Query(50, ge=1, le=settings.history_page_max_size),
+    cursor: str | None = Query(None, description="The next_cursor of the last page"),
+    since: str | None = Query(None, description="Only tests on or after this date"),
+    until: str | None = Query(None, description="Only tests before this date"),
+    fields: str | None = Query(
+        None, description="Comma separated fields to return, all fields by default"
+    ),
+    include_rounds: bool = Query(False, description="Include the rounds of each test"),
+    order: Literal["asc", "desc"] = "desc",
+    db: AsyncSession = Depends(get_db),
+    client_id: str = Depends(get_client_id_from_api_key),
+    cache: ResponseCacheLookup = Depends(cached_response),
+) -> Response:
+    """Pages through the client's tests, ordered by date.
+
+    Pages are fetched with keyset pagination on (date, id), so every page costs
+    the same however deep it is. Dates are compared as the ISO 8601 strings sent
+    by the app.
+    """
+    if cache.response is not None:
+        return cache.response
+
+    names = parse_fields(fields)
+    key = tuple_(CogspeedTestResult.date, CogspeedTestResult.id)
+
+    query = select(*(getattr(CogspeedTestResult, name) for name in names)).where(
+        CogspeedTestResult.client_id == client_id
+    )
+    if since is not None:
+        query = query.where(CogspeedTestResult.date >= since)
+    if until is not None:
+        query = query.where(CogspeedTestResult.date < until)
+    if cursor is not None:
+        after = tuple_(*decode_cursor(cursor))
+        query = query.where(key < after if order == "desc" else key > after)
+
+    if order == "desc":
+        query = query.order_by(
+            CogspeedTestResult.date.desc(), CogspeedTestResult.id.desc()
+        )
+    else:
+        query = query.order_by(CogspeedTestResult.date, CogspeedTestResult.id)
+
+    rows = (await db.execute(query.limit(limit + 1))).mappings().all()
+    items = [dict(row) for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1]["date"], items[-1]["id"])
+
+    if include_rounds:
+        rounds = await fetch_rounds(db, client_id, [item["id"] for item in items])
+        for item in items:
+            item["rounds"] = [r.model_dump() for r in rounds[item["id"]]]
+
+    response = ModelResponse(
+        CogspeedTestPageModel(items=items, next_cursor=next_cursor)
+    )
+    return cache.store(response)
+
+
+@router.get(
+    "/clients/cogspeed/summary",
+    response_model=list[CogspeedSummaryModel],
+)
+async def get_cogspeed_summary(
+    confidence: float = Query(0.95, gt=0, lt=1),
+    db: AsyncSession = Depends(get_db),
+    client_id: str = Depends(get_client_id_from_api_key),
+    cache: ResponseCacheLookup = Depends(cached_response),
+) -> Response:
+    """Returns the running statistics of the client's tests, per metric and time
+    of day. Reads one precomputed row per statistic, whatever the history size.
+    """
+    if cache.response is not None:
+        return cache.response
+
+    summary = await fetch_summary(db, client_id)
+    items = [
+        CogspeedSummaryModel(
+            metric=metric,
+            bucket=bucket,
+            count=s.count,
+            mean=s.mean,
+            std=s.std,
+            ci=s.ci(confidence),
+            min=s.min,
+            max=s.max,
+        )
+        for (metric, bucket), s in sorted(summary.items())
+    ]
+    response = ModelResponse(items, tp=list[CogspeedSummaryModel])
+    return cache.store(response)
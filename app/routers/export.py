@@ -0,0 +1,98 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.database import get_db, get_session_factory
+from app.export import (
+    EXPORT_FORMATS,
+    ExportFormat,
+    ExportKind,
+    format_watermark,
+    get_watermark,
+    iter_export,
+    parquet_available,
+    parse_watermark,
+)
+from app.security import get_client_id_from_api_key, verify_admin_key
+
+router = APIRouter()
+
+SINCE_DESCRIPTION = (
+    "Only tests stored at or after this time, "
+    "e.g. the X-Export-Watermark of the previous export"
+)
+
+
+async def export_response(
+    db: AsyncSession,
+    session_factory: async_sessionmaker[AsyncSession],
+    format: ExportFormat,
+    kind: ExportKind,
+    client_id: str | None,
+    since: datetime | None,
+) -> StreamingResponse:
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Parquet exports need pyarrow, install the export extra.",
+        )
+
+    watermark = await get_watermark(db, settings.export_watermark_lag)
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"cogspeed-{kind}-{watermark.replace(' ', 'T').replace(':', '')}"
+    return StreamingResponse(
+        iter_export(
+            session_factory,
+            format,
+            kind,
+            client_id,
+            None if since is None else parse_watermark(since),
+            watermark,
+            settings.export_chunk_size,
+        ),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{extension}"',
+            "X-Export-Watermark": format_watermark(watermark),
+        },
+    )
+
+
+@router.get("/clients/cogspeed/export", response_class=StreamingResponse)
+async def export_client_cogspeed(
+    format: ExportFormat = "ndjson",
+    kind: ExportKind = "results",
+    since: datetime | None = Query(None, description=SINCE_DESCRIPTION),
+    db: AsyncSession = Depends(get_db),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+    client_id: str = Depends(get_client_id_from_api_key),
+) -> StreamingResponse:
+    """Streams the client's test results or rounds.
+
+    The X-Export-Watermark response header marks the end of the export; passing
+    it as `since` to the next export returns only the tests stored in between.
+    """
+    return await export_response(db, session_factory, format, kind, client_id, since)
+
+
+@router.get(
+    "/admin/cogspeed/export",
+    response_class=StreamingResponse,
+    dependencies=[Depends(verify_admin_key)],
+)
+async def export_cogspeed(
+    format: ExportFormat = "ndjson",
+    kind: ExportKind = "results",
+    since: datetime | None = Query(None, description=SINCE_DESCRIPTION),
+    client_id: str | None = Query(None, description="Only this client's tests"),
+    db: AsyncSession = Depends(get_db),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> StreamingResponse:
+    """Streams the test results or rounds of every client, e.g. for a cohort.
+
+    Uses the same X-Export-Watermark as the client export.
+    """
+    return await export_response(db, session_factory, format, kind, client_id, since)
@@ -0,0 +1,24 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.response_cache import response_cache
+from app.security import api_key_cache, verify_admin_key
+from app.singleflight import single_flight
+from app.write_queue import write_queue
+
+router = APIRouter(dependencies=[Depends(verify_admin_key)])
+
+
+@router.get("/metrics")
+async def get_metrics() -> dict[str, Any]:
+    """Returns the counters of the in-process caches and queues."""
+    return {
+        "auth_cache": api_key_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "write_queue": {
+            "submitted": write_queue.submitted,
+            "batches": write_queue.batches,
+        },
+    }
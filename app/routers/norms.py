@@ -0,0 +1,69 @@
+import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.codec import ModelResponse
+from app.database import get_db, get_session_factory
+from app.models import CogspeedCohortModel, CogspeedPercentileModel
+from app.norms import client_cohort, find_norm, get_demographics
+from app.security import get_client_id_from_api_key
+from app.summary import fetch_summary
+
+router = APIRouter()
+
+
+def get_today() -> datetime.date:
+    """Returns the date clients' ages are taken on."""
+    return datetime.date.today()
+
+
+@router.get(
+    "/clients/cogspeed/norms/percentile", response_model=CogspeedPercentileModel
+)
+async def get_percentile(
+    metric: Literal[
+        "blocking_round_duration", "cognitive_processing_index"
+    ] = "blocking_round_duration",
+    value: float | None = Query(
+        None, description="The value to rank, the client's mean by default"
+    ),
+    db: AsyncSession = Depends(get_db),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+    client_id: str = Depends(get_client_id_from_api_key),
+    today: datetime.date = Depends(get_today),
+) -> ModelResponse:
+    """Ranks a value among the tests of clients of the same age band, gender and
+    handedness. Falls back to wider cohorts while the client's has few tests.
+    """
+    if value is None:
+        summary = (await fetch_summary(db, client_id)).get((metric, "all"))
+        if summary is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="The client has no tests to rank",
+            )
+        value = summary.mean
+
+    demographics = (await get_demographics(db, [client_id]))[client_id]
+    cohort = client_cohort(demographics, today)
+    if (norm := await find_norm(session_factory, cohort, metric)) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No norms have been computed yet",
+        )
+
+    (age_band, gender, handedness), digest = norm
+    return ModelResponse(
+        CogspeedPercentileModel(
+            metric=metric,
+            value=value,
+            percentile=100 * digest.cdf(value),
+            median=digest.quantile(0.5),
+            cohort=CogspeedCohortModel(
+                age_band=age_band, gender=gender, handedness=handedness
+            ),
+            cohort_size=round(digest.count),
+        )
+    )
@@ -10,13 +10,22 @@ from sqlalchemy import (
     Float,
     ForeignKey,
     ForeignKeyConstraint,
+    Index,
     Integer,
+    LargeBinary,
     String,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
-__all__ = ["Base", "Client", "CogspeedTestResult", "CogspeedTestRound"]
+__all__ = [
+    "Base",
+    "Client",
+    "ClientCogspeedSummary",
+    "CogspeedNorm",
+    "CogspeedTestResult",
+    "CogspeedTestRound",
+]
 
 
 class Base(DeclarativeBase):
@@ -62,11 +71,21 @@ class Client(Base):
     test_results: Mapped[list["CogspeedTestResult"]] = relationship(
         back_populates="client", cascade="all, delete-orphan"
     )
+    cogspeed_summary: Mapped[list["ClientCogspeedSummary"]] = relationship(
+        back_populates="client", cascade="all, delete-orphan"
+    )
 
 
 class CogspeedTestResult(Base):
     __tablename__ = "cogspeed_test_results"
 
+    # Supports keyset pagination of a client's history on (date, id)
+    __table_args__ = (
+        Index("ix_cogspeed_test_results_client_date_id", "client_id", "date", "id"),
+        # Supports incremental exports of the tests stored since a watermark
+        Index("ix_cogspeed_test_results_created_at", "created_at"),
+    )
+
     id: Mapped[str] = mapped_column(String, primary_key=True)
     client_id: Mapped[str] = mapped_column(
         ForeignKey("clients.client_id"), primary_key=True
@@ -110,6 +129,11 @@ class CogspeedTestResult(Base):
     local_date: Mapped[str] = mapped_column(String)
     local_time: Mapped[str] = mapped_column(String)
 
+    # Rounds packed into a columnar blob, see app/rounds.py
+    rounds_blob: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    # The month of the archive file holding the rounds, see app/archive.py
+    rounds_archive: Mapped[str | None] = mapped_column(String, nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
@@ -152,3 +176,47 @@ class CogspeedTestRound(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
+
+
+class ClientCogspeedSummary(Base):
+    """Running statistics of a metric over a client's tests, see app/summary.py."""
+
+    __tablename__ = "client_cogspeed_summary"
+
+    client_id: Mapped[str] = mapped_column(
+        ForeignKey("clients.client_id"), primary_key=True
+    )
+    client: Mapped["Client"] = relationship(back_populates="cogspeed_summary")
+    metric: Mapped[str] = mapped_column(String, primary_key=True)
+    # "all", or the time of day the tests were taken
+    bucket: Mapped[str] = mapped_column(String, primary_key=True)
+
+    count: Mapped[int] = mapped_column(Integer)
+    mean: Mapped[float] = mapped_column(Float)
+    # Sum of squared differences from the mean
+    m2: Mapped[float] = mapped_column(Float)
+    min: Mapped[float] = mapped_column(Float)
+    max: Mapped[float] = mapped_column(Float)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class CogspeedNorm(Base):
+    """A quantile sketch of a metric over a cohort's tests, see app/norms.py."""
+
+    __tablename__ = "cogspeed_norms"
+
+    # "*" matches every value of the dimension
+    age_band: Mapped[str] = mapped_column(String, primary_key=True)
+    gender: Mapped[str] = mapped_column(String, primary_key=True)
+    handedness: Mapped[str] = mapped_column(String, primary_key=True)
+    metric: Mapped[str] = mapped_column(String, primary_key=True)
+
+    count: Mapped[int] = mapped_column(Integer)
+    digest: Mapped[bytes] = mapped_column(LargeBinary)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -1,17 +1,37 @@
-"""Implements dependency injections for API keys."""
+"""Implements dependency injections for API keys.
+
+Verified (client ID, API key) pairs are cached for a short time so most
+authenticated requests do not need a database round trip. The cache is
+invalidated whenever a client is updated or deleted through the ORM; other
+writers (and other worker processes) are covered by the cache TTL.
+"""
+
+import secrets
 
 from fastapi import Depends, Header, status, HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import TTLCache, on_client_changed
+from app.config import settings
 from app.database import get_db
 from app.schemas import Client
 
+api_key_cache: TTLCache[tuple[str, str], str] = TTLCache(
+    maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl
+)
+
 
 def verify_api_key(api_key: str, hashed_key: str) -> bool:
     return api_key == hashed_key
 
 
+@on_client_changed
+def invalidate_client(client_id: str) -> None:
+    """Forgets every cached API key of the client."""
+    api_key_cache.invalidate(lambda key: key[0] == client_id)
+
+
 async def get_client_id_from_api_key(
     x_api_key: str = Header(),
     x_client_id: str = Header(),
@@ -27,13 +47,33 @@ async def get_client_id_from_api_key(
             detail="Missing X-API-Key or X-Client-ID header",
         )
 
-    query = select(Client).where(Client.client_id == x_client_id)
+    if (client_id := api_key_cache.get((x_client_id, x_api_key))) is not None:
+        return client_id
+
+    query = select(Client.client_id, Client.api_key).where(
+        Client.client_id == x_client_id
+    )
     result = await db.execute(query)
-    client = result.scalars().first()
+    client = result.first()
     if not client or not verify_api_key(x_api_key, client.api_key):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid Client ID or API Key",
         )
 
+    api_key_cache.set((x_client_id, x_api_key), client.client_id)
     return client.client_id
+
+
+async def verify_admin_key(x_admin_key: str = Header()) -> None:
+    """Dependency function to authenticate requests to admin-only endpoints."""
+    if settings.admin_api_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled",
+        )
+    if not secrets.compare_digest(x_admin_key, settings.admin_api_key):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid Admin Key",
+        )
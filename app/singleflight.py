@@ -0,0 +1,58 @@
+"""Coalesces identical concurrent computations into one.
+
+When many requests ask for the same expensive result at once, e.g. when a
+study session ends and every researcher opens the same views, only the first
+runs the computation; the others await the same task and get the same result.
+The task runs independently of the request which started it, so a caller
+disconnecting does not cancel it for the rest, and it must open its own
+database session rather than borrow a request's.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+__all__ = ["SingleFlight", "single_flight"]
+
+V = TypeVar("V")
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time.
+
+    Keys are tuples whose first item names the kind of computation, which the
+    counters are kept per.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: dict[Hashable, asyncio.Future[Any]] = {}
+        self.calls: dict[str, int] = {}
+        self.executions: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def do(self, key: tuple[Any, ...], compute: Callable[[], Awaitable[V]]) -> V:
+        kind = key[0]
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+
+        task = self._tasks.get(key)
+        if task is None:
+            self.executions[kind] = self.executions.get(kind, 0) + 1
+            task = asyncio.ensure_future(compute())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Returns the calls, executions and calls deduplicated of each kind."""
+        return {
+            kind: {
+                "calls": calls,
+                "executions": self.executions[kind],
+                "shared": calls - self.executions[kind],
+            }
+            for kind, calls in self.calls.items()
+        }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,133 @@
+"""Implements a mergeable t-digest quantile sketch.
+
+A t-digest summarises a distribution as a bounded number of weighted
+centroids which are small near the tails and larger near the median, so
+extreme percentiles stay accurate. Digests of disjoint sets of values merge
+into the digest of their union, which lets every insert update a stored
+digest without reading the values it was built from.
+
+See Dunning & Ertl, "Computing Extremely Accurate Quantiles Using t-Digests".
+"""
+
+import struct
+from functools import cached_property
+from typing import Any
+
+import numpy as np
+
+__all__ = ["TDigest"]
+
+MAGIC = b"TD"
+VERSION = 1
+
+# magic, version, compression, number of centroids, minimum, maximum
+_HEADER = struct.Struct("<2sBHIdd")
+
+
+class TDigest:
+    """A t-digest holding at most about `compression` centroids."""
+
+    def __init__(
+        self,
+        compression: int = 100,
+        means: np.ndarray | None = None,
+        weights: np.ndarray | None = None,
+        min: float = np.inf,
+        max: float = -np.inf,
+    ) -> None:
+        self.compression = compression
+        self.means = np.empty(0) if means is None else means
+        self.weights = np.empty(0) if weights is None else weights
+        self.min = min
+        self.max = max
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def add(self, values: Any) -> None:
+        """Adds an array of values."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(len(values))]),
+        )
+
+    def merge(self, other: "TDigest") -> None:
+        if not len(other.means):
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        """Merges centroids whose quantiles fall in the same unit of the k1
+        scale function, which bounds the size of each centroid by its quantile.
+        """
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        total = weights.sum()
+        midpoints = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * midpoints - 1)
+        groups = np.floor(k - k[0]).astype(np.int64)
+
+        starts = np.flatnonzero(np.diff(groups, prepend=-1))
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+        self.__dict__.pop("_curve", None)
+
+    @cached_property
+    def _curve(self) -> tuple[np.ndarray, np.ndarray]:
+        """The piecewise linear CDF through the centroids and the extremes."""
+        total = self.weights.sum()
+        centres = (np.cumsum(self.weights) - self.weights / 2) / total
+        xs = np.concatenate([[self.min], self.means, [self.max]])
+        qs = np.concatenate([[0.0], centres, [1.0]])
+        return xs, qs
+
+    def cdf(self, value: float) -> float:
+        """Returns the fraction of values at or below `value`."""
+        if not len(self.means):
+            return float("nan")
+        xs, qs = self._curve
+        return float(np.interp(value, xs, qs))
+
+    def quantile(self, q: float) -> float:
+        if not len(self.means):
+            return float("nan")
+        xs, qs = self._curve
+        return float(np.interp(q, qs, xs))
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(
+            MAGIC, VERSION, self.compression, len(self.means), self.min, self.max
+        )
+        return (
+            header
+            + self.means.astype("<f8").tobytes()
+            + self.weights.astype("<f8").tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        magic, version, compression, n, min, max = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a t-digest")
+        body = np.frombuffer(data, dtype="<f8", count=2 * n, offset=_HEADER.size)
+        return cls(
+            compression,
+            body[:n].astype(np.float64),
+            body[n:].astype(np.float64),
+            min,
+            max,
+        )
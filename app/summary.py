@@ -0,0 +1,245 @@
+"""Maintains running statistics of each client's Cogspeed tests.
+
+For every client, metric and time of day bucket, `client_cogspeed_summary`
+holds the count, mean, sum of squared differences from the mean (M2), minimum
+and maximum of the metric. The ingestion path merges the statistics of newly
+stored tests into these rows, so reading a client's means and confidence
+intervals costs the same however many tests the client has.
+
+Statistics are combined with Welford's online algorithm and the pairwise
+update of Chan et al., which stay accurate where the textbook
+sum-of-squares formula loses precision.
+"""
+
+import math
+from typing import Any, Iterable, Mapping
+
+from scipy import stats
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.schemas import ClientCogspeedSummary, CogspeedTestResult
+from app.utils import parse_test_date
+
+__all__ = [
+    "SUMMARY_METRICS",
+    "RunningStats",
+    "fetch_summary",
+    "rebuild_summaries",
+    "summarise",
+    "time_of_day",
+    "update_summaries",
+]
+
+summary_table = ClientCogspeedSummary.__table__
+
+SUMMARY_METRICS = (
+    "blocking_round_duration",
+    "cognitive_processing_index",
+    "test_duration",
+    "number_of_rounds",
+    "fatigue_level",
+    "mean_machine_paced_answer_time",
+)
+
+# UTC hours of each time of day, matching the dashboard's morning and evening
+TIME_OF_DAY: dict[str, range] = {
+    "morning": range(6, 12),
+    "midday": range(12, 17),
+    "evening": range(17, 23),
+}
+
+SummaryKey = tuple[str, str, str]  # client ID, metric, bucket
+
+
+class RunningStats:
+    """The count, mean, M2, minimum and maximum of a stream of values."""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(
+        self,
+        count: int = 0,
+        mean: float = 0.0,
+        m2: float = 0.0,
+        min: float = math.inf,
+        max: float = -math.inf,
+    ) -> None:
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "RunningStats") -> None:
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float | None:
+        """The sample variance, or None with fewer than two values."""
+        if self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self) -> float | None:
+        variance = self.variance
+        return None if variance is None else math.sqrt(variance)
+
+    def ci(self, confidence: float = 0.95) -> float | None:
+        """Returns the half-width of the t confidence interval of the mean."""
+        if (std := self.std) is None:
+            return None
+        t = stats.t.ppf((1 + confidence) / 2, self.count - 1)
+        return float(t * std / math.sqrt(self.count))
+
+
+def time_of_day(date: str) -> str | None:
+    """Returns the time of day bucket of an ISO 8601 test date, in UTC."""
+    if (taken := parse_test_date(date)) is None:
+        return None
+    for bucket, hours in TIME_OF_DAY.items():
+        if taken.hour in hours:
+            return bucket
+    return "night"
+
+
+def add_test(
+    summaries: dict[SummaryKey, RunningStats], test: Mapping[str, Any]
+) -> None:
+    buckets = ["all"]
+    if (bucket := time_of_day(test["date"])) is not None:
+        buckets.append(bucket)
+    for metric in SUMMARY_METRICS:
+        if (value := test[metric]) is None:
+            continue
+        for bucket in buckets:
+            key = (test["client_id"], metric, bucket)
+            if key not in summaries:
+                summaries[key] = RunningStats()
+            summaries[key].add(value)
+
+
+def summarise(tests: Iterable[Mapping[str, Any]]) -> dict[SummaryKey, RunningStats]:
+    """Computes the statistics of tests, given as mappings of result columns."""
+    summaries: dict[SummaryKey, RunningStats] = {}
+    for test in tests:
+        add_test(summaries, test)
+    return summaries
+
+
+async def merge_summaries(
+    session: AsyncSession, summaries: dict[SummaryKey, RunningStats]
+) -> None:
+    """Merges statistics into the stored summaries in one statement.
+
+    The merge happens inside the upsert, so concurrent writers cannot lose
+    each other's updates.
+    """
+    if not summaries:
+        return
+
+    query = insert(summary_table)
+    old, new = summary_table.c, query.excluded
+    count = old.count + new.count
+    delta = new.mean - old.mean
+    query = query.on_conflict_do_update(
+        index_elements=[old.client_id, old.metric, old.bucket],
+        set_={
+            "count": count,
+            "mean": old.mean + delta * new.count / count,
+            "m2": old.m2 + new.m2 + delta * delta * old.count * new.count / count,
+            "min": func.min(old.min, new.min),
+            "max": func.max(old.max, new.max),
+            "updated_at": func.now(),
+        },
+    )
+    await session.execute(
+        query,
+        [
+            {
+                "client_id": client_id,
+                "metric": metric,
+                "bucket": bucket,
+                "count": s.count,
+                "mean": s.mean,
+                "m2": s.m2,
+                "min": s.min,
+                "max": s.max,
+            }
+            for (client_id, metric, bucket), s in summaries.items()
+        ],
+    )
+
+
+async def update_summaries(
+    session: AsyncSession, tests: Iterable[Mapping[str, Any]]
+) -> None:
+    """Adds newly stored tests to their clients' summaries."""
+    await merge_summaries(session, summarise(tests))
+
+
+async def fetch_summary(
+    session: AsyncSession, client_id: str
+) -> dict[tuple[str, str], RunningStats]:
+    """Returns the client's statistics, keyed by metric and bucket."""
+    query = select(summary_table).where(summary_table.c.client_id == client_id)
+    return {
+        (row["metric"], row["bucket"]): RunningStats(
+            row["count"], row["mean"], row["m2"], row["min"], row["max"]
+        )
+        for row in (await session.execute(query)).mappings()
+    }
+
+
+async def rebuild_summaries(
+    session_factory: async_sessionmaker[AsyncSession], chunk_size: int = 1000
+) -> int:
+    """Recomputes every summary from the stored tests. Returns the number of tests.
+
+    Runs in one transaction, so readers keep seeing the old summaries until the
+    rebuild commits. Tests are streamed in client order and each client's
+    statistics are written once all of its tests are read.
+    """
+    columns = ["client_id", "date", *SUMMARY_METRICS]
+    query = (
+        select(*(getattr(CogspeedTestResult, name) for name in columns))
+        .order_by(CogspeedTestResult.client_id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    total = 0
+    async with session_factory() as session:
+        await session.execute(delete(summary_table))
+
+        client_id: str | None = None
+        summaries: dict[SummaryKey, RunningStats] = {}
+        result = await session.stream(query)
+        async for partition in result.mappings().partitions(chunk_size):
+            for test in partition:
+                if test["client_id"] != client_id:
+                    await merge_summaries(session, summaries)
+                    client_id, summaries = test["client_id"], {}
+                add_test(summaries, test)
+            total += len(partition)
+        await merge_summaries(session, summaries)
+
+        await session.commit()
+    return total
@@ -1,7 +1,22 @@
 """Provides util functions."""
 
 import hashlib
+from datetime import datetime, timezone
 
 
 def create_hash(x: str) -> str:
     return hashlib.sha256(x.encode()).hexdigest()
+
+
+def parse_test_date(date: str) -> datetime | None:
+    """Parses the ISO 8601 date of a test into a naive UTC datetime.
+
+    Returns None for dates in other formats.
+    """
+    try:
+        parsed = datetime.fromisoformat(date.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
@@ -0,0 +1,141 @@
+"""Group commits Cogspeed test uploads.
+
+SQLite only allows one writer at a time and every commit costs an fsync, so
+committing each upload on its own caps ingestion at the fsync rate. Instead,
+concurrent uploads are gathered into a batch which is written in a single
+transaction once it is full or its time window has passed. Each upload is only
+resolved after the transaction holding its rows has committed, with whether
+it was newly stored.
+"""
+
+import asyncio
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.ingestion import insert_tests
+from app.models import CogspeedTestResultModel
+
+__all__ = ["CogspeedWriteQueue", "get_write_queue", "write_queue"]
+
+_Item = tuple[CogspeedTestResultModel, "asyncio.Future[bool]"]
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.items: list[_Item] = []
+        self.full = asyncio.Event()
+
+
+class CogspeedWriteQueue:
+    """Writes concurrently submitted test results in shared transactions."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        max_batch_size: int,
+        max_delay: float,
+    ) -> None:
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+
+        # Metrics
+        self.submitted = 0
+        self.batches = 0
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock: asyncio.Lock
+        self._batch: _Batch | None = None
+        self._tasks: set[asyncio.Task[Any]] = set()
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._batch = None
+            self._tasks = set()
+        return loop
+
+    async def submit(self, test: CogspeedTestResultModel) -> bool:
+        """Queues a test result and waits until it has been committed.
+
+        Returns False if the test was already stored.
+        """
+        loop = self._bind_loop()
+        future: asyncio.Future[bool] = loop.create_future()
+        self.submitted += 1
+
+        if (batch := self._batch) is None:
+            batch = self._batch = _Batch()
+            task = loop.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        batch.items.append((test, future))
+        if len(batch.items) >= self.max_batch_size:
+            self._batch = None
+            batch.full.set()
+
+        return await future
+
+    async def close(self) -> None:
+        """Flushes every open batch."""
+        if self._batch is not None:
+            self._batch.full.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_batch(self, batch: _Batch) -> None:
+        try:
+            await asyncio.wait_for(batch.full.wait(), self.max_delay)
+        except asyncio.TimeoutError:
+            pass
+        if self._batch is batch:
+            self._batch = None
+
+        # Flushes are serialised so the next batch fills up while this one commits
+        async with self._lock:
+            await self._flush(batch.items)
+
+    async def _flush(self, items: list[_Item]) -> None:
+        self.batches += 1
+        try:
+            stored = await self._write([test for test, _ in items])
+        except Exception as e:
+            if len(items) == 1:
+                _set_exception(items[0][1], e)
+                return
+            # Retry one by one so a single bad upload does not fail its batch
+            for item in items:
+                await self._flush([item])
+            return
+
+        for (_, future), is_stored in zip(items, stored):
+            if not future.done():
+                future.set_result(is_stored)
+
+    async def _write(self, tests: list[CogspeedTestResultModel]) -> list[bool]:
+        async with self.session_factory() as session:
+            stored = await insert_tests(session, tests)
+            await session.commit()
+        return stored
+
+
+def _set_exception(future: "asyncio.Future[bool]", e: Exception) -> None:
+    if not future.done():
+        future.set_exception(e)
+
+
+write_queue = CogspeedWriteQueue(
+    AsyncSessionLocal,
+    max_batch_size=settings.write_batch_max_size,
+    max_delay=settings.write_batch_max_delay,
+)
+
+
+def get_write_queue() -> CogspeedWriteQueue:
+    return write_queue
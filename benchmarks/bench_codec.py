@@ -0,0 +1,120 @@
+"""Benchmarks the JSON codecs of the hot routes on a single core.
+
+Measures decoding and validating a 40 round Cogspeed upload, serialising a
+login response, and the requests per second of an in-process app using
+FastAPI's default body and response handling against the app/codec.py path.
+The app does no database work, so only the codec cost is compared.
+
+    python -m benchmarks.bench_codec --seconds 2
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import time
+from typing import Any, Callable
+
+from fastapi import Depends, FastAPI
+from fastapi.encoders import jsonable_encoder
+from httpx import ASGITransport, AsyncClient
+
+from app.codec import CODECS, ModelResponse, get_adapter, json_body
+from app.models import ClientModel, CogspeedTestResultModel, LoginResponseModel
+from benchmarks.payloads import make_test_payload
+
+LOGIN_RESPONSE = LoginResponseModel(
+    success=True,
+    error=None,
+    client=ClientModel(
+        client_id="abcdefghij",
+        api_key="0f4b6c9e-6a4f-4a8e-9a53-5d3a4d2b8f10",
+        password_hash="x" * 64,
+        email="jane@example.com",
+        full_name="Jane Doe",
+        date_of_birth=datetime.date(1990, 2, 3),
+        gender="Female",
+        country="Canada",
+    ),
+)
+
+
+def rate(fn: Callable[[], Any], seconds: float) -> float:
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        count += 1
+    return count / seconds
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/default", status_code=201)
+    async def default_route(test: CogspeedTestResultModel) -> LoginResponseModel:
+        return LOGIN_RESPONSE
+
+    @app.post("/codec", status_code=201)
+    async def codec_route(
+        test: CogspeedTestResultModel = Depends(json_body(CogspeedTestResultModel)),
+    ) -> ModelResponse:
+        return ModelResponse(LOGIN_RESPONSE, status_code=201)
+
+    return app
+
+
+async def requests_per_second(path: str, body: bytes, seconds: float) -> float:
+    transport = ASGITransport(app=build_app())  # type: ignore
+    headers = {"Content-Type": "application/json"}
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        count = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            response = await client.post(path, content=body, headers=headers)
+            assert response.status_code == 201
+            count += 1
+    return count / seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    body = json.dumps(make_test_payload("abcdefghij", seed=0)).encode()
+    test_adapter = get_adapter(CogspeedTestResultModel)
+    login_adapter = get_adapter(LoginResponseModel)
+
+    def fastapi_decode() -> CogspeedTestResultModel:
+        return CogspeedTestResultModel.model_validate(json.loads(body))
+
+    print("decode + validate upload:")
+    print(f"  {'fastapi':>8}: {rate(fastapi_decode, args.seconds):10.0f} /s")
+    for name, codec in CODECS.items():
+        ops = rate(lambda: codec.decode(body, test_adapter), args.seconds)
+        print(f"  {name:>8}: {ops:10.0f} /s")
+
+    print("serialise login response:")
+
+    def fastapi_encode() -> bytes:
+        return json.dumps(
+            jsonable_encoder(LOGIN_RESPONSE),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode()
+
+    print(f"  {'fastapi':>8}: {rate(fastapi_encode, args.seconds):10.0f} /s")
+    for name, codec in CODECS.items():
+        ops = rate(lambda: codec.encode(LOGIN_RESPONSE, login_adapter), args.seconds)
+        print(f"  {name:>8}: {ops:10.0f} /s")
+
+    print("requests per core:")
+    for path in ("/default", "/codec"):
+        rps = asyncio.run(requests_per_second(path, body, args.seconds))
+        print(f"  {path:>8}: {rps:10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmarks the bytes on the wire and CPU cost of compressing API bodies.
+
+Compresses a single 40 round Cogspeed upload, a batch upload and a page of
+test history with every encoding and level, and reports the compressed size
+and the time taken to compress and decompress each body on a single core.
+
+    python -m benchmarks.bench_compression --tests 100 --levels 1 3 6 9
+"""
+
+import argparse
+import gzip
+import json
+import time
+from typing import Any, Callable
+
+from app.codec import ModelResponse
+from app.models import CogspeedTestPageModel, CogspeedTestResultModel
+from benchmarks.payloads import make_test_payload
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+
+def seconds_per_call(fn: Callable[[], Any], seconds: float = 0.5) -> float:
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        fn()
+        count += 1
+    return elapsed / count
+
+
+Codec = tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]
+
+
+def codecs(level: int) -> dict[str, Codec]:
+    result: dict[str, Codec] = {
+        f"gzip-{level}": (
+            lambda body: gzip.compress(body, compresslevel=min(level, 9)),
+            gzip.decompress,
+        )
+    }
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=level)
+        decompressor = zstandard.ZstdDecompressor()
+        result[f"zstd-{level}"] = (compressor.compress, decompressor.decompress)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tests", type=int, default=100, help="Tests per batch")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 3, 6, 9])
+    args = parser.parse_args()
+
+    tests = [make_test_payload("abcdefghij", seed=i) for i in range(args.tests)]
+    bodies = {
+        "upload": json.dumps(tests[0]).encode(),
+        f"batch of {args.tests}": json.dumps(tests).encode(),
+        # The history endpoint returns the tests with snake_case fields
+        f"history of {args.tests}": ModelResponse(
+            CogspeedTestPageModel(
+                items=[
+                    CogspeedTestResultModel.model_validate(test).model_dump(mode="json")
+                    for test in tests
+                ],
+                next_cursor=None,
+            )
+        ).body,
+    }
+    if zstandard is None:
+        print("zstandard is not installed, only gzip is measured")
+
+    for name, body in bodies.items():
+        print(f"{name}: {len(body):,} bytes")
+        print(
+            f"  {'encoding':>10} {'bytes':>10} {'ratio':>6}"
+            f" {'compress':>12} {'decompress':>12}"
+        )
+        for level in args.levels:
+            for encoding, (compress, decompress) in codecs(level).items():
+                compressed = compress(body)
+                assert decompress(compressed) == body
+                compress_time = seconds_per_call(lambda: compress(body))
+                decompress_time = seconds_per_call(lambda: decompress(compressed))
+                print(
+                    f"  {encoding:>10} {len(compressed):>10,}"
+                    f" {len(body) / len(compressed):>6.1f}"
+                    f" {compress_time * 1e6:>10.0f}µs {decompress_time * 1e6:>10.0f}µs"
+                )
+
+
+if __name__ == "__main__":
+    main()
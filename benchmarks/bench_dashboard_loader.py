@@ -0,0 +1,115 @@
+"""Benchmarks loading dashboard query results into pandas.
+
+Compares building a DataFrame from `fetchall()` tuples, as the dashboard used
+to, and `pd.read_sql_query` against the chunked columnar loader of
+visualisation/src/columnar.py, on the admin view's query over every client's
+tests. Each loader runs in a fresh process, so its peak memory is measured
+on its own. Peak memory is read from /proc, so the benchmark needs Linux.
+
+    python -m benchmarks.bench_dashboard_loader --rows 1000000
+"""
+
+import argparse
+import multiprocessing
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "visualisation" / "src"))
+
+from columnar import _numpy_frame, read_frame  # noqa: E402
+
+QUERY = (
+    "SELECT client_id, date, blocking_round_duration, test_duration, "
+    "number_of_rounds, fatigue_level, final_ratio FROM cogspeed_test_results"
+)
+
+
+def create_database(path: Path, rows: int) -> None:
+    rng = np.random.default_rng(0)
+    clients = np.char.add("client-", rng.integers(0, rows // 100 + 1, rows).astype(str))
+    seconds = rng.integers(1_700_000_000, 1_760_000_000, rows)
+    dates = np.datetime_as_string(seconds.astype("datetime64[s]"), unit="ms")
+    columns = [
+        clients.tolist(),
+        np.char.add(dates, "Z").tolist(),
+        rng.normal(1200, 150, rows).round().astype(int).tolist(),
+        rng.integers(60_000, 180_000, rows).tolist(),
+        rng.integers(20, 60, rows).tolist(),
+        rng.integers(1, 8, rows).tolist(),
+        rng.uniform(0.5, 1.5, rows).tolist(),
+    ]
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute(
+            "CREATE TABLE cogspeed_test_results (client_id TEXT, date TEXT, "
+            "blocking_round_duration INTEGER, test_duration INTEGER, "
+            "number_of_rounds INTEGER, fatigue_level INTEGER, final_ratio REAL)"
+        )
+        conn.executemany(
+            "INSERT INTO cogspeed_test_results VALUES (?, ?, ?, ?, ?, ?, ?)",
+            zip(*columns),
+        )
+        conn.commit()
+
+
+def load(loader: str, path: Path) -> pd.DataFrame:
+    with closing(sqlite3.connect(path)) as conn:
+        if loader == "tuples":
+            cursor = conn.execute(QUERY)
+            names = [column[0] for column in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=names)
+        if loader == "read_sql":
+            return pd.read_sql_query(QUERY, conn)
+        if loader == "columnar (numpy)":
+            return _numpy_frame(conn.execute(QUERY), 64 * 1024)
+        return read_frame(conn, QUERY)
+
+
+def memory_kib(field: str) -> int:
+    """Returns VmRSS or VmHWM, the peak RSS, of this process in KiB."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} is not in /proc/self/status")
+
+
+def measure(loader: str, path: Path) -> tuple[float, float, float]:
+    """Returns the seconds taken, the peak memory growth and the frame's size."""
+    # Resets the peak RSS to the current RSS
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+    before = memory_kib("VmRSS")
+    start = time.perf_counter()
+    frame = load(loader, path)
+    elapsed = time.perf_counter() - start
+    peak = memory_kib("VmHWM") - before
+    return elapsed, peak / 1024, frame.memory_usage(deep=True).sum() / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.sqlite"
+        create_database(path, args.rows)
+
+        print(f"{args.rows:,} rows:")
+        print(f"  {'loader':>18} {'seconds':>8} {'peak MiB':>9} {'frame MiB':>10}")
+        context = multiprocessing.get_context("spawn")
+        for loader in ("tuples", "read_sql", "columnar (numpy)", "columnar (arrow)"):
+            with context.Pool(1) as pool:
+                elapsed, peak, size = pool.apply(measure, (loader, path))
+            print(f"  {loader:>18} {elapsed:>8.2f} {peak:>9.0f} {size:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
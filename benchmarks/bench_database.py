@@ -0,0 +1,124 @@
+"""Benchmarks concurrent read and write throughput against one SQLite file.
+
+Mimics the production layout: several worker processes (gunicorn workers, the
+dashboard, sqlite-web) share a single database file. Each profile is run with
+the same number of reader and writer processes and reports operations per
+second and the number of `database is locked` failures.
+
+    python -m benchmarks.bench_database --writers 4 --readers 4 --duration 5
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.config import Settings
+from app.database import create_sqlite_engine
+from app.schemas import Base, Client
+
+PROFILES = ("default", "tuned")
+
+
+def make_engine(profile: str, url: str) -> AsyncEngine:
+    if profile == "default":
+        return create_async_engine(url)
+    return create_sqlite_engine(url, Settings())
+
+
+async def setup(url: str) -> None:
+    engine = make_engine("tuned", url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
+async def run_worker(
+    profile: str, url: str, role: str, duration: float
+) -> tuple[int, int]:
+    engine = make_engine(profile, url)
+    ops = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            async with engine.begin() as conn:
+                if role == "writer":
+                    client_id = uuid.uuid4().hex[:10]
+                    await conn.execute(
+                        Client.__table__.insert().values(
+                            client_id=client_id,
+                            full_name="Bench User",
+                            email=f"{client_id}@example.com",
+                            date_of_birth=date(1990, 1, 1),
+                            gender="Other",
+                            country="Benchland",
+                            password_hash="x",
+                            api_key=uuid.uuid4().hex,
+                        )
+                    )
+                else:
+                    result = await conn.execute(select(Client.client_id).limit(50))
+                    result.fetchall()
+            ops += 1
+        except OperationalError:
+            errors += 1
+    await engine.dispose()
+    return ops, errors
+
+
+def worker(args: tuple[str, str, str, float]) -> tuple[str, int, int]:
+    profile, url, role, duration = args
+    ops, errors = asyncio.run(run_worker(profile, url, role, duration))
+    return role, ops, errors
+
+
+def run_profile(profile: str, writers: int, readers: int, duration: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.sqlite')}"
+        asyncio.run(setup(url))
+        if profile == "default":
+            # Undo the WAL journal set up by `setup` so the baseline is honest
+            async def reset_journal() -> None:
+                engine = create_async_engine(url)
+                async with engine.begin() as conn:
+                    await conn.exec_driver_sql("PRAGMA journal_mode=DELETE")
+                await engine.dispose()
+
+            asyncio.run(reset_journal())
+
+        jobs = [(profile, url, "writer", duration)] * writers
+        jobs += [(profile, url, "reader", duration)] * readers
+        with multiprocessing.Pool(len(jobs)) as pool:
+            results = pool.map(worker, jobs)
+
+    for role in ("writer", "reader"):
+        ops = sum(r[1] for r in results if r[0] == role)
+        errors = sum(r[2] for r in results if r[0] == role)
+        print(
+            f"{profile:>8} {role:>7}: {ops / duration:10.1f} ops/s  "
+            f"({errors} locked errors)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--profile", choices=PROFILES, action="append")
+    args = parser.parse_args()
+
+    for profile in args.profile or PROFILES:
+        run_profile(profile, args.writers, args.readers, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""Load tests the API end to end and fails when it is slower than its baseline.
+
+Sends a seeded mix of signups, logins, client fetches and test uploads at
+each concurrency level, either in process through httpx's ASGI transport or
+over HTTP to a local gunicorn with `--gunicorn WORKERS`, against a fresh
+database. Reports the throughput and the p50, p95 and p99 latency of each
+operation, the best of `--repeat` runs at each level.
+
+The results are compared with the baseline stored for the same target and
+workload, if there is one, and the benchmark exits with status 1 when the
+throughput drops, or a percentile rises, by more than `--tolerance`, or when
+any request fails. Percentiles must also rise by `--min-regression-ms`.
+Baselines depend on the machine, so record them with `--save-baseline` on the
+machine the benchmark is compared on.
+
+    python -m benchmarks.bench_http --requests 1000 --concurrency 1 16 64
+    python -m benchmarks.bench_http --gunicorn 4 --save-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+import numpy as np
+
+from benchmarks.payloads import make_test_payload
+
+BASELINES = Path(__file__).parent / "baselines" / "bench_http.json"
+
+OPERATIONS = ("signup", "login", "fetch", "upload")
+PERCENTILES = (50, 95, 99)
+PASSWORD = "password"
+
+
+@dataclass
+class Request:
+    operation: str
+    method: str
+    url: str
+    headers: dict[str, str]
+    body: bytes | None
+    status_code: int
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        operation, _, weight = item.partition("=")
+        if operation.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {operation!r}")
+        weights[operation.strip()] = float(weight or 1)
+    return weights
+
+
+def signup_body(rng: random.Random) -> bytes:
+    return json.dumps(
+        {
+            "email": f"bench-{uuid.UUID(int=rng.getrandbits(128))}@example.com",
+            "full_name": "Bench Client",
+            "date_of_birth": "1990-01-01",
+            "gender": "Female",
+            "country": "United Kingdom",
+            "password": PASSWORD,
+        }
+    ).encode()
+
+
+def build_requests(
+    mix: dict[str, float], count: int, clients: list[dict[str, Any]], seed: str
+) -> list[Request]:
+    """Returns the requests of a run, built in advance so that only the app's
+    work is timed.
+    """
+    rng = random.Random(seed)
+    json_headers = {"Content-Type": "application/json"}
+    requests = []
+    for operation in rng.choices(list(mix), list(mix.values()), k=count):
+        client = rng.choice(clients)
+        auth = {"X-Client-ID": client["client_id"], "X-Api-Key": client["api_key"]}
+        if operation == "signup":
+            request = Request(
+                operation,
+                "POST",
+                "/clients/signup",
+                json_headers,
+                signup_body(rng),
+                201,
+            )
+        elif operation == "login":
+            body = {"email": client["email"], "password": PASSWORD}
+            request = Request(
+                operation,
+                "POST",
+                "/clients/login",
+                json_headers,
+                json.dumps(body).encode(),
+                200,
+            )
+        elif operation == "fetch":
+            request = Request(operation, "GET", "/clients/fetch", auth, None, 200)
+        else:
+            payload = make_test_payload(client["client_id"], seed=rng.getrandbits(32))
+            request = Request(
+                operation,
+                "POST",
+                "/clients/cogspeed/tests",
+                auth | json_headers,
+                json.dumps(payload).encode(),
+                201,
+            )
+        requests.append(request)
+    return requests
+
+
+async def create_clients(
+    http: httpx.AsyncClient, count: int, seed: str
+) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    clients = []
+    for _ in range(count):
+        response = await http.post(
+            "/clients/signup",
+            content=signup_body(rng),
+            headers={"Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+        clients.append(response.json()["client"])
+    return clients
+
+
+async def run_level(
+    http: httpx.AsyncClient, requests: list[Request], concurrency: int
+) -> dict[str, Any]:
+    latencies: dict[str, list[float]] = {operation: [] for operation in OPERATIONS}
+    errors = dict.fromkeys(OPERATIONS, 0)
+    pending = iter(requests)
+
+    async def worker() -> None:
+        for request in pending:
+            start = time.perf_counter()
+            try:
+                response = await http.request(
+                    request.method,
+                    request.url,
+                    headers=request.headers,
+                    content=request.body,
+                )
+                failed = response.status_code != request.status_code or (
+                    request.operation == "login" and not response.json()["success"]
+                )
+            except httpx.HTTPError:
+                failed = True
+            latencies[request.operation].append(time.perf_counter() - start)
+            errors[request.operation] += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    def stats(values: list[float], failed: int) -> dict[str, Any]:
+        points = np.percentile(values, PERCENTILES) * 1000 if values else []
+        return {"count": len(values), "errors": failed} | {
+            f"p{p}": round(float(v), 3) for p, v in zip(PERCENTILES, points)
+        }
+
+    everything = [v for values in latencies.values() for v in values]
+    return {
+        "throughput": round(len(requests) / elapsed, 1),
+        "operations": {
+            operation: stats(values, errors[operation])
+            for operation, values in latencies.items()
+            if values
+        }
+        | {"all": stats(everything, sum(errors.values()))},
+    }
+
+
+def best(results: list[dict[str, Any]]) -> dict[str, Any]:
+    """Combines repeated runs, keeping the best throughput and percentiles,
+    which are much less noisy than those of any one run.
+    """
+    operations: dict[str, dict[str, Any]] = {}
+    for result in results:
+        for operation, stats in result["operations"].items():
+            if (combined := operations.get(operation)) is None:
+                operations[operation] = dict(stats)
+                continue
+            combined["count"] += stats["count"]
+            combined["errors"] += stats["errors"]
+            for p in PERCENTILES:
+                combined[f"p{p}"] = min(combined[f"p{p}"], stats[f"p{p}"])
+    return {
+        "throughput": max(result["throughput"] for result in results),
+        "operations": operations,
+    }
+
+
+def regressions(
+    result: dict[str, Any],
+    baseline: dict[str, Any] | None,
+    tolerance: float,
+    min_regression_ms: float,
+) -> list[str]:
+    """Returns the failed requests of the result, and how it is worse than the
+    baseline beyond the tolerance. Latencies must also rise by at least
+    `min_regression_ms`, as the percentiles of fast routes jitter by more
+    than the tolerance between runs.
+    """
+    found = [
+        f"{operation}: {stats['errors']} failed requests"
+        for operation, stats in result["operations"].items()
+        if stats["errors"] and operation != "all"
+    ]
+    if baseline is None:
+        return found
+
+    if result["throughput"] < baseline["throughput"] * (1 - tolerance):
+        found.append(
+            f"throughput {result['throughput']:.1f}/s, "
+            f"baseline {baseline['throughput']:.1f}/s"
+        )
+    for operation, stats in result["operations"].items():
+        expected = baseline["operations"].get(operation, {})
+        for p in PERCENTILES:
+            key = f"p{p}"
+            if key not in expected:
+                continue
+            limit = max(
+                expected[key] * (1 + tolerance), expected[key] + min_regression_ms
+            )
+            if stats[key] > limit:
+                found.append(
+                    f"{operation} {key} {stats[key]:.1f}ms, baseline {expected[key]:.1f}ms"
+                )
+    return found
+
+
+def print_result(concurrency: int, result: dict[str, Any]) -> None:
+    print(f"concurrency {concurrency}: {result['throughput']:,.1f} requests/s")
+    print(
+        f"  {'operation':>10} {'count':>7} {'errors':>7}"
+        + "".join(f" {f'p{p} ms':>9}" for p in PERCENTILES)
+    )
+    for operation, stats in result["operations"].items():
+        print(
+            f"  {operation:>10} {stats['count']:>7} {stats['errors']:>7}"
+            + "".join(f" {stats[f'p{p}']:>9.1f}" for p in PERCENTILES)
+        )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def open_client(
+    stack: AsyncExitStack, workers: int | None, concurrency: int
+) -> httpx.AsyncClient:
+    """Starts the app and returns a client sending requests to it."""
+    # Imported here so the app's engine uses the benchmark's database
+    from app.database import create_db_and_tables, engine
+
+    # Created once, rather than by every gunicorn worker at the same time
+    await create_db_and_tables()
+    await engine.dispose()
+
+    if workers is None:
+        from app.main import app
+
+        await stack.enter_async_context(app.router.lifespan_context(app))
+        # Errors are answered with a 500, as a server would, and counted
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        return await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, base_url="http://bench")
+        )
+
+    port = free_port()
+    server = await asyncio.create_subprocess_exec(
+        *(sys.executable, "-m", "gunicorn", "app.main:app"),
+        *("-k", "uvicorn.workers.UvicornWorker", "-w", str(workers)),
+        *("-b", f"127.0.0.1:{port}", "--log-level", "warning"),
+        cwd=Path(__file__).parents[1],
+    )
+    stack.push_async_callback(server.wait)
+    stack.callback(server.terminate)
+    http = await stack.enter_async_context(
+        httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            limits=httpx.Limits(max_connections=concurrency),
+            timeout=60,
+        )
+    )
+    for _ in range(300):
+        if server.returncode is not None:
+            raise RuntimeError("gunicorn exited before it started serving")
+        try:
+            await http.get("/")
+            return http
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("gunicorn did not start serving within 30 seconds")
+
+
+async def run(args: argparse.Namespace) -> dict[int, dict[str, Any]]:
+    results = {}
+    async with AsyncExitStack() as stack:
+        http = await open_client(stack, args.gunicorn, max(args.concurrency))
+        # Every phase has its own seed, so no two signups share an email
+        clients = await create_clients(http, args.clients, f"clients-{args.seed}")
+        for concurrency in args.concurrency:
+            seed = f"{args.seed}-{concurrency}"
+            warmup = build_requests(args.mix, args.warmup, clients, f"warmup-{seed}")
+            await run_level(http, warmup, concurrency)
+            runs = []
+            for repeat in range(args.repeat):
+                requests = build_requests(
+                    args.mix, args.requests, clients, f"{seed}-{repeat}"
+                )
+                runs.append(await run_level(http, requests, concurrency))
+            results[concurrency] = best(runs)
+            print_result(concurrency, results[concurrency])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000, help="Per run")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per level, the best is kept"
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default="signup=1,login=3,fetch=4,upload=2",
+        help="Relative weights of the operations",
+    )
+    parser.add_argument(
+        "--clients", type=int, default=50, help="Clients created before the run"
+    )
+    parser.add_argument("--warmup", type=int, default=100, help="Untimed, per level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--gunicorn",
+        type=int,
+        metavar="WORKERS",
+        help="Serve the app with gunicorn instead of in process",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINES)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the baseline instead of comparing them",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Largest slowdown accepted, as a fraction of the baseline",
+    )
+    parser.add_argument(
+        "--min-regression-ms",
+        type=float,
+        default=5.0,
+        help="Smallest rise of a latency percentile counted as a regression",
+    )
+    args = parser.parse_args()
+
+    target = "asgi" if args.gunicorn is None else f"gunicorn-{args.gunicorn}"
+    workload = {
+        "requests": args.requests,
+        "repeat": args.repeat,
+        "mix": args.mix,
+        "clients": args.clients,
+        "seed": args.seed,
+    }
+    print(
+        f"{target}: best of {args.repeat} runs of {args.requests} requests per level, "
+        f"mix {args.mix}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CEREBRUM_DATABASE_URL"] = (
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.sqlite')}"
+        )
+        results = asyncio.run(run(args))
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    baseline = baselines.get(target)
+    if args.save_baseline or baseline is None or baseline["workload"] != workload:
+        baseline = {"results": {}}
+        if not args.save_baseline:
+            print(f"No baseline of {target} with this workload to compare with")
+
+    failed = False
+    for concurrency, result in results.items():
+        expected = baseline["results"].get(str(concurrency))
+        for regression in regressions(
+            result, expected, args.tolerance, args.min_regression_ms
+        ):
+            print(f"REGRESSION at concurrency {concurrency}: {regression}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+    if args.save_baseline:
+        baselines[target] = {
+            "workload": workload,
+            "results": {str(c): result for c, result in results.items()},
+        }
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"Saved the baseline of {target} to {args.baseline}")
+    elif baseline["results"]:
+        print(f"Within {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
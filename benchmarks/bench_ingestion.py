@@ -0,0 +1,76 @@
+"""Benchmarks Cogspeed test ingestion throughput through the write queue.
+
+Compares one commit per upload (a batch size of 1) against group commit at
+increasing numbers of concurrent uploads.
+
+    python -m benchmarks.bench_ingestion --tests 2000 --concurrency 1 16 64
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.database import create_sqlite_engine
+from app.models import CogspeedTestResultModel
+from app.schemas import Base
+from app.write_queue import CogspeedWriteQueue
+from benchmarks.payloads import make_test_payload
+
+
+async def run(url: str, tests: int, concurrency: int, max_batch_size: int) -> float:
+    engine = create_sqlite_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession)
+    queue = CogspeedWriteQueue(
+        session_factory,
+        max_batch_size=max_batch_size,
+        max_delay=settings.write_batch_max_delay,
+    )
+    client_id = uuid.uuid4().hex[:10]
+    payloads = [
+        CogspeedTestResultModel.model_validate(make_test_payload(client_id))
+        for _ in range(tests)
+    ]
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(test: CogspeedTestResultModel) -> None:
+        async with semaphore:
+            await queue.submit(test)
+
+    start = time.perf_counter()
+    await asyncio.gather(*map(upload, payloads))
+    elapsed = time.perf_counter() - start
+
+    await engine.dispose()
+    return tests / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.sqlite')}"
+        for concurrency in args.concurrency:
+            for label, max_batch_size in (
+                ("per-upload commit", 1),
+                ("group commit", settings.write_batch_max_size),
+            ):
+                rate = asyncio.run(run(url, args.tests, concurrency, max_batch_size))
+                print(f"concurrency {concurrency:>4} {label:>18}: {rate:10.1f} tests/s")
+
+
+if __name__ == "__main__":
+    main()
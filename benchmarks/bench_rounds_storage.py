@@ -0,0 +1,87 @@
+"""Compares the row-per-round and packed storage modes for Cogspeed rounds.
+
+Reports the database size after a VACUUM, insert throughput and the
+throughput of loading the rounds of single tests.
+
+    python -m benchmarks.bench_rounds_storage --tests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from typing import Literal
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import create_sqlite_engine
+from app.ingestion import insert_tests
+from app.models import CogspeedTestResultModel
+from app.rounds import fetch_rounds
+from app.schemas import Base
+from benchmarks.payloads import make_test_payload
+
+StorageMode = Literal["rows", "packed"]
+MODES: tuple[StorageMode, ...] = ("rows", "packed")
+
+
+async def run(
+    path: str, tests: list[CogspeedTestResultModel], mode: StorageMode, reads: int
+) -> None:
+    engine = create_sqlite_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession)
+
+    start = time.perf_counter()
+    for i in range(0, len(tests), 100):
+        async with session_factory() as session:
+            await insert_tests(session, tests[i : i + 100], rounds_storage=mode)
+            await session.commit()
+    insert_rate = len(tests) / (time.perf_counter() - start)
+
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("VACUUM")
+        await conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    sample = random.Random(0).choices(tests, k=reads)
+    start = time.perf_counter()
+    async with session_factory() as session:
+        for test in sample:
+            await fetch_rounds(session, test.client_id, [test.id])
+    read_rate = reads / (time.perf_counter() - start)
+
+    await engine.dispose()
+    size = os.path.getsize(path) / 1024**2
+    print(
+        f"{mode:>6}: {size:8.2f} MiB  insert {insert_rate:8.1f} tests/s  "
+        f"read {read_rate:8.1f} tests/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--reads", type=int, default=1000)
+    args = parser.parse_args()
+
+    client_ids = [uuid.uuid4().hex[:10] for _ in range(args.clients)]
+    tests = [
+        CogspeedTestResultModel.model_validate(
+            make_test_payload(client_ids[i % args.clients], seed=i)
+        )
+        for i in range(args.tests)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            path = os.path.join(tmp, f"{mode}.sqlite")
+            asyncio.run(run(path, tests, mode, args.reads))
+
+
+if __name__ == "__main__":
+    main()
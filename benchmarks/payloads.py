@@ -0,0 +1,78 @@
+"""Builds realistic Cogspeed upload payloads for the benchmarks."""
+
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+ROUND_TYPES = ("training", "practice", "machine-paced", "self-paced")
+
+
+def make_round(round_number: int, rng: random.Random) -> dict[str, Any]:
+    round_type = min(round_number // 10, len(ROUND_TYPES) - 1)
+    answer_location = rng.randint(1, 9)
+    status = rng.choices(["correct", "incorrect", "no response"], [8, 1, 1])[0]
+    return {
+        "status": status,
+        "roundTypeNormalized": ROUND_TYPES[round_type],
+        "answerLocation": answer_location,
+        "locationClicked": None if status == "no response" else answer_location,
+        "queryNumber": f"{rng.randint(1, 9)}{rng.choice(['num', 'dot'])}",
+        "duration": -1 if round_type < 2 else rng.uniform(800, 1500),
+        "correctRollingMeanRatio": "n/a" if round_type < 2 else rng.uniform(0.5, 1.5),
+        "roundNumber": round_number,
+        "roundType": round_type,
+        "timeTaken": rng.uniform(500, 1500),
+        "isCorrectOrIncorrectFromPrevious": rng.choice([None, "correct", "incorrect"]),
+        "ratio": rng.uniform(0, 1.5),
+        "_id": str(uuid.uuid4()),
+        "_time_epoch": 1000.0 * round_number + rng.uniform(0, 999),
+    }
+
+
+def make_test_payload(
+    client_id: str, rounds: int = 40, seed: int | None = None
+) -> dict[str, Any]:
+    """Returns a test upload payload in the camelCase format sent by the app."""
+    rng = random.Random(seed)
+    date = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(
+        minutes=rng.randint(0, 60 * 24 * 365)
+    )
+    return {
+        "id": str(uuid.uuid4()),
+        "client_id": client_id,
+        "statusCode": 0,
+        "status": "success",
+        "success": True,
+        "message": "Test completed successfully",
+        "version": "4a2b6dacbd7b39afdf328034b3b58380cd2136a2",
+        "testDuration": rng.randint(20000, 45000),
+        "numberOfRounds": rounds,
+        "blockingRoundDuration": rng.randint(900, 1500),
+        "cognitiveProcessingIndex": rng.randint(50, 100),
+        "machinePacedBaseline": rng.uniform(1200, 2000),
+        "fatigueLevel": rng.randint(1, 7),
+        "numberOfRollMeanLimitExceedences": rng.randint(0, 3),
+        "finalRatio": rng.uniform(0.5, 2),
+        "blockCount": rng.randint(1, 4),
+        "lowestBlockTime": rng.uniform(700, 1000),
+        "highestBlockTime": rng.uniform(1000, 1300),
+        "blockRange": rng.randint(100, 300),
+        "finalBlockDiff": rng.randint(100, 300),
+        "totalMachinePacedAnswers": 30,
+        "totalMachinePacedCorrectAnswers": 24,
+        "totalMachinePacedIncorrectAnswers": 1,
+        "totalMachinePacedNoResponseAnswers": 5,
+        "quickestResponse": rng.uniform(500, 700),
+        "quickestCorrectResponse": rng.uniform(500, 700),
+        "slowestResponse": rng.uniform(1200, 1500),
+        "slowestCorrectResponse": rng.uniform(1100, 1300),
+        "meanMachinePacedAnswerTime": rng.uniform(800, 1000),
+        "meanCorrectMachinePacedAnswerTime": rng.uniform(800, 1000),
+        "_date": date.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+        "_date_minute_offset": -60,
+        "normalizedLocation": "Could not get location",
+        "localDate": date.strftime("%d/%m/%Y"),
+        "localTime": date.strftime("%H:%M:%S"),
+        "rounds": [make_round(i, rng) for i in range(1, rounds + 1)],
+    }
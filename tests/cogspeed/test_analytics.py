@@ -0,0 +1,146 @@
+import statistics
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+DURATIONS = [900, 1000, 1100, 1300, 800, 950, 1200]
+HOURS = [7, 8, 9, 13, 18, 19, 20]
+
+
+@pytest_asyncio.fixture
+async def headers(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> dict[str, str]:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    payload = [
+        make_cogspeed_test(
+            client_id,
+            blockingRoundDuration=duration,
+            _date=f"2025-07-{day:02d}T{hour:02d}:00:00.000Z",
+        )
+        for day, (duration, hour) in enumerate(zip(DURATIONS, HOURS), start=1)
+    ]
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+    return headers
+
+
+async def test_time_of_day_stats(client: AsyncClient, headers: dict[str, str]) -> None:
+    response = await client.get(
+        "/clients/cogspeed/analytics/time-of-day", headers=headers
+    )
+    assert response.status_code == 200
+    buckets = {item["bucket"]: item for item in response.json()["buckets"]}
+
+    assert buckets["morning"]["count"] == 3
+    assert buckets["morning"]["mean"] == pytest.approx(1000)
+    assert buckets["morning"]["std"] == pytest.approx(statistics.stdev(DURATIONS[:3]))
+    assert buckets["morning"]["ci"] == pytest.approx(248.4, abs=0.1)
+    assert buckets["midday"]["count"] == 1
+    assert buckets["midday"]["ci"] is None
+    assert buckets["evening"]["mean"] == pytest.approx(statistics.fmean(DURATIONS[4:]))
+    assert buckets["night"] == {
+        "bucket": "night",
+        "count": 0,
+        "mean": None,
+        "std": None,
+        "ci": None,
+    }
+
+
+async def test_trend(client: AsyncClient, headers: dict[str, str]) -> None:
+    response = await client.get(
+        "/clients/cogspeed/analytics/trend", params={"window": 3}, headers=headers
+    )
+    assert response.status_code == 200
+    trend = response.json()
+
+    assert trend["values"] == DURATIONS
+    assert trend["rolling_mean"][:2] == [None, None]
+    assert trend["rolling_mean"][2:] == pytest.approx(
+        [statistics.fmean(DURATIONS[i - 2 : i + 1]) for i in range(2, len(DURATIONS))]
+    )
+    assert trend["rolling_std"][-1] == pytest.approx(statistics.stdev(DURATIONS[-3:]))
+    days = [day + hour / 24 for day, hour in enumerate(HOURS)]
+    assert trend["slope_per_day"] == pytest.approx(
+        statistics.linear_regression(days, DURATIONS).slope
+    )
+
+
+async def test_series(client: AsyncClient, headers: dict[str, str]) -> None:
+    response = await client.get(
+        "/clients/cogspeed/analytics/series",
+        params={
+            "metrics": "blocking_round_duration,fatigue_level",
+            "since": "2025-07-03",
+        },
+        headers=headers,
+    )
+    assert response.status_code == 200
+    series = response.json()
+    assert len(series["dates"]) == len(DURATIONS) - 2
+    assert series["series"]["blocking_round_duration"] == DURATIONS[2:]
+    assert set(series["series"]) == {"blocking_round_duration", "fatigue_level"}
+
+    response = await client.get(
+        "/clients/cogspeed/analytics/series",
+        params={"metrics": "blocking_round_duration,date"},
+        headers=headers,
+    )
+    assert response.status_code == 422
+
+
+async def test_downsampled_series(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    durations = [1000 + 10 * (i % 7) for i in range(60)]
+    durations[31] = 3000
+    payload = [
+        make_cogspeed_test(
+            client_id,
+            blockingRoundDuration=duration,
+            _date=f"2025-07-01T{i // 60:02d}:{i % 60:02d}:00.000Z",
+        )
+        for i, duration in enumerate(durations)
+    ]
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+
+    url = "/clients/cogspeed/analytics/series"
+    response = await client.get(url, params={"max_points": 10}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    values = body["series"]["blocking_round_duration"]
+    assert len(body["dates"]) == len(values) == 10
+    assert body["dates"][0] == payload[0]["_date"]
+    assert body["dates"][-1] == payload[-1]["_date"]
+    assert 3000 in values
+
+    url = "/clients/cogspeed/analytics/trend"
+    response = await client.get(
+        url, params={"max_points": 10, "window": 5}, headers=headers
+    )
+    body = response.json()
+    assert len(body["values"]) <= 10
+    assert len(body["rolling_mean"]) == len(body["dates"]) == len(body["values"])
+
+    response = await client.get(url, params={"max_points": 2}, headers=headers)
+    assert response.status_code == 422
@@ -0,0 +1,170 @@
+import gzip
+import json
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+import zstandard
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.schemas import CogspeedTestResult
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.mark.parametrize(
+    "encoding, compress",
+    [("gzip", gzip.compress), ("zstd", zstandard.ZstdCompressor().compress)],
+)
+async def test_post_compressed_test(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+    encoding: str,
+    compress: Callable[[bytes], bytes],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {
+        "X-Client-ID": client_id,
+        "X-Api-Key": created_client["api_key"],
+        "Content-Type": "application/json",
+        "Content-Encoding": encoding,
+    }
+    body = json.dumps(make_cogspeed_test(client_id)).encode()
+
+    response = await client.post(
+        "/clients/cogspeed/tests", content=compress(body), headers=headers
+    )
+    assert response.status_code == 201
+
+
+async def test_post_rejects_bad_compressed_bodies(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "request_body_max_bytes", 1024 * 1024)
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+        "Content-Type": "application/json",
+    }
+    url = "/clients/cogspeed/tests"
+
+    # A few KiB which expand past the limit
+    bomb = gzip.compress(b" " * 20 * 1024 * 1024)
+    assert len(bomb) < 50 * 1024
+    response = await client.post(
+        url, content=bomb, headers=headers | {"Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 413
+
+    bomb = zstandard.ZstdCompressor().compress(b" " * 20 * 1024 * 1024)
+    response = await client.post(
+        url, content=bomb, headers=headers | {"Content-Encoding": "zstd"}
+    )
+    assert response.status_code == 413
+
+    response = await client.post(
+        url, content=b"not gzip", headers=headers | {"Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 400
+
+    response = await client.post(
+        url,
+        content=gzip.compress(b"{}")[:-4],
+        headers=headers | {"Content-Encoding": "gzip"},
+    )
+    assert response.status_code == 400
+
+    response = await client.post(
+        url, content=b"{}", headers=headers | {"Content-Encoding": "br"}
+    )
+    assert response.status_code == 415
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+async def test_large_responses_are_compressed(
+    client: AsyncClient,
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+    encoding: str,
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    payload = [make_cogspeed_test(client_id) for _ in range(3)]
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+    # Exports only include tests stored before the current second
+    await session.execute(
+        update(CogspeedTestResult)
+        .where(CogspeedTestResult.client_id == client_id)
+        .values(created_at=datetime(2025, 1, 1))
+    )
+    await session.commit()
+
+    # Only sent when the client accepts an encoding
+    response = await client.get(
+        "/clients/cogspeed/export", headers=headers | {"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in response.headers
+    plain = response.content
+    assert len(plain.splitlines()) == 3
+
+    response = await client.get(
+        "/clients/cogspeed/export", headers=headers | {"Accept-Encoding": encoding}
+    )
+    assert response.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.content == plain
+
+    response = await client.get(
+        "/clients/cogspeed/tests", headers=headers | {"Accept-Encoding": encoding}
+    )
+    assert response.headers["content-encoding"] == encoding
+    assert len(response.json()["items"]) == 3
+
+    # Small responses are not worth compressing
+    response = await client.get(
+        "/clients/fetch", headers=headers | {"Accept-Encoding": encoding}
+    )
+    assert "content-encoding" not in response.headers
+
+
+async def test_compressed_responses_have_a_weak_etag(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "compression_minimum_size", 10)
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+
+    response = await client.get(
+        "/clients/fetch", headers=headers | {"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in response.headers
+    etag = response.headers["etag"]
+    response = await client.get(
+        "/clients/fetch", headers=headers | {"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == f"W/{etag}"
+
+    # Either validator still revalidates the cached response
+    response = await client.get(
+        "/clients/fetch",
+        headers=headers | {"Accept-Encoding": "gzip", "If-None-Match": f"W/{etag}"},
+    )
+    assert response.status_code == 304
@@ -0,0 +1,180 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable
+
+import pyarrow.parquet as pq
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.schemas import CogspeedTestResult
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def uploaded_tests(
+    client: AsyncClient,
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> list[dict[str, Any]]:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    payload = [make_cogspeed_test(client_id) for _ in range(5)]
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+
+    # Backdate the tests, as watermarks have a resolution of one second
+    await session.execute(
+        update(CogspeedTestResult)
+        .where(CogspeedTestResult.client_id == client_id)
+        .values(created_at=datetime(2025, 1, 1))
+    )
+    await session.commit()
+    return payload
+
+
+async def test_export_ndjson_in_chunks(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    uploaded_tests: list[dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "export_chunk_size", 2)
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+
+    response = await client.get("/clients/cogspeed/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "attachment" in response.headers["content-disposition"]
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["id"] for row in rows) == sorted(t["id"] for t in uploaded_tests)
+    assert (
+        rows[0]["blocking_round_duration"] == uploaded_tests[0]["blockingRoundDuration"]
+    )
+
+
+async def test_export_since_watermark(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    uploaded_tests: list[dict[str, Any]],
+) -> None:
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+
+    response = await client.get(
+        "/clients/cogspeed/export",
+        params={"since": "2025-01-01T00:00:00Z"},
+        headers=headers,
+    )
+    assert len(response.text.splitlines()) == len(uploaded_tests)
+
+    watermark = response.headers["x-export-watermark"]
+    response = await client.get(
+        "/clients/cogspeed/export", params={"since": watermark}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+async def test_export_since_watermark_includes_late_commits(
+    client: AsyncClient,
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    response = await client.get("/clients/cogspeed/export", headers=headers)
+    watermark = response.headers["x-export-watermark"]
+
+    # A test inserted before the export started, but committed after it
+    payload = make_cogspeed_test(client_id)
+    response = await client.post(
+        "/clients/cogspeed/tests", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+    inserted_at = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=2)
+    await session.execute(
+        update(CogspeedTestResult)
+        .where(CogspeedTestResult.id == payload["id"])
+        .values(created_at=inserted_at)
+    )
+    await session.commit()
+
+    # The next export, once the lag has passed, picks it up
+    monkeypatch.setattr(settings, "export_watermark_lag", 0)
+    response = await client.get(
+        "/clients/cogspeed/export", params={"since": watermark}, headers=headers
+    )
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [
+        payload["id"]
+    ]
+
+
+async def test_export_rounds_csv(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    uploaded_tests: list[dict[str, Any]],
+) -> None:
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+
+    response = await client.get(
+        "/clients/cogspeed/export",
+        params={"format": "csv", "kind": "rounds"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    rounds = sum(len(test["rounds"]) for test in uploaded_tests)
+    assert len(rows) == rounds
+    assert rows[0]["client_id"] == created_client["client_id"]
+    assert rows[0]["round_number"] == "1"
+
+
+async def test_admin_export_parquet(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    uploaded_tests: list[dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "admin_api_key", "admin-key")
+    monkeypatch.setattr(settings, "export_chunk_size", 2)
+    params = {"format": "parquet", "client_id": created_client["client_id"]}
+
+    response = await client.get("/admin/cogspeed/export", params=params)
+    assert response.status_code == 422
+
+    response = await client.get(
+        "/admin/cogspeed/export", params=params, headers={"X-Admin-Key": "admin-key"}
+    )
+    assert response.status_code == 200
+
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet.metadata.num_rows == len(uploaded_tests)
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert set(table.column("id").to_pylist()) == {t["id"] for t in uploaded_tests}
@@ -0,0 +1,107 @@
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def uploaded_tests(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> list[dict[str, Any]]:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    payload = [
+        make_cogspeed_test(client_id, _date=f"2025-07-{day:02d}T08:00:00.000Z")
+        for day in range(1, 8)
+    ]
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+    return payload
+
+
+async def test_get_tests_pages_through_history(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    uploaded_tests: list[dict[str, Any]],
+) -> None:
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+
+    ids: list[str] = []
+    params: dict[str, Any] = {"limit": 3, "fields": "blocking_round_duration"}
+    while True:
+        response = await client.get(
+            "/clients/cogspeed/tests", params=params, headers=headers
+        )
+        assert response.status_code == 200
+        page = response.json()
+        assert all(
+            set(item) == {"id", "date", "blocking_round_duration"}
+            for item in page["items"]
+        )
+        ids.extend(item["id"] for item in page["items"])
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+
+    assert ids == [test["id"] for test in reversed(uploaded_tests)]
+
+
+async def test_get_tests_filters_and_rounds(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    uploaded_tests: list[dict[str, Any]],
+) -> None:
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+    params = {
+        "since": "2025-07-03",
+        "until": "2025-07-05",
+        "order": "asc",
+        "include_rounds": True,
+    }
+
+    response = await client.get(
+        "/clients/cogspeed/tests", params=params, headers=headers
+    )
+    assert response.status_code == 200
+    items = response.json()["items"]
+
+    assert [item["id"] for item in items] == [t["id"] for t in uploaded_tests[2:4]]
+    assert [r["id"] for r in items[0]["rounds"]] == [
+        r["_id"] for r in uploaded_tests[2]["rounds"]
+    ]
+    assert items[0]["blocking_round_duration"] == 1065
+
+
+async def test_get_tests_rejects_unknown_fields(
+    client: AsyncClient, created_client: "CreatedClientType"
+) -> None:
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+
+    response = await client.get(
+        "/clients/cogspeed/tests", params={"fields": "password_hash"}, headers=headers
+    )
+    assert response.status_code == 422
+
+    response = await client.get(
+        "/clients/cogspeed/tests", params={"cursor": "???"}, headers=headers
+    )
+    assert response.status_code == 400
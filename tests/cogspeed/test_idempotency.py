@@ -0,0 +1,88 @@
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas import CogspeedTestResult, CogspeedTestRound
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_retried_upload_is_already_stored(
+    client: AsyncClient,
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    payload = make_cogspeed_test(client_id)
+
+    response = await client.post(
+        "/clients/cogspeed/tests", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+
+    response = await client.post(
+        "/clients/cogspeed/tests", json=payload, headers=headers
+    )
+    assert response.status_code == 200
+
+    query = select(func.count()).where(CogspeedTestResult.id == payload["id"])
+    assert (await session.execute(query)).scalar() == 1
+    query = select(func.count()).where(CogspeedTestRound.test_id == payload["id"])
+    assert (await session.execute(query)).scalar() == len(payload["rounds"])
+
+
+async def test_idempotency_key(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {
+        "X-Client-ID": client_id,
+        "X-Api-Key": created_client["api_key"],
+        "Idempotency-Key": "upload-1",
+    }
+    payload = make_cogspeed_test(client_id)
+
+    response = await client.post(
+        "/clients/cogspeed/tests", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+
+    response = await client.post(
+        "/clients/cogspeed/tests", json=payload, headers=headers
+    )
+    assert response.status_code == 200
+
+    other = make_cogspeed_test(client_id)
+    response = await client.post("/clients/cogspeed/tests", json=other, headers=headers)
+    assert response.status_code == 409
+
+
+async def test_batch_skips_stored_tests(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    stored = make_cogspeed_test(client_id)
+    response = await client.post(
+        "/clients/cogspeed/tests", json=stored, headers=headers
+    )
+    assert response.status_code == 201
+
+    payload = [stored, make_cogspeed_test(client_id)]
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+    assert [item["status"] for item in response.json()] == ["already_stored", "created"]
@@ -0,0 +1,84 @@
+import datetime
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.norms import rebuild_norms
+from app.routers.norms import get_today
+from tests.conftest import TestingAsyncSessionLocal
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_percentile_within_cohort(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Forget the tests of clients deleted by earlier tests
+    await rebuild_norms(TestingAsyncSessionLocal)
+
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    durations = list(range(800, 1300, 10))
+    payload = [
+        make_cogspeed_test(
+            client_id,
+            blockingRoundDuration=duration,
+            _date="2025-07-01T08:00:00.000Z",
+        )
+        for duration in durations
+    ]
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+
+    # On the day of its tests, the created client is 51 with an unset handedness
+    monkeypatch.setitem(
+        app.dependency_overrides, get_today, lambda: datetime.date(2025, 7, 1)
+    )
+    response = await client.get(
+        "/clients/cogspeed/norms/percentile", params={"value": 1050}, headers=headers
+    )
+    assert response.status_code == 200
+    norm = response.json()
+    assert norm["cohort"] == {
+        "age_band": "50-59",
+        "gender": "test",
+        "handedness": "unknown",
+    }
+    assert norm["cohort_size"] == len(durations)
+    assert norm["percentile"] == pytest.approx(50, abs=1)
+    assert norm["median"] == pytest.approx(1045, abs=5)
+
+    # The client's own mean is ranked by default
+    response = await client.get("/clients/cogspeed/norms/percentile", headers=headers)
+    assert response.json()["value"] == pytest.approx(1045)
+
+    # Rebuilding from the stored tests gives the same norms
+    await rebuild_norms(TestingAsyncSessionLocal)
+    response = await client.get(
+        "/clients/cogspeed/norms/percentile", params={"value": 1050}, headers=headers
+    )
+    rebuilt = response.json()
+    assert rebuilt["cohort"] == norm["cohort"]
+    assert rebuilt["percentile"] == pytest.approx(norm["percentile"])
+
+    # Small cohorts fall back to wider ones
+    monkeypatch.setattr(settings, "norms_min_cohort_size", 10_000)
+    response = await client.get(
+        "/clients/cogspeed/norms/percentile", params={"value": 1050}, headers=headers
+    )
+    assert response.json()["cohort"] == {
+        "age_band": "*",
+        "gender": "*",
+        "handedness": "*",
+    }
@@ -0,0 +1,64 @@
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.schemas import CogspeedTestResult, CogspeedTestRound
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_post_cogspeed_tests_batch(
+    client: AsyncClient,
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+
+    valid = [make_cogspeed_test(client_id) for _ in range(3)]
+    other_client = make_cogspeed_test("someone-else")
+    payload = [*valid, other_client, valid[0]]
+
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+    items = response.json()
+    assert [item["status"] for item in items] == [
+        "created",
+        "created",
+        "created",
+        "rejected",
+        "duplicate",
+    ]
+    assert [item["id"] for item in items] == [test["id"] for test in payload]
+
+    ids = [test["id"] for test in payload]
+    query = select(func.count()).where(CogspeedTestResult.id.in_(ids))
+    assert (await session.execute(query)).scalar() == 3
+
+    query = select(func.count()).where(CogspeedTestRound.test_id.in_(ids))
+    assert (await session.execute(query)).scalar() == 3 * len(valid[0]["rounds"])
+
+
+async def test_post_cogspeed_tests_batch_too_large(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    payload = [make_cogspeed_test(client_id)] * (settings.upload_batch_max_size + 1)
+
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload, headers=headers
+    )
+    assert response.status_code == 413
@@ -0,0 +1,65 @@
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+from httpx import AsyncClient
+
+from app.cache import ByteLRUCache
+from app.response_cache import response_cache
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+
+def test_byte_lru_cache_evicts_by_size_and_skips_stale_writes() -> None:
+    cache: ByteLRUCache[tuple[str, str], bytes] = ByteLRUCache(max_bytes=10, ttl=60)
+    cache.set(("a", "1"), b"12345", 5)
+    cache.set(("b", "1"), b"1234", 4)
+    cache.get(("a", "1"))
+    cache.set(("b", "2"), b"123", 3)
+
+    assert cache.get(("b", "1")) is None
+    assert cache.get(("a", "1")) == b"12345"
+    assert cache.size == 8
+
+    generation = cache.generation("a")
+    assert cache.invalidate_group("a") == 1
+    cache.set(("a", "2"), b"1", 1, generation=generation)
+    assert cache.get(("a", "2")) is None
+    assert cache.size == 3
+
+
+@pytest.mark.asyncio
+async def test_reads_are_cached_until_the_client_writes(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    url = "/clients/cogspeed/tests"
+
+    response = await client.get(url, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    hits = response_cache.hits
+
+    response = await client.get(url, headers=headers | {"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+    assert response_cache.hits == hits + 1
+
+    # Other query parameters are cached separately
+    response = await client.get(url, params={"limit": 1}, headers=headers)
+    assert response.headers["etag"] == etag
+    assert response_cache.hits == hits + 1
+
+    response = await client.post(
+        "/clients/cogspeed/tests", json=make_cogspeed_test(client_id), headers=headers
+    )
+    assert response.status_code == 201
+
+    response = await client.get(url, headers=headers | {"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()["items"]) == 1
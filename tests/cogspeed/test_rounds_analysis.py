@@ -0,0 +1,138 @@
+import copy
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.drilldown import block_transitions, round_matrix, status_counts
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+# (type, status, duration, rolling mean ratio, time taken)
+ROUNDS = [
+    ("training", "correct", -1, "n/a", 1200),
+    ("practice", "incorrect", -1, "n/a", 1100),
+    ("machine-paced", "correct", 1000, 0.9, 950),
+    ("machine-paced", "no response", 1000, 0.8, 1000),
+    ("machine-paced", "correct", 900, 0.85, 880),
+    ("machine-paced", "incorrect", 900, 0.7, 900),
+    ("machine-paced", "correct", 950, 0.75, 930),
+]
+
+
+def with_rounds(payload: dict[str, Any], rounds: list[tuple]) -> dict[str, Any]:
+    template = payload["rounds"][0]
+    payload["rounds"] = []
+    for number, (round_type, status, duration, ratio, time_taken) in enumerate(
+        rounds, start=1
+    ):
+        payload["rounds"].append(
+            copy.deepcopy(template)
+            | {
+                "_id": f"{payload['id'][:-4]}{number:04d}",
+                "roundNumber": number,
+                "roundTypeNormalized": round_type,
+                "status": status,
+                "duration": duration,
+                "correctRollingMeanRatio": ratio,
+                "timeTaken": time_taken,
+            }
+        )
+    return payload
+
+
+async def test_rounds_analysis(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    stored_as_rows = with_rounds(make_cogspeed_test(client_id), ROUNDS)
+    response = await client.post(
+        "/clients/cogspeed/tests", json=stored_as_rows, headers=headers
+    )
+    assert response.status_code == 201
+    monkeypatch.setattr(settings, "rounds_storage", "packed")
+    packed = with_rounds(make_cogspeed_test(client_id), ROUNDS[:3])
+    response = await client.post(
+        "/clients/cogspeed/tests", json=packed, headers=headers
+    )
+    assert response.status_code == 201
+
+    response = await client.get(
+        "/clients/cogspeed/analytics/rounds",
+        params={"test_ids": f"{stored_as_rows['id']},{packed['id']}"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    analysis = response.json()
+
+    first, second = analysis["tests"]
+    assert first["test_id"] == stored_as_rows["id"]
+    assert first["round_numbers"] == list(range(1, 8))
+    assert first["response_times"] == [r[4] for r in ROUNDS]
+    assert first["rolling_mean_ratios"] == [None, None, 0.9, 0.8, 0.85, 0.7, 0.75]
+    assert first["status_counts"] == {"correct": 4, "incorrect": 2, "no response": 1}
+    assert first["machine_paced_status_counts"] == {
+        "correct": 3,
+        "incorrect": 1,
+        "no response": 1,
+    }
+    assert first["block_transitions"] == [
+        {"round_number": 5, "from_duration": 1000, "to_duration": 900},
+        {"round_number": 7, "from_duration": 900, "to_duration": 950},
+    ]
+    assert second["round_numbers"] == [1, 2, 3]
+    assert second["statuses"] == ["correct", "incorrect", "correct"]
+    assert second["block_transitions"] == []
+    assert analysis["mean_response_times"] == [1200, 1100, 950, 1000, 880, 900, 930]
+
+
+async def test_rounds_analysis_of_unknown_test(
+    client: AsyncClient, created_client: "CreatedClientType"
+) -> None:
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+    response = await client.get(
+        "/clients/cogspeed/analytics/rounds",
+        params={"test_ids": "missing"},
+        headers=headers,
+    )
+    assert response.status_code == 404
+    assert "missing" in response.json()["detail"]
+
+
+async def test_block_transitions_skip_other_rounds() -> None:
+    # A self-paced round between two machine-paced blocks does not end a block
+    columns: dict[str, Sequence[Any]] = {
+        "round_number": [1, 2, 3, 4],
+        "status": ["correct", None, "correct", "incorrect"],
+        "round_type_normalized": [
+            "machine-paced",
+            "self-paced",
+            "machine-paced",
+            "machine-paced",
+        ],
+        "duration": [800, 1500, 800, 850],
+        "correct_rolling_mean_ratio": ["0.5", None, "bad", 1.25],
+        "time_taken": [700, 1400, 750, 820],
+        "ratio": [1.0, 1.0, 1.0, 1.0],
+    }
+    matrix = round_matrix(["a", "b"], [columns, {name: [] for name in columns}])
+
+    tests, rounds, before, after = block_transitions(matrix)
+    assert tests.tolist() == [0]
+    assert rounds.tolist() == [4]
+    assert (before.tolist(), after.tolist()) == ([800], [850])
+    assert status_counts(matrix).tolist() == [[2, 1, 0], [0, 0, 0]]
+    np.testing.assert_equal(matrix.rolling_mean_ratio[0], [0.5, np.nan, np.nan, 1.25])
+    assert matrix.counts.tolist() == [4, 0]
@@ -0,0 +1,215 @@
+import base64
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import CogspeedTestResultModel
+from app.archive import archive_path
+from app.rounds import (
+    archive_rounds,
+    fetch_rounds,
+    pack_rounds,
+    pack_stored_rounds,
+    unpack_rounds,
+    unpack_stored_rounds,
+)
+from app.schemas import CogspeedTestResult, CogspeedTestRound
+from tests.conftest import TestingAsyncSessionLocal
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_pack_rounds_round_trip(
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    test = CogspeedTestResultModel.model_validate(make_cogspeed_test("abc"))
+    test.rounds[1].correct_rolling_mean_ratio = 0.75
+    test.rounds[1].is_correct_or_incorrect_from_previous = "correct"
+    test.rounds[1].location_clicked = None
+
+    unpacked = unpack_rounds(pack_rounds(test.rounds))
+
+    assert unpacked[0] == test.rounds[0]
+    assert unpacked[1].correct_rolling_mean_ratio == "0.75"
+    assert unpacked[1].is_correct_or_incorrect_from_previous == "correct"
+    assert unpacked[1].location_clicked is None
+
+
+async def test_pack_rounds_with_non_uuid_ids(
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    test = CogspeedTestResultModel.model_validate(make_cogspeed_test("abc"))
+    test.rounds[0].id = "not-a-uuid"
+
+    unpacked = unpack_rounds(pack_rounds(test.rounds, compress=False))
+
+    assert [r.id for r in unpacked] == [r.id for r in test.rounds]
+
+
+async def test_pack_rounds_out_of_range_values(
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    test = CogspeedTestResultModel.model_validate(make_cogspeed_test("abc"))
+    test.rounds[0].location_clicked = -(2**31)
+    test.rounds[1].location_clicked = None
+    test.rounds[0].answer_location = 2**31
+    test.rounds[1].round_type = -(2**63)
+    test.rounds[0].query_number = "q" * 70_000
+
+    unpacked = unpack_rounds(pack_rounds(test.rounds))
+
+    assert unpacked == test.rounds
+
+
+async def test_pack_rounds_more_than_65535_strings(
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    template = CogspeedTestResultModel.model_validate(make_cogspeed_test("abc"))
+    rounds = [
+        template.rounds[0].model_copy(
+            update={
+                "round_number": i,
+                "query_number": str(i),
+                "is_correct_or_incorrect_from_previous": f"p{i}" if i % 2 else None,
+            }
+        )
+        for i in range(70_000)
+    ]
+
+    unpacked = unpack_rounds(pack_rounds(rounds))
+
+    assert len(unpacked) == len(rounds)
+    assert unpacked[-2:] == rounds[-2:]
+
+
+# Two rounds packed by the first version of the format
+VERSION_1_BLOB = base64.b64decode(
+    "Q1IBAQIAeJxjYWBnSM4vKkpNLuFlyE1MzsjMS9UtSExOTWFiKDRkZsjTT8xkZGBgYALiYgYQwcjAyJ"
+    "DJDGSBcCY7Axg0FDMBlaSB2Q79DjC6mBmoKpMJqh8ivaXXAUYX/weCtLNnQOCNPYwuhRjpwNDAgAzg"
+    "fEagOQd4ncornWA0AIp0K0Y="
+)
+
+
+async def test_unpack_version_1_rounds() -> None:
+    unpacked = unpack_rounds(VERSION_1_BLOB)
+
+    assert [r.round_number for r in unpacked] == [1, 2]
+    assert [r.location_clicked for r in unpacked] == [7, None]
+    assert unpacked[1].id == "00000000-0000-4000-8000-000000000001"
+    assert unpacked[0].is_correct_or_incorrect_from_previous is None
+
+
+async def test_post_cogspeed_test_packed(
+    client: AsyncClient,
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "rounds_storage", "packed")
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    payload = make_cogspeed_test(client_id)
+
+    response = await client.post(
+        "/clients/cogspeed/tests", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+
+    query = select(func.count()).where(CogspeedTestRound.test_id == payload["id"])
+    assert (await session.execute(query)).scalar() == 0
+
+    rounds = await fetch_rounds(session, client_id, [payload["id"]])
+    expected = CogspeedTestResultModel.model_validate(payload).rounds
+    assert rounds[payload["id"]] == expected
+
+
+async def test_migrate_between_storage_modes(
+    client: AsyncClient,
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    payload = make_cogspeed_test(client_id)
+    response = await client.post(
+        "/clients/cogspeed/tests", json=payload, headers=headers
+    )
+    assert response.status_code == 201
+    expected = await fetch_rounds(session, client_id, [payload["id"]])
+
+    assert await pack_stored_rounds(TestingAsyncSessionLocal) >= 1
+    blob_query = select(CogspeedTestResult.rounds_blob).where(
+        CogspeedTestResult.id == payload["id"]
+    )
+    assert (await session.execute(blob_query)).scalar() is not None
+    assert await fetch_rounds(session, client_id, [payload["id"]]) == expected
+
+    assert await unpack_stored_rounds(TestingAsyncSessionLocal) >= 1
+    assert (await session.execute(blob_query)).scalar() is None
+    assert await fetch_rounds(session, client_id, [payload["id"]]) == expected
+
+
+async def test_archive_old_rounds(
+    client: AsyncClient,
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(settings, "rounds_archive_dir", str(tmp_path))
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+
+    async def upload(created_at: datetime) -> str:
+        payload = make_cogspeed_test(client_id)
+        response = await client.post(
+            "/clients/cogspeed/tests", json=payload, headers=headers
+        )
+        assert response.status_code == 201
+        await session.execute(
+            update(CogspeedTestResult)
+            .where(CogspeedTestResult.id == payload["id"])
+            .values(created_at=created_at)
+        )
+        await session.commit()
+        return payload["id"]
+
+    january = await upload(datetime(2025, 1, 10))
+    february = await upload(datetime(2025, 2, 10))
+    recent = await upload(datetime(2025, 6, 10))
+    test_ids = [january, february, recent]
+    expected = await fetch_rounds(session, client_id, test_ids)
+
+    assert await archive_rounds(TestingAsyncSessionLocal, datetime(2025, 6, 1)) == 2
+    assert archive_path("2025-01").exists() and archive_path("2025-02").exists()
+
+    query = select(func.count()).where(CogspeedTestRound.client_id == client_id)
+    assert (await session.execute(query)).scalar() == len(expected[recent])
+    session.expire_all()
+    assert await fetch_rounds(session, client_id, test_ids) == expected
+
+    # Archiving more tests of a month keeps the ones already archived
+    later = await upload(datetime(2025, 1, 20))
+    expected |= await fetch_rounds(session, client_id, [later])
+    assert await archive_rounds(TestingAsyncSessionLocal, datetime(2025, 6, 1)) == 1
+    assert await fetch_rounds(session, client_id, [*test_ids, later]) == expected
+
+    response = await client.get(
+        "/clients/cogspeed/tests",
+        params={"include_rounds": True},
+        headers=headers,
+    )
+    items = {item["id"]: item for item in response.json()["items"]}
+    assert len(items[january]["rounds"]) == len(expected[january])
@@ -0,0 +1,84 @@
+import random
+import statistics
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+from httpx import AsyncClient
+
+from app.summary import RunningStats, rebuild_summaries
+from tests.conftest import TestingAsyncSessionLocal
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+
+def test_running_stats_match_batch_statistics() -> None:
+    rng = random.Random(0)
+    values = [rng.gauss(1e6, 50) for _ in range(1000)]
+
+    merged = RunningStats()
+    for chunk in (values[:10], values[10:500], values[500:]):
+        part = RunningStats()
+        for value in chunk:
+            part.add(value)
+        merged.merge(part)
+
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(statistics.fmean(values))
+    assert merged.std == pytest.approx(statistics.stdev(values))
+    assert (merged.min, merged.max) == (min(values), max(values))
+
+
+@pytest.mark.asyncio
+async def test_summary_is_updated_on_upload_and_rebuild(
+    client: AsyncClient,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    durations = [900, 1000, 1100, 1300, 800, 950]
+    hours = [7, 8, 9, 18, 19, 20]
+    payload = [
+        make_cogspeed_test(
+            client_id,
+            blockingRoundDuration=duration,
+            _date=f"2025-07-0{i + 1}T{hour:02d}:30:00.000Z",
+        )
+        for i, (duration, hour) in enumerate(zip(durations, hours))
+    ]
+
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload[:4], headers=headers
+    )
+    assert response.status_code == 201
+    # Tests which are already stored are not counted twice
+    response = await client.post(
+        "/clients/cogspeed/tests/batch", json=payload[2:], headers=headers
+    )
+    assert response.status_code == 201
+
+    response = await client.get("/clients/cogspeed/summary", headers=headers)
+    assert response.status_code == 200
+    summary = {
+        item["bucket"]: item
+        for item in response.json()
+        if item["metric"] == "blocking_round_duration"
+    }
+    assert summary["all"]["count"] == 6
+    assert summary["all"]["mean"] == pytest.approx(statistics.fmean(durations))
+    assert summary["all"]["std"] == pytest.approx(statistics.stdev(durations))
+    assert summary["morning"]["mean"] == pytest.approx(1000)
+    assert summary["morning"]["ci"] == pytest.approx(248.4, abs=0.1)
+    assert summary["evening"]["min"] == 800
+
+    await rebuild_summaries(TestingAsyncSessionLocal, chunk_size=4)
+    response = await client.get("/clients/cogspeed/summary", headers=headers)
+    rebuilt = {
+        item["bucket"]: item
+        for item in response.json()
+        if item["metric"] == "blocking_round_duration"
+    }
+    assert rebuilt.keys() == summary.keys()
+    for bucket, item in rebuilt.items():
+        assert item == pytest.approx(summary[bucket])
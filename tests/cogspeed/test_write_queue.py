@@ -0,0 +1,119 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CogspeedTestResultModel
+from app.schemas import CogspeedTestResult, CogspeedTestRound
+from app import write_queue
+from app.write_queue import CogspeedWriteQueue
+from tests.conftest import TestingAsyncSessionLocal
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_concurrent_uploads_are_group_committed(
+    client: AsyncClient,
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    client_id = created_client["client_id"]
+    headers = {"X-Client-ID": client_id, "X-Api-Key": created_client["api_key"]}
+    payloads = [make_cogspeed_test(client_id) for _ in range(10)]
+
+    responses = await asyncio.gather(
+        *(
+            client.post("/clients/cogspeed/tests", json=payload, headers=headers)
+            for payload in payloads
+        )
+    )
+    assert all(response.status_code == 201 for response in responses)
+
+    ids = [payload["id"] for payload in payloads]
+    query = select(func.count()).where(CogspeedTestResult.id.in_(ids))
+    assert (await session.execute(query)).scalar() == len(payloads)
+
+    query = select(func.count()).where(CogspeedTestRound.test_id.in_(ids))
+    assert (await session.execute(query)).scalar() == 2 * len(payloads)
+
+
+async def test_batch_flushes_when_full(
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    queue = CogspeedWriteQueue(TestingAsyncSessionLocal, max_batch_size=4, max_delay=60)
+    tests = [
+        CogspeedTestResultModel.model_validate(
+            make_cogspeed_test(created_client["client_id"])
+        )
+        for _ in range(8)
+    ]
+
+    await asyncio.wait_for(asyncio.gather(*map(queue.submit, tests)), timeout=5)
+
+    assert queue.submitted == 8
+    assert queue.batches == 2
+
+
+async def test_failed_upload_does_not_fail_its_batch(
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    queue = CogspeedWriteQueue(TestingAsyncSessionLocal, max_batch_size=3, max_delay=1)
+    tests = [
+        CogspeedTestResultModel.model_validate(
+            make_cogspeed_test(created_client["client_id"])
+        )
+        for _ in range(3)
+    ]
+    insert_tests = write_queue.insert_tests
+
+    async def failing_insert_tests(
+        session: AsyncSession, batch: list[CogspeedTestResultModel]
+    ) -> list[bool]:
+        if any(test.id == tests[1].id for test in batch):
+            raise ValueError("Bad upload")
+        return await insert_tests(session, batch)
+
+    monkeypatch.setattr(write_queue, "insert_tests", failing_insert_tests)
+
+    results = await asyncio.gather(*map(queue.submit, tests), return_exceptions=True)
+
+    assert results[0] is True and results[2] is True
+    assert isinstance(results[1], ValueError)
+    # The batch, then each of its tests on its own
+    assert queue.batches == 4
+    ids = [tests[0].id, tests[2].id]
+    query = select(func.count()).where(CogspeedTestResult.id.in_(ids))
+    assert (await session.execute(query)).scalar() == 2
+
+
+async def test_repeated_upload_in_a_batch_is_stored_once(
+    session: AsyncSession,
+    created_client: "CreatedClientType",
+    make_cogspeed_test: Callable[..., dict[str, Any]],
+) -> None:
+    queue = CogspeedWriteQueue(TestingAsyncSessionLocal, max_batch_size=3, max_delay=1)
+    payload = make_cogspeed_test(created_client["client_id"])
+    test = CogspeedTestResultModel.model_validate(payload)
+    retry = CogspeedTestResultModel.model_validate(payload)
+    other = CogspeedTestResultModel.model_validate(
+        make_cogspeed_test(created_client["client_id"])
+    )
+
+    stored = await asyncio.gather(
+        queue.submit(test), queue.submit(retry), queue.submit(other)
+    )
+
+    assert stored == [True, False, True]
+    assert queue.batches == 1
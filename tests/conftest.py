@@ -1,21 +1,25 @@
 """Sets up the fixtures for the tests."""
 
+import copy
 import datetime
-from typing import AsyncGenerator, TypedDict
+import uuid
+from typing import Any, AsyncGenerator, Callable, TypedDict
 
+import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 from pytest import FixtureRequest, Parser
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.database import get_db
+from app.database import create_sqlite_engine, get_db, get_session_factory
 from app.main import app
 from app.utils import create_hash
 from app.schemas import Base, Client
+from app.write_queue import CogspeedWriteQueue, get_write_queue
 
 TEST_SQLALCHEMY_DATABASE_URL: str = "sqlite+aiosqlite:///./test.sqlite"
 
-engine = create_async_engine(TEST_SQLALCHEMY_DATABASE_URL)
+engine = create_sqlite_engine(TEST_SQLALCHEMY_DATABASE_URL)
 
 TestingAsyncSessionLocal = async_sessionmaker(
     bind=engine, class_=AsyncSession, autocommit=False, autoflush=False
@@ -27,7 +31,13 @@ async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+testing_write_queue = CogspeedWriteQueue(
+    TestingAsyncSessionLocal, max_batch_size=64, max_delay=0.002
+)
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_write_queue] = lambda: testing_write_queue
+app.dependency_overrides[get_session_factory] = lambda: TestingAsyncSessionLocal
 
 
 def pytest_addoption(parser: Parser):
@@ -105,3 +115,23 @@ async def created_client(
 
     await session.delete(test_client)
     await session.commit()
+
+
+@pytest.fixture
+def make_cogspeed_test() -> Callable[..., dict[str, Any]]:
+    """
+    Fixture returning a factory for Cogspeed test upload payloads.
+    Every payload gets fresh test and round ids.
+    """
+    from tests.cogspeed.test_post_test_result import example_test_response
+
+    def factory(client_id: str, **overrides: Any) -> dict[str, Any]:
+        payload = copy.deepcopy(example_test_response)
+        payload["id"] = str(uuid.uuid4())
+        payload["client_id"] = client_id
+        for test_round in payload["rounds"]:
+            test_round["_id"] = str(uuid.uuid4())
+        payload.update(overrides)
+        return payload
+
+    return factory
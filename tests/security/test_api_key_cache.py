@@ -0,0 +1,85 @@
+from typing import TYPE_CHECKING
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.schemas import Client
+from app.security import api_key_cache
+
+if TYPE_CHECKING:
+    from ..conftest import CreatedClientType
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_api_key_is_cached(
+    client: AsyncClient, created_client: "CreatedClientType"
+) -> None:
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+
+    response = await client.get("/clients/fetch", headers=headers)
+    assert response.status_code == 200
+    hits = api_key_cache.hits
+
+    response = await client.get("/clients/fetch", headers=headers)
+    assert response.status_code == 200
+    assert api_key_cache.hits == hits + 1
+
+
+async def test_changed_api_key_invalidates_cache(
+    client: AsyncClient, session: AsyncSession, created_client: "CreatedClientType"
+) -> None:
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+    response = await client.get("/clients/fetch", headers=headers)
+    assert response.status_code == 200
+
+    query = select(Client).where(Client.client_id == created_client["client_id"])
+    db_client = (await session.execute(query)).scalar_one()
+    db_client.api_key = "a-new-api-key"
+    await session.commit()
+
+    response = await client.get("/clients/fetch", headers=headers)
+    assert response.status_code == 401
+
+
+async def test_key_read_before_commit_is_not_cached(
+    client: AsyncClient, session: AsyncSession, created_client: "CreatedClientType"
+) -> None:
+    headers = {
+        "X-Client-ID": created_client["client_id"],
+        "X-Api-Key": created_client["api_key"],
+    }
+    query = select(Client).where(Client.client_id == created_client["client_id"])
+    db_client = (await session.execute(query)).scalar_one()
+    db_client.api_key = "a-new-api-key"
+    await session.flush()
+
+    # Until the change is committed, the old key is still the stored one
+    response = await client.get("/clients/fetch", headers=headers)
+    assert response.status_code == 200
+
+    await session.commit()
+    response = await client.get("/clients/fetch", headers=headers)
+    assert response.status_code == 401
+
+
+async def test_metrics_require_admin_key(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "admin_api_key", "admin-key")
+
+    response = await client.get("/metrics", headers={"X-Admin-Key": "wrong"})
+    assert response.status_code == 401
+
+    response = await client.get("/metrics", headers={"X-Admin-Key": "admin-key"})
+    assert response.status_code == 200
+    assert set(response.json()["auth_cache"]) == {"size", "hits", "misses"}
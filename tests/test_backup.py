@@ -0,0 +1,66 @@
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+
+from app.backup import backup_database, list_snapshots, restore_database
+
+
+def make_database(path: Path, rows: int) -> None:
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE tests (id INTEGER PRIMARY KEY, data TEXT)")
+        conn.executemany("INSERT INTO tests (data) VALUES (?)", [("x" * 500,)] * rows)
+        conn.commit()
+
+
+def count(path: Path) -> int:
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute("SELECT count(*) FROM tests").fetchone()[0]
+
+
+def test_backup_prune_and_restore(tmp_path: Path) -> None:
+    database = tmp_path / "db.sqlite"
+    backup_dir = tmp_path / "backups"
+    make_database(database, 1000)
+
+    snapshots = [
+        backup_database(database, backup_dir, keep=2, pages=8, sleep=0)
+        for _ in range(3)
+    ]
+
+    assert list_snapshots(backup_dir) == snapshots[1:]
+    assert count(snapshots[-1]) == 1000
+    with closing(sqlite3.connect(snapshots[-1])) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+    with closing(sqlite3.connect(database)) as conn:
+        conn.execute("DELETE FROM tests")
+        conn.commit()
+    restore_database(snapshots[-1], database)
+    assert count(database) == 1000
+
+
+def test_backup_finishes_under_concurrent_writes(tmp_path: Path) -> None:
+    database = tmp_path / "db.sqlite"
+    make_database(database, 2000)
+    stop = threading.Event()
+
+    def write() -> None:
+        with closing(sqlite3.connect(database)) as conn:
+            while not stop.is_set():
+                conn.execute("INSERT INTO tests (data) VALUES ('y')")
+                conn.commit()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        # Every write restarts the backup, until it is finished in one step
+        snapshot = backup_database(
+            database, tmp_path / "backups", pages=1, sleep=0.001, max_restarts=2
+        )
+    finally:
+        stop.set()
+        writer.join()
+
+    assert count(snapshot) >= 2000
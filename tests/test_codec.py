@@ -0,0 +1,68 @@
+import datetime
+import json
+from typing import Any, Callable
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from httpx import AsyncClient
+
+from app.codec import CODECS, get_adapter
+from app.models import ClientModel, CogspeedTestResultModel, LoginResponseModel
+
+login_response = LoginResponseModel(
+    success=True,
+    error=None,
+    client=ClientModel(
+        client_id="abcdefghij",
+        api_key="0f4b6c9e-6a4f-4a8e-9a53-5d3a4d2b8f10",
+        password_hash="x" * 64,
+        email="zoë@example.com",
+        full_name="Zoë Tester",
+        date_of_birth=datetime.date(1990, 2, 3),
+        gender="Female",
+        country="Canada",
+    ),
+)
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_codecs_match_fastapi_encoding(codec: str) -> None:
+    expected = json.dumps(
+        jsonable_encoder(login_response),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode()
+
+    encoded = CODECS[codec].encode(login_response, get_adapter(LoginResponseModel))
+
+    assert encoded == expected
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_codecs_decode_aliases(
+    codec: str, make_cogspeed_test: Callable[..., dict[str, Any]]
+) -> None:
+    payload = make_cogspeed_test("abcdefghij")
+
+    test = CODECS[codec].decode(
+        json.dumps(payload).encode(), get_adapter(CogspeedTestResultModel)
+    )
+
+    assert test == CogspeedTestResultModel.model_validate(payload)
+
+
+@pytest.mark.asyncio
+async def test_invalid_body_is_unprocessable(client: AsyncClient) -> None:
+    response = await client.post("/clients/login", json={"email": "not-an-email"})
+    assert response.status_code == 422
+    locs = [error["loc"] for error in response.json()["detail"]]
+    assert ["body", "email"] in locs
+    assert ["body", "password"] in locs
+
+    response = await client.post(
+        "/clients/login",
+        content=b"{not json",
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 422
@@ -0,0 +1,17 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_sqlite_pragmas_are_applied(session: AsyncSession) -> None:
+    journal_mode = (await session.execute(text("PRAGMA journal_mode"))).scalar()
+    busy_timeout = (await session.execute(text("PRAGMA busy_timeout"))).scalar()
+    synchronous = (await session.execute(text("PRAGMA synchronous"))).scalar()
+
+    assert journal_mode == settings.sqlite_journal_mode.lower()
+    assert busy_timeout == settings.sqlite_busy_timeout
+    assert synchronous == 1  # NORMAL
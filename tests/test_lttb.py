@@ -0,0 +1,66 @@
+import numpy as np
+
+from app.analytics import downsample, lttb
+
+
+def envelope_error(y: np.ndarray, keep: np.ndarray, columns: int) -> float:
+    """Returns how much of each pixel column's range the kept points miss."""
+    kept = np.zeros(len(y), dtype=bool)
+    kept[keep] = True
+    errors = []
+    for column in np.array_split(np.arange(len(y)), columns):
+        values = y[column]
+        if not kept[column].any():
+            errors.append(np.ptp(values))
+            continue
+        shown = values[kept[column]]
+        errors.append(values.max() - shown.max() + shown.min() - values.min())
+    return float(np.mean(errors))
+
+
+def test_lttb_keeps_the_shape_of_the_line() -> None:
+    rng = np.random.default_rng(0)
+    n = 10_000
+    x = np.arange(n, dtype=np.float64)
+    y = 100 * np.sin(x / 500) + rng.normal(0, 5, n)
+    spikes = np.sort(rng.choice(n, 10, replace=False))
+    y[spikes] += np.where(np.arange(10) % 2, 400, -400)
+
+    keep = lttb(x, y, 500)
+
+    assert len(keep) == 500
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+    assert set(spikes.tolist()) <= set(keep.tolist())
+
+    # Drawn 250 pixels wide, the downsampled line covers nearly the same range
+    # in each pixel as the full one, unlike taking every 20th point
+    full_range = np.mean([np.ptp(c) for c in np.array_split(y, 250)])
+    every_nth = np.linspace(0, n - 1, 500).astype(np.intp)
+    assert envelope_error(y, keep, 250) < 0.25 * full_range
+    assert envelope_error(y, every_nth, 250) > 2 * envelope_error(y, keep, 250)
+
+
+def test_lttb_short_series_and_missing_values() -> None:
+    assert lttb(np.arange(5.0), np.arange(5.0), 10).tolist() == [0, 1, 2, 3, 4]
+
+    y = np.arange(100, dtype=np.float64)
+    y[10:60] = np.nan
+    keep = lttb(np.arange(100.0), y, 10)
+    assert len(keep) == 10 and keep[-1] == 99
+
+
+def test_downsample_shares_the_points_between_series() -> None:
+    rng = np.random.default_rng(1)
+    dates = np.datetime64("2025-01-01") + np.arange(1000).astype("timedelta64[h]")
+    series = [rng.normal(0, 1, 1000) for _ in range(4)]
+    series[3][500] = 50
+
+    keep = downsample(dates, series, 100)
+    assert keep is not None and len(keep) <= 100
+    assert 500 in keep.tolist()
+
+    # Too few points to give every series three, so they follow the first one
+    keep = downsample(dates, series, 10)
+    assert keep is not None and len(keep) == 10
+    assert downsample(dates, series, 1000) is None
@@ -7,7 +7,7 @@ def test_testresult_pydantic_and_sqlalchemy_schemas_are_in_sync():
     sqlalchemy_columns = {c.name for c in inspect(CogspeedTestResult).columns}
     pydantic_fields = set(CogspeedTestResultModel.model_fields.keys())
 
-    sqlalchemy_only = {"created_at"}
+    sqlalchemy_only = {"created_at", "rounds_blob", "rounds_archive"}
     pydantic_only = {"rounds"}
 
     expected_pydantic_fields = (sqlalchemy_columns - sqlalchemy_only).union(
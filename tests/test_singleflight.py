@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution() -> None:
+    flight = SingleFlight()
+    started = 0
+    release = asyncio.Event()
+
+    async def compute() -> list[int]:
+        nonlocal started
+        started += 1
+        await release.wait()
+        return [started]
+
+    waiters = [
+        asyncio.ensure_future(flight.do(("query", "a"), compute)) for _ in range(5)
+    ]
+    other = asyncio.ensure_future(flight.do(("query", "b"), compute))
+    await asyncio.sleep(0)
+    assert len(flight) == 2
+
+    # A caller going away does not cancel the computation for the others
+    waiters.pop().cancel()
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert started == 2
+    assert all(result is results[0] for result in results)
+    assert await other == [2]
+    assert len(flight) == 0
+    assert flight.stats() == {"query": {"calls": 6, "executions": 2, "shared": 4}}
+
+    # Calls after the first finished run again
+    assert await flight.do(("query", "a"), compute) == [3]
+
+
+@pytest.mark.asyncio
+async def test_errors_are_raised_to_every_caller() -> None:
+    flight = SingleFlight()
+
+    async def compute() -> None:
+        await asyncio.sleep(0)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(
+        *(flight.do(("query",), compute) for _ in range(3)), return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [ValueError] * 3
+    assert flight.stats()["query"]["executions"] == 1
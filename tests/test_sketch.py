@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from app.sketch import TDigest
+
+
+def test_merged_digests_match_exact_quantiles() -> None:
+    values = np.random.default_rng(0).lognormal(7, 0.3, 50_000)
+
+    digest = TDigest(200)
+    for part in np.array_split(values, 10):
+        partial = TDigest(200)
+        for chunk in np.array_split(part, 20):
+            partial.add(chunk)
+        digest.merge(partial)
+
+    assert digest.count == len(values)
+    assert len(digest.means) <= 200
+    for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+        exact = np.quantile(values, q)
+        assert digest.cdf(exact) == pytest.approx(q, abs=0.005)
+        assert digest.quantile(q) == pytest.approx(exact, rel=0.005)
+    assert digest.cdf(values.min() - 1) == 0
+    assert digest.cdf(values.max() + 1) == 1
+
+
+def test_digest_round_trips_through_bytes() -> None:
+    digest = TDigest(100)
+    digest.add([3.0, 1.0, 2.0, float("nan")])
+
+    restored = TDigest.from_bytes(digest.to_bytes())
+
+    assert restored.count == 3
+    assert (restored.min, restored.max) == (1.0, 3.0)
+    assert restored.quantile(0.5) == digest.quantile(0.5) == 2.0
+    with pytest.raises(ValueError):
+        TDigest.from_bytes(b"XX" + digest.to_bytes()[2:])
@@ -1,126 +1,471 @@
-from typing import Any
+"""Generates a synthetic Cogspeed database of clients, tests and rounds.
+
+Every column is sampled with vectorised NumPy from a fixed seed, a chunk of
+clients at a time, so the same arguments always produce the same database and
+millions of rounds take seconds rather than hours. Each client has a baseline
+blocking round duration, which is slower with age and later in the day, and
+each test's machine-paced blocks get faster until they settle on it, so the
+dashboard's charts and the API's analytics have realistic shapes to show.
+
+The tables are created from the app's schemas and filled with bulk inserts
+with the journal off. Their secondary indexes are built once, after the load,
+which is much faster than updating them row by row. Constraints declared in
+the tables themselves, like primary keys and unique columns, are kept, so the
+database is the same as one created by the API.
+
+    python visualisation/scripts/create_test_data.py data/db.sqlite \\
+        --clients 25000 --tests-per-client 40
+
+Every client's password is "password". Afterwards, build the summaries and
+norms the API keeps up to date on upload:
+
+    python -m app.cli rebuild-summary && python -m app.cli rebuild-norms
+"""
+
+import argparse
+import datetime
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
 import pandas as pd
-import random
-from datetime import datetime, timedelta, time
-import uuid
-
-
-def generate_test_data(days: int = 30):
-    new_data: list[dict[str, Any]] = []
-    today = datetime.now()
-
-    for i in range(days):
-        current_date = today - timedelta(days=i)
-        num_tests_today = random.choice([2, 3])
-
-        morning_time = time(
-            hour=random.randint(6, 10),
-            minute=random.randint(0, 59),
-            second=random.randint(0, 59),
-        )
-        morning_datetime = datetime.combine(current_date.date(), morning_time)
-
-        morning_record = BASE_RECORD.copy()
-        morning_record["id"] = str(uuid.uuid4())
-        morning_record["blocking_round_duration"] = random.randint(1050, 1250)
-        morning_record["fatigue_level"] = random.randint(5, 7)
-        morning_record["date"] = (
-            morning_datetime.isoformat(timespec="milliseconds") + "Z"
-        )
-        morning_record["local_date"] = morning_datetime.strftime("%d/%m/%Y")
-        morning_record["local_time"] = morning_datetime.strftime("%H:%M:%S")
-        morning_record["created_at"] = morning_datetime.strftime("%Y-%m-%d %H:%M:%S")
-        new_data.append(morning_record)
-
-        evening_time = time(
-            hour=random.randint(17, 22),
-            minute=random.randint(0, 59),
-            second=random.randint(0, 59),
-        )
-        evening_datetime = datetime.combine(current_date.date(), evening_time)
-
-        evening_record = BASE_RECORD.copy()
-        evening_record["id"] = str(uuid.uuid4())
-        evening_record["blocking_round_duration"] = random.randint(1280, 1450)
-        evening_record["fatigue_level"] = random.randint(1, 4)
-        evening_record["date"] = (
-            evening_datetime.isoformat(timespec="milliseconds") + "Z"
-        )
-        evening_record["local_date"] = evening_datetime.strftime("%d/%m/%Y")
-        evening_record["local_time"] = evening_datetime.strftime("%H:%M:%S")
-        evening_record["created_at"] = evening_datetime.strftime("%Y-%m-%d %H:%M:%S")
-        new_data.append(evening_record)
-
-        if num_tests_today == 3:
-            midday_time = time(
-                hour=random.randint(12, 15),
-                minute=random.randint(0, 59),
-                second=random.randint(0, 59),
-            )
-            midday_datetime = datetime.combine(current_date.date(), midday_time)
-
-            midday_record = BASE_RECORD.copy()
-            midday_record["id"] = str(uuid.uuid4())
-            # Score and fatigue are somewhere in between morning and evening levels
-            midday_record["blocking_round_duration"] = random.randint(1200, 1350)
-            midday_record["fatigue_level"] = random.randint(3, 5)
-            midday_record["date"] = (
-                midday_datetime.isoformat(timespec="milliseconds") + "Z"
-            )
-            midday_record["local_date"] = midday_datetime.strftime("%d/%m/%Y")
-            midday_record["local_time"] = midday_datetime.strftime("%H:%M:%S")
-            midday_record["created_at"] = midday_datetime.strftime("%Y-%m-%d %H:%M:%S")
-            new_data.append(midday_record)
-
-    return pd.DataFrame(new_data)
-
-
-BASE_RECORD: dict[str, Any] = {
-    "id": "190aab75-1c26-449a-8067-7739285266bc",
-    "client_id": "Gcqp4RbdvH",
-    "status_code": 0,
-    "status": "success",
-    "success": True,
-    "message": "Test completed successfully",
-    "test_duration": 39280,
-    "number_of_rounds": 40,
-    "blocking_round_duration": 1320,
-    "cognitive_processing_index": 82,
-    "machine_paced_baseline": 1998.1,
-    "version": "4a2b6dacbd7b39afdf328034b3b58380cd2136a2",
-    "fatigue_level": -1,
-    "number_of_roll_mean_limit_exceedences": 0,
-    "final_ratio": 1.6519396551724137,
-    "block_count": 2,
-    "lowest_block_time": 803.8709637051013,
-    "highest_block_time": 1052.7855088137953,
-    "block_range": 248,
-    "final_block_diff": 248,
-    "total_machine_paced_answers": 30,
-    "total_machine_paced_correct_answers": 24,
-    "total_machine_paced_incorrect_answers": 1,
-    "total_machine_paced_no_response_answers": 5,
-    "quickest_response": 658.1999998092651,
-    "quickest_correct_response": 658.1999998092651,
-    "slowest_response": 1457.5999999046326,
-    "slowest_correct_response": 1197.2000000476837,
-    "mean_machine_paced_answer_time": 879.7766666650772,
-    "mean_correct_machine_paced_answer_time": 856.0708333353201,
-    "date": "",
-    "date_minute_offset": -60,
-    "normalized_location": "Could not get location",
-    "local_date": "",
-    "local_time": "",
-    "created_at": "",
-}
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
 
+sys.path.insert(0, str(Path(__file__).parents[2]))
 
-if __name__ == "__main__":
-    generated_df = generate_test_data(days=30)
-    generated_df = generated_df.sort_values(by="created_at", ascending=True)
+from app.schemas import Base  # noqa: E402
+from app.utils import create_hash  # noqa: E402
+
+Columns = dict[str, np.ndarray]
+
+# Clients generated with each seeded generator, which keeps the output of a
+# seed independent of memory limits
+CLIENTS_PER_CHUNK = 250
+
+PASSWORD = "password"
+VERSION = "4a2b6dacbd7b39afdf328034b3b58380cd2136a2"
+
+FIRST_NAMES = np.array(
+    ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Jamie", "Riley"]
+    + ["Charlie", "Avery", "Quinn", "Rowan", "Emma", "Noah", "Olivia", "Liam"]
+)
+LAST_NAMES = np.array(
+    ["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson", "Davies"]
+    + ["Patel", "Khan", "Garcia", "Martin", "Nguyen", "Walker", "Rossi", "Kim"]
+)
+GENDERS = np.array(["Female", "Male", "Other"])
+GENDER_WEIGHTS = [0.49, 0.48, 0.03]
+HANDEDNESS = np.array(["right", "left", "ambidextrous"])
+HANDEDNESS_WEIGHTS = [0.88, 0.10, 0.02]
+EDUCATION = np.array(["Secondary", "Undergraduate", "Postgraduate", "Doctorate"])
+OCCUPATIONS = np.array(["Pilot", "Engineer", "Student", "Nurse", "Driver", "Other"])
+
+# Countries, how likely a client is to live there, and their offset from UTC
+# as reported by the app, in minutes behind UTC
+COUNTRIES = np.array(
+    ["United Kingdom", "United States", "Canada", "Germany", "France", "India"]
+    + ["Australia"]
+)
+COUNTRY_WEIGHTS = [0.4, 0.2, 0.1, 0.1, 0.08, 0.07, 0.05]
+MINUTE_OFFSETS = np.array([0, 300, 300, -60, -60, -330, -600])
+
+# Times of day of the tests: how likely, the local hours they start in, and
+# how much slower and more tired than in the morning the client is
+TIMES_OF_DAY = ("morning", "midday", "evening")
+TIME_OF_DAY_WEIGHTS = [0.4, 0.2, 0.4]
+FIRST_HOURS = np.array([6, 12, 17])
+LAST_HOURS = np.array([10, 15, 22])
+SLOWDOWNS = np.array([0.0, 125.0, 215.0])
+LOWEST_FATIGUE = np.array([5, 3, 1])
+HIGHEST_FATIGUE = np.array([7, 5, 4])
+
+# The rounds of a test, in order, after which the rest are machine-paced.
+# Round types are numbered as by the app.
+PHASES = (("training", 0, 3), ("practice", 1, 3), ("self-paced", 3, 4))
+MACHINE_PACED_TYPE = 2
+BLOCK_LENGTH = 5
+# How much slower each machine-paced block is than the next
+BLOCK_STEPS = np.array([1.1, 1.0, 0.92])
+BLOCK_STEP_WEIGHTS = [0.6, 0.25, 0.15]
+
+_HEX = np.array(list("0123456789abcdef"))
+_ID_ALPHABET = np.array(
+    list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+)
+
+
+def uuid4s(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Returns `n` random version 4 UUIDs as strings."""
+    raw = rng.integers(0, 256, (n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    nibbles = np.stack([raw >> 4, raw & 0x0F], axis=-1).reshape(n, 32)
+    chars = np.insert(_HEX[nibbles], [8, 12, 16, 20], "-", axis=1)
+    return np.ascontiguousarray(chars).view("U36").ravel()
+
+
+def concat(*parts: Any) -> np.ndarray:
+    """Concatenates arrays and scalars into strings, element-wise."""
+    result = np.asarray(parts[0], dtype=str)
+    for part in parts[1:]:
+        result = np.char.add(result, np.asarray(part, dtype=str))
+    return result
+
+
+def generate_clients(
+    rng: np.random.Generator, first: int, n: int, end: datetime.date
+) -> Columns:
+    indexes = np.arange(first, first + n)
+    first_names = rng.choice(FIRST_NAMES, n)
+    last_names = rng.choice(LAST_NAMES, n)
+    ages = rng.integers(18 * 365, 80 * 365, n)
+    dates_of_birth = np.datetime64(end) - ages.astype("timedelta64[D]")
+    country = rng.choice(len(COUNTRIES), n, p=COUNTRY_WEIGHTS)
+    ip_octets = rng.integers(1, 255, (4, n)).astype(str)
+    return {
+        "client_id": np.ascontiguousarray(rng.choice(_ID_ALPHABET, (n, 10)))
+        .view("U10")
+        .ravel(),
+        "full_name": concat(first_names, " ", last_names),
+        "email": np.char.lower(
+            concat(first_names, ".", last_names, ".", indexes, "@example.com")
+        ),
+        "date_of_birth": np.datetime_as_string(dates_of_birth),
+        "gender": rng.choice(GENDERS, n, p=GENDER_WEIGHTS),
+        "country": COUNTRIES[country],
+        "education_level": rng.choice(EDUCATION, n),
+        "occupation": rng.choice(OCCUPATIONS, n),
+        "handedness": rng.choice(HANDEDNESS, n, p=HANDEDNESS_WEIGHTS),
+        "login_count": rng.poisson(20, n),
+        "password_hash": np.full(n, create_hash(PASSWORD)),
+        "ip_address": concat(
+            *(np.char.add(o, ".") for o in ip_octets[:3]), ip_octets[3]
+        ),
+        "api_key": uuid4s(rng, n),
+        # Not stored, but shape the client's tests
+        "age": ages / 365,
+        "baseline": rng.normal(1150, 100, n),
+        "minute_offset": MINUTE_OFFSETS[country],
+    }
+
+
+def generate_tests(
+    rng: np.random.Generator,
+    clients: Columns,
+    tests_per_client: float,
+    days: int,
+    end: datetime.date,
+) -> Columns:
+    counts = np.maximum(rng.poisson(tests_per_client, len(clients["client_id"])), 1)
+    client = np.repeat(np.arange(len(counts)), counts)
+    n = len(client)
+
+    time_of_day = rng.choice(len(TIMES_OF_DAY), n, p=TIME_OF_DAY_WEIGHTS)
+    seconds = (
+        rng.integers(0, days, n) * 86400
+        + rng.integers(FIRST_HOURS[time_of_day], LAST_HOURS[time_of_day] + 1) * 3600
+        + rng.integers(0, 3600, n)
+    )
+    offsets = clients["minute_offset"][client]
+    local = np.datetime64(end - datetime.timedelta(days=days - 1), "ms") + (
+        seconds * 1000 + rng.integers(0, 1000, n)
+    ).astype("timedelta64[ms]")
+    utc = local + (offsets * 60_000).astype("timedelta64[ms]")
 
-    output_filename = "generated_cogspeed_test_data.csv"
-    generated_df.to_csv(output_filename, index=False)
+    # Each client's tests in date order, as the app uploads them
+    order = np.lexsort((utc, client))
+    client, time_of_day, offsets, local, utc = (
+        a[order] for a in (client, time_of_day, offsets, local, utc)
+    )
+    brd = (
+        clients["baseline"][client]
+        + 3 * (clients["age"][client] - 40)
+        + SLOWDOWNS[time_of_day]
+        + rng.normal(0, 60, n)
+    )
+    local_times = pd.DatetimeIndex(local)
+    created_at = pd.DatetimeIndex(utc + rng.integers(100, 5000, n).astype("m8[ms]"))
+    return {
+        "id": uuid4s(rng, n),
+        "client_id": clients["client_id"][client],
+        "status_code": np.zeros(n, dtype=np.int64),
+        "status": np.full(n, "success"),
+        "success": np.ones(n, dtype=bool),
+        "message": np.full(n, "Test completed successfully"),
+        "version": np.full(n, VERSION),
+        "blocking_round_duration": np.rint(brd).astype(np.int64),
+        "cognitive_processing_index": np.clip(
+            np.rint(100 - (brd - 800) / 29), 0, 100
+        ).astype(np.int64),
+        "fatigue_level": rng.integers(
+            LOWEST_FATIGUE[time_of_day], HIGHEST_FATIGUE[time_of_day] + 1
+        ),
+        "date": np.char.add(np.datetime_as_string(utc, unit="ms"), "Z"),
+        "date_minute_offset": offsets,
+        "normalized_location": clients["country"][client],
+        "local_date": local_times.strftime("%d/%m/%Y").to_numpy(str),
+        "local_time": local_times.strftime("%H:%M:%S").to_numpy(str),
+        "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S.%f").to_numpy(str),
+        # Not stored
+        "client": client,
+        "epoch": utc.astype(np.int64).astype(np.float64),
+    }
 
-    print(f"Successfully generated {len(generated_df)} test records.")
-    print(f"Data saved to '{output_filename}'")
+
+def generate_rounds(rng: np.random.Generator, tests: Columns, rounds: int) -> Columns:
+    """Generates the rounds of the tests as (tests, rounds) arrays and adds the
+    results derived from them to `tests`. Returns the rounds, flattened.
+    """
+    n = len(tests["id"])
+    phases = sum(length for _, _, length in PHASES)
+    paced_rounds = rounds - phases
+    if paced_rounds < BLOCK_LENGTH:
+        raise ValueError(f"Tests need at least {phases + BLOCK_LENGTH} rounds")
+
+    round_type_normalized = np.array(
+        [name for name, _, length in PHASES for _ in range(length)]
+        + ["machine-paced"] * paced_rounds
+    )
+    round_type = np.array(
+        [number for _, number, length in PHASES for _ in range(length)]
+        + [MACHINE_PACED_TYPE] * paced_rounds
+    )
+    paced = round_type == MACHINE_PACED_TYPE
+    self_paced = round_type_normalized == "self-paced"
+
+    # Block durations slow down from the last block, which is the test's
+    # blocking round duration, to the first
+    blocks = -(-paced_rounds // BLOCK_LENGTH)
+    steps = rng.choice(BLOCK_STEPS, (n, blocks - 1), p=BLOCK_STEP_WEIGHTS)
+    slower = np.cumprod(steps[:, ::-1], axis=1)[:, ::-1]
+    block_durations = tests["blocking_round_duration"][:, None] * np.column_stack(
+        [slower, np.ones(n)]
+    )
+    duration = np.full((n, rounds), -1.0)
+    duration[:, paced] = np.repeat(block_durations, BLOCK_LENGTH, axis=1)[
+        :, :paced_rounds
+    ]
+
+    # Machine-paced rounds answered too slowly time out
+    response = np.where(
+        paced,
+        duration * rng.lognormal(np.log(0.8), 0.15, (n, rounds)),
+        rng.lognormal(np.log(1100), 0.25, (n, rounds)),
+    )
+    no_response = paced & (response > duration)
+    correct = ~no_response & (rng.random((n, rounds)) < np.where(paced, 0.95, 0.9))
+    status = np.select(
+        [no_response, correct], ["no response", "correct"], default="incorrect"
+    )
+    time_taken = np.where(no_response, duration, response)
+
+    answer_location = rng.integers(1, 10, (n, rounds))
+    wrong_location = (answer_location + rng.integers(0, 8, (n, rounds))) % 9 + 1
+    location_clicked = np.where(
+        no_response,
+        None,
+        np.where(correct, answer_location, wrong_location).astype(object),
+    )
+    query_number = concat(
+        rng.integers(1, 10, (n, rounds)), rng.choice(["num", "dot"], (n, rounds))
+    )
+    from_previous = np.full((n, rounds), None, dtype=object)
+    from_previous[:, 1:] = np.where(status[:, :-1] == "correct", "correct", "incorrect")
+
+    # Ratios of the machine-paced rounds, and their rolling mean over a block
+    ratio = np.where(paced, time_taken / np.abs(duration), 0.0)
+    sums = np.cumsum(np.where(paced, ratio, 0), axis=1)
+    counts = np.cumsum(np.broadcast_to(paced, (n, rounds)), axis=1)
+    window_sums = sums.copy()
+    window_sums[:, BLOCK_LENGTH:] -= sums[:, :-BLOCK_LENGTH]
+    window_counts = counts.copy()
+    window_counts[:, BLOCK_LENGTH:] -= counts[:, :-BLOCK_LENGTH]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rolling_mean = window_sums / window_counts
+    correct_rolling_mean_ratio = np.where(
+        paced, np.char.mod("%.6f", rolling_mean), "n/a"
+    )
+
+    gaps = rng.uniform(200, 600, (n, rounds))
+    time_epoch = tests["epoch"][:, None] + np.cumsum(time_taken + gaps, axis=1)
+
+    answered = paced & ~no_response
+    paced_correct = paced & correct
+    self_paced_time = np.where(self_paced, time_taken, 0).sum(1) / self_paced.sum()
+    tests |= {
+        "test_duration": np.rint(time_epoch[:, -1] - tests["epoch"]).astype(np.int64),
+        "number_of_rounds": np.full(n, rounds),
+        "machine_paced_baseline": self_paced_time * 1.8,
+        "number_of_roll_mean_limit_exceedences": (paced & (rolling_mean > 1.0)).sum(1),
+        "final_ratio": rolling_mean[:, -1],
+        "block_count": 1 + (steps != 1.0).sum(1),
+        "lowest_block_time": block_durations.min(1),
+        "highest_block_time": block_durations.max(1),
+        "block_range": np.rint(np.ptp(block_durations, axis=1)).astype(np.int64),
+        "final_block_diff": np.rint(
+            np.abs(block_durations[:, -2] - block_durations[:, -1])
+        ).astype(np.int64),
+        "total_machine_paced_answers": np.full(n, paced_rounds),
+        "total_machine_paced_correct_answers": paced_correct.sum(1),
+        "total_machine_paced_incorrect_answers": (answered & ~correct).sum(1),
+        "total_machine_paced_no_response_answers": no_response.sum(1),
+        "quickest_response": masked(time_taken, answered, "min"),
+        "quickest_correct_response": masked(time_taken, paced_correct, "min"),
+        "slowest_response": masked(time_taken, answered, "max"),
+        "slowest_correct_response": masked(time_taken, paced_correct, "max"),
+        "mean_machine_paced_answer_time": masked(time_taken, answered, "mean"),
+        "mean_correct_machine_paced_answer_time": masked(
+            time_taken, paced_correct, "mean"
+        ),
+    }
+
+    return {
+        "client_id": np.repeat(tests["client_id"], rounds),
+        "test_id": np.repeat(tests["id"], rounds),
+        "round_number": np.tile(np.arange(1, rounds + 1), n),
+        "status": status.ravel(),
+        "round_type_normalized": np.tile(round_type_normalized, n),
+        "answer_location": answer_location.ravel(),
+        "location_clicked": location_clicked.ravel(),
+        "query_number": query_number.ravel(),
+        "duration": duration.ravel(),
+        "correct_rolling_mean_ratio": correct_rolling_mean_ratio.ravel(),
+        "round_type": np.tile(round_type, n),
+        "time_taken": time_taken.ravel(),
+        "is_correct_or_incorrect_from_previous": from_previous.ravel(),
+        "ratio": ratio.ravel(),
+        "id": uuid4s(rng, n * rounds),
+        "time_epoch": time_epoch.ravel(),
+        "created_at": np.repeat(tests["created_at"], rounds),
+    }
+
+
+def masked(
+    values: np.ndarray, mask: np.ndarray, reduce: Literal["min", "max", "mean"]
+) -> np.ndarray:
+    """Reduces the values of each row where `mask` is set, 0 for none."""
+    count = mask.sum(1)
+    if reduce == "min":
+        reduced = np.where(mask, values, np.inf).min(1)
+    elif reduce == "max":
+        reduced = np.where(mask, values, -np.inf).max(1)
+    else:
+        with np.errstate(invalid="ignore"):
+            reduced = np.where(mask, values, 0).sum(1) / count
+    return np.where(count > 0, reduced, 0.0)
+
+
+def insert(conn: sqlite3.Connection, table: str, columns: Columns) -> None:
+    """Inserts the columns into the table's columns of the same name."""
+    names = [c.name for c in Base.metadata.tables[table].columns if c.name in columns]
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(names)}) "
+        f"VALUES ({', '.join('?' * len(names))})",
+        zip(*(columns[name].tolist() for name in names)),
+    )
+
+
+def create_database(
+    path: Path,
+    clients: int,
+    tests_per_client: float,
+    days: int,
+    rounds: int,
+    seed: int,
+    end: datetime.date,
+) -> dict[str, int]:
+    """Creates the database and returns the number of rows of each table."""
+    dialect = sqlite.dialect()
+    totals = dict.fromkeys(
+        ["clients", "cogspeed_test_results", "cogspeed_test_rounds"], 0
+    )
+    with closing(sqlite3.connect(path, isolation_level=None)) as conn:
+        # Nothing needs to survive a crash of the load
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+        conn.execute("PRAGMA cache_size=-1048576")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        for table in Base.metadata.sorted_tables:
+            conn.execute(str(CreateTable(table).compile(dialect=dialect)))
+
+        for chunk, first in enumerate(range(0, clients, CLIENTS_PER_CHUNK)):
+            rng = np.random.default_rng([seed, chunk])
+            n = min(CLIENTS_PER_CHUNK, clients - first)
+            client_columns = generate_clients(rng, first, n, end)
+            tests = generate_tests(rng, client_columns, tests_per_client, days, end)
+            round_columns = generate_rounds(rng, tests, rounds)
+            # Clients signed up at their first test and last logged in at their
+            # last, and every client has at least one
+            clients_index = np.arange(n)
+            first_test = np.searchsorted(tests["client"], clients_index)
+            last_test = np.searchsorted(tests["client"], clients_index, "right") - 1
+            client_columns["created_at"] = tests["created_at"][first_test]
+            client_columns["last_login"] = tests["created_at"][last_test]
+
+            conn.execute("BEGIN")
+            insert(conn, "clients", client_columns)
+            insert(conn, "cogspeed_test_results", tests)
+            insert(conn, "cogspeed_test_rounds", round_columns)
+            conn.execute("COMMIT")
+            totals["clients"] += n
+            totals["cogspeed_test_results"] += len(tests["id"])
+            totals["cogspeed_test_rounds"] += len(round_columns["id"])
+
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(str(CreateIndex(index).compile(dialect=dialect)))
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA journal_mode=WAL")
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path, help="The SQLite file to create")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument(
+        "--tests-per-client", type=float, default=50, help="The mean per client"
+    )
+    parser.add_argument("--days", type=int, default=365, help="The days tested over")
+    parser.add_argument("--rounds", type=int, default=40, help="The rounds per test")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--end",
+        type=datetime.date.fromisoformat,
+        default=datetime.date(2025, 12, 31),
+        help="The last day tested on",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Replace the output if it exists"
+    )
+    args = parser.parse_args()
+
+    if args.output.exists():
+        if not args.force:
+            parser.error(f"{args.output} exists, pass --force to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{args.output}{suffix}").unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    totals = create_database(
+        args.output,
+        args.clients,
+        args.tests_per_client,
+        args.days,
+        args.rounds,
+        args.seed,
+        args.end,
+    )
+    elapsed = time.perf_counter() - start
+    print(", ".join(f"{count:,} {table}" for table, count in totals.items()))
+    print(f"Created {args.output} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Loads query results into DataFrames column by column.
+
+`pd.DataFrame(cursor.fetchall())` keeps a Python tuple per row and a Python
+object per value alive until the frame is built, which for years of tests, or
+every client's tests in the admin view, is millions of objects. `read_frame`
+instead fetches `chunk_size` rows at a time and appends each chunk to Arrow
+column buffers, so only one chunk of Python objects exists at a time.
+
+The frame is built from the Arrow table without copying: numeric columns
+without nulls are NumPy views of the Arrow buffers, and strings stay in Arrow
+as `string[pyarrow]` rather than becoming Python objects. Without pyarrow,
+columns are gathered into NumPy arrays instead.
+"""
+
+import sqlite3
+from typing import Any, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None  # type: ignore
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _arrow_frame(cursor: sqlite3.Cursor, chunk_size: int) -> pd.DataFrame:
+    names = [column[0] for column in cursor.description]
+    tables = []
+    while rows := cursor.fetchmany(chunk_size):
+        columns = [pa.array(column) for column in zip(*rows)]
+        tables.append(pa.Table.from_arrays(columns, names=names))
+        del rows, columns
+
+    if not tables:
+        return pd.DataFrame(columns=names)
+    # Chunks whose values are all null, or ints then floats, are promoted to the
+    # type of the others
+    table = pa.concat_tables(tables, promote_options="permissive")
+    return table.to_pandas(
+        split_blocks=True,
+        self_destruct=True,
+        types_mapper=lambda t: pd.ArrowDtype(t) if pa.types.is_string(t) else None,
+    )
+
+
+def _numpy_frame(cursor: sqlite3.Cursor, chunk_size: int) -> pd.DataFrame:
+    names = [column[0] for column in cursor.description]
+    chunks: list[list[np.ndarray]] = [[] for _ in names]
+    while rows := cursor.fetchmany(chunk_size):
+        for chunk, column in zip(chunks, zip(*rows)):
+            chunk.append(np.array(column))
+        del rows
+
+    columns = {}
+    for name, chunk in zip(names, chunks):
+        column = np.concatenate(chunk) if chunk else np.array([])
+        if column.dtype == object:
+            # Numbers with nulls, which NumPy cannot infer
+            try:
+                column = pd.to_numeric(column)
+            except (TypeError, ValueError):
+                pass
+        columns[name] = column
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_frame(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: Sequence[Any] = (),
+    chunk_size: int = CHUNK_SIZE,
+) -> pd.DataFrame:
+    """Runs a query and returns its results as a DataFrame, `chunk_size` rows
+    at a time.
+    """
+    cursor = conn.execute(sql, params)
+    try:
+        if pa is not None:
+            return _arrow_frame(cursor, chunk_size)
+        return _numpy_frame(cursor, chunk_size)
+    finally:
+        cursor.close()
@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Sequence, TypeVar
+
+import streamlit as st
+
+DATABASE_PATH = "/data/db.sqlite"
+
+T = TypeVar("T")
+
+
+class Database:
+    """A read-only connection shared by every session, with results cached until
+    the database changes.
+
+    Streamlit reruns the script on every interaction. Results are cached until
+    `PRAGMA data_version` changes, which happens when another connection, i.e.
+    the API, commits, so a rerun costs no database work unless new data arrived.
+    Cached results are shared between sessions and must not be modified.
+    """
+
+    def __init__(self, path: str, max_entries: int = 256) -> None:
+        self._connection = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._version: int | None = None
+        self._results: OrderedDict[Hashable, Any] = OrderedDict()
+        self.max_entries = max_entries
+
+    def _check_version(self) -> None:
+        (version,) = self._connection.execute("PRAGMA data_version").fetchone()
+        if version != self._version:
+            self._results.clear()
+            self._version = version
+
+    def cached(self, key: Hashable, load: Callable[[sqlite3.Connection], T]) -> T:
+        """Returns `load(connection)`, cached under `key` until the data changes."""
+        with self._lock:
+            self._check_version()
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+            result = self._results[key] = load(self._connection)
+            if len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+            return result
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> list[tuple]:
+        params = tuple(params)
+        return self.cached(
+            ("query", sql, params),
+            lambda connection: connection.execute(sql, params).fetchall(),
+        )
+
+    def query_one(self, sql: str, params: Sequence[Any] = ()) -> tuple | None:
+        rows = self.query(sql, params)
+        return rows[0] if rows else None
+
+    def execute_one(self, sql: str, params: Sequence[Any] = ()) -> tuple | None:
+        """Runs a query without caching it, e.g. to check credentials."""
+        with self._lock:
+            return self._connection.execute(sql, params).fetchone()
+
+
+@st.cache_resource
+def get_database() -> Database:
+    return Database(DATABASE_PATH)
@@ -1,21 +1,16 @@
 # pyright: basic
 
 import os
+import sqlite3
 from typing import Literal
 
 import altair as alt
 import pandas as pd
 import streamlit as st
+from columnar import read_frame
+from db import get_database
 from streamlit_option_menu import option_menu
-from utils import create_hash, format_string, mean_ci
-
-
-def open_db():
-    """Open the SQLite database."""
-    import sqlite3
-
-    conn = sqlite3.connect("/data/db.sqlite")
-    return conn
+from utils import create_hash, downsample, format_string, mean_ci, summary_mean_ci
 
 
 st.set_page_config(page_title="Cogspeed Visualisation", layout="wide", page_icon="⚙️")
@@ -49,14 +44,14 @@ def authenticate_client() -> str:
         st.stop()
 
     if password == os.environ["SQLITE_WEB_PASSWORD"]:
-        client = connection.execute(
+        client = database.execute_one(
             "SELECT full_name, client_id FROM clients WHERE email=?", (email,)
-        ).fetchone()
+        )
     else:
-        client = connection.execute(
+        client = database.execute_one(
             "SELECT full_name, client_id FROM clients WHERE email=? AND password_hash=?",
             (email, password_hash),
-        ).fetchone()
+        )
 
     if not client:
         st.warning("Invalid email or password")
@@ -65,30 +60,57 @@ def authenticate_client() -> str:
     return client[1]
 
 
-def generate_admin_client_chart(
-    key: Literal["gender", "age", "country", "handedness"],
-) -> None:
-    if key == "age":
-        clients_data = connection.execute(
-            "SELECT date_of_birth FROM clients"
-        ).fetchall()
-        dates_of_birth = pd.to_datetime([client[0] for client in clients_data])
-        ages = [
-            max((pd.Timestamp.now() - dob).days // 365, 13) for dob in dates_of_birth
-        ]
-        data_series = pd.Series(ages, name="Age")
+DemographicKey = Literal["gender", "age", "country", "handedness"]
+
+# Counts the clients by each demographic in one round trip. Ages are whole
+# years, at least 13.
+DEMOGRAPHICS_QUERY = """
+SELECT 'gender', gender, count(*) FROM clients
+WHERE gender IS NOT NULL GROUP BY gender
+UNION ALL
+SELECT 'country', country, count(*) FROM clients
+WHERE country IS NOT NULL GROUP BY country
+UNION ALL
+SELECT 'handedness', handedness, count(*) FROM clients
+WHERE handedness IS NOT NULL GROUP BY handedness
+UNION ALL
+SELECT 'age', age, count(*) FROM (
+    SELECT max(
+        CAST(julianday('now') - julianday(date_of_birth) AS INTEGER) / 365, 13
+    ) AS age
+    FROM clients
+    WHERE date_of_birth IS NOT NULL
+)
+GROUP BY age
+"""
+
+
+def load_demographics() -> dict[str, pd.DataFrame]:
+    """Returns the number of clients by each demographic value."""
+
+    def load(conn: sqlite3.Connection) -> dict[str, pd.DataFrame]:
+        counts = pd.DataFrame(
+            conn.execute(DEMOGRAPHICS_QUERY).fetchall(),
+            columns=["Key", "Value", "Count"],
+        )
+        demographics = {}
+        for key in ("gender", "age", "country", "handedness"):
+            df = counts[counts["Key"] == key][["Value", "Count"]]
+            if key == "age":
+                df = df.astype({"Value": int}).sort_values(by="Value")
+            else:
+                df = df.sort_values(by="Count", ascending=False, kind="stable")
+            df.columns = [key.capitalize(), "Count"]
+            demographics[key] = df.reset_index(drop=True)
+        return demographics
 
-    else:
-        assert key in ("gender", "country", "handedness"), "Preventing SQL injection"
-        clients_data = connection.execute(f"SELECT {key} FROM clients").fetchall()
-        data = [client[0] for client in clients_data]
-        data_series = pd.Series(data, name=key.capitalize())
+    return database.cached(("demographics",), load)
 
-    aggregated_df = data_series.value_counts().reset_index()
-    aggregated_df.columns = [key.capitalize(), "Count"]
 
-    if key == "age":
-        aggregated_df = aggregated_df.sort_values(by="Age").reset_index(drop=True)
+def generate_admin_client_chart(
+    demographics: dict[str, pd.DataFrame], key: DemographicKey
+) -> None:
+    aggregated_df = demographics[key]
 
     tab1, tab2 = st.tabs(["Chart", "Dataframe"])
     with tab1:
@@ -102,69 +124,231 @@ def generate_admin_client_chart(
         st.dataframe(aggregated_df)
 
 
+# Long series are downsampled to about one point per pixel of a wide chart
+MAX_CHART_POINTS = 1000
+
+# The metrics charted in the client view
+CLIENT_METRICS = (
+    "blocking_round_duration",
+    "test_duration",
+    "number_of_rounds",
+    "fatigue_level",
+)
+
+
+def load_client_tests(client_id: str) -> pd.DataFrame:
+    """Fetches every column the client view needs in one query. The result is
+    shared between reruns and sessions, so charts must not modify it.
+    """
+
+    def load(conn: sqlite3.Connection) -> pd.DataFrame:
+        tests = read_frame(
+            conn,
+            f"SELECT id, date, {', '.join(CLIENT_METRICS)} FROM cogspeed_test_results "
+            "WHERE client_id = ? ORDER BY date",
+            (client_id,),
+        )
+        tests.insert(
+            0,
+            "Test Date",
+            pd.to_datetime(
+                tests.pop("date"), utc=True, format="ISO8601", errors="coerce"
+            ),
+        )
+        return tests
+
+    return database.cached(("client_tests", client_id), load)
+
+
 def generate_cogspeed_test_results_chart(
-    client_id: str,
+    tests: pd.DataFrame,
     key: Literal[
         "blocking_round_duration", "test_duration", "number_of_rounds", "fatigue_level"
     ],
 ) -> None:
-    assert key in (
-        "blocking_round_duration",
-        "test_duration",
-        "number_of_rounds",
-        "fatigue_level",
-    ), "Preventing SQL injection"
-    cogspeed_results = connection.execute(
-        f"SELECT date, {key} FROM cogspeed_test_results WHERE client_id = ?",
-        (client_id,),
-    ).fetchall()
-
-    if not cogspeed_results:
+    if tests.empty:
         st.warning("No Cogspeed test results found.")
         st.stop()
 
     keyf = format_string(key)
-    cogspeed_df = pd.DataFrame(cogspeed_results, columns=["Test Date", keyf])
-    cogspeed_df["Test Date"] = pd.to_datetime(cogspeed_df["Test Date"])
-    cogspeed_df.set_index("Test Date", inplace=True)
+    cogspeed_df = tests.set_index("Test Date")[[key]].rename(columns={key: keyf})
+
+    chart_df = downsample(
+        cogspeed_df.reset_index(), "Test Date", keyf, MAX_CHART_POINTS
+    ).set_index("Test Date")
 
     tab1, tab2 = st.tabs(["Chart", "Dataframe"])
-    tab1.scatter_chart(cogspeed_df[keyf], x_label="Date", y_label=keyf)
+    tab1.scatter_chart(chart_df[keyf], x_label="Date", y_label=keyf)
     tab2.dataframe(cogspeed_df)
 
 
-def generate_time_of_day_chart(client_id: str) -> None:
+# The columns of the rounds charted in the drill-down
+ROUND_COLUMNS = (
+    "test_id",
+    "round_number",
+    "status",
+    "round_type_normalized",
+    "duration",
+    "correct_rolling_mean_ratio",
+    "time_taken",
+)
+
+
+def load_test_rounds(client_id: str, test_ids: tuple[str, ...]) -> pd.DataFrame:
+    """Fetches the rounds of the selected tests in one query on the primary key
+    of the rounds. Rounds packed into blobs or archived by the API are not
+    read here, see `GET /clients/cogspeed/analytics/rounds`.
+    """
+
+    def load(conn: sqlite3.Connection) -> pd.DataFrame:
+        rounds = read_frame(
+            conn,
+            f"SELECT {', '.join(ROUND_COLUMNS)} FROM cogspeed_test_rounds "
+            f"WHERE client_id = ? AND test_id IN ({', '.join('?' * len(test_ids))}) "
+            "ORDER BY test_id, round_number",
+            (client_id, *test_ids),
+        )
+        rounds["correct_rolling_mean_ratio"] = pd.to_numeric(
+            rounds["correct_rolling_mean_ratio"], errors="coerce"
+        )
+        return rounds
+
+    return database.cached(("test_rounds", client_id, test_ids), load)
+
+
+def block_transitions(rounds: pd.DataFrame) -> pd.DataFrame:
+    """Returns the machine-paced rounds whose duration differs from the
+    previous machine-paced round of the same test.
+    """
+    paced = rounds[
+        (rounds["round_type_normalized"] == "machine-paced") & (rounds["duration"] > 0)
+    ]
+    previous = paced.groupby("test_id")["duration"].shift()
+    changed = previous.notna() & (paced["duration"] != previous)
+    return pd.DataFrame(
+        {
+            "Test": paced.loc[changed, "Test"],
+            "Round": paced.loc[changed, "round_number"],
+            "From (ms)": previous[changed],
+            "To (ms)": paced.loc[changed, "duration"],
+        }
+    )
+
+
+def generate_rounds_drilldown(client_id: str, tests: pd.DataFrame) -> None:
+    """Charts the rounds of the selected tests side by side: response times,
+    rolling mean ratios, statuses and block transitions.
+    """
+    labels = pd.Series(
+        tests["Test Date"].dt.strftime("%Y-%m-%d %H:%M").fillna("Unknown date").array,
+        index=tests["id"].array,
+    )
+    selected = st.multiselect(
+        "Tests",
+        labels.index[::-1],
+        default=labels.index[-1:],
+        format_func=labels.get,
+    )
+    if not selected:
+        return
+
+    rounds = load_test_rounds(client_id, tuple(selected)).copy()
+    if missing := set(selected) - set(rounds["test_id"]):
+        st.info(
+            f"{len(missing)} of the selected tests have their rounds packed or "
+            "archived, which only the API reads."
+        )
+    if rounds.empty:
+        return
+    rounds["Test"] = rounds["test_id"].map(labels)
+
+    def line(column: str, title: str) -> alt.Chart:
+        return (
+            alt.Chart(rounds.dropna(subset=[column]))
+            .mark_line(point=True)
+            .encode(
+                x=alt.X("round_number:Q", title="Round"),
+                y=alt.Y(f"{column}:Q", title=title),
+                color="Test:N",
+                tooltip=["Test:N", "round_number:Q", "status:N", f"{column}:Q"],
+            )
+        )
+
+    statuses = rounds.groupby(["Test", "status"]).size().rename("Rounds").reset_index()
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["Response Times", "Rolling Mean Ratio", "Statuses", "Block Transitions"]
+    )
+    tab1.altair_chart(line("time_taken", "Time Taken (ms)"), use_container_width=True)
+    tab2.altair_chart(
+        line("correct_rolling_mean_ratio", "Rolling Mean Ratio"),
+        use_container_width=True,
+    )
+    tab3.altair_chart(
+        alt.Chart(statuses)
+        .mark_bar()
+        .encode(x="Rounds:Q", y="Test:N", color="status:N", tooltip=list(statuses)),
+        use_container_width=True,
+    )
+    tab4.dataframe(block_transitions(rounds), hide_index=True)
+
+
+def time_of_day_mean_ci(
+    client_id: str, bucket: Literal["morning", "evening"], series: pd.Series
+):
+    """Reads the BRD mean and confidence interval from the summary table kept up
+    to date by the API, falling back to the test rows before it is backfilled.
+    """
+    try:
+        summary = database.query_one(
+            "SELECT count, mean, m2 FROM client_cogspeed_summary WHERE client_id=? "
+            "AND metric='blocking_round_duration' AND bucket=?",
+            (client_id, bucket),
+        )
+    except sqlite3.OperationalError:
+        summary = None
+
+    if summary is None or summary[0] != len(series):
+        return mean_ci(series)
+    return summary_mean_ci(*summary)
+
+
+def generate_time_of_day_chart(client_id: str, tests: pd.DataFrame) -> None:
     """Plots 2 datasets on the same graph, results (blocking round duration)
     in the morning and results in the evening.
     """
-    morning_results = connection.execute(
-        "SELECT date, blocking_round_duration FROM cogspeed_test_results WHERE "
-        "strftime('%H', date) BETWEEN '06' AND '11' AND client_id=?",
-        (client_id,),
-    ).fetchall()
-    evening_results = connection.execute(
-        "SELECT date, blocking_round_duration FROM cogspeed_test_results WHERE "
-        "strftime('%H', date) BETWEEN '17' AND '22' AND client_id=?",
-        (client_id,),
-    ).fetchall()
-
-    if not morning_results or not evening_results:
+    hours = tests["Test Date"].dt.hour
+    morning = tests[hours.between(6, 11)]
+    evening = tests[hours.between(17, 22)]
+
+    if morning.empty or evening.empty:
         st.warning("No Cogspeed test results found for the specified time periods.")
         st.stop()
 
-    morning_df = pd.DataFrame(morning_results, columns=["Test Date", "Morning BRD"])
-    evening_df = pd.DataFrame(evening_results, columns=["Test Date", "Evening BRD"])
-
-    morning_df["Morning BRD"] = morning_df["Morning BRD"].round(3)
-    evening_df["Evening BRD"] = evening_df["Evening BRD"].round(3)
-
-    morning_df["Test Date"] = pd.to_datetime(morning_df["Test Date"])
-    evening_df["Test Date"] = pd.to_datetime(evening_df["Test Date"])
+    morning_df = pd.DataFrame(
+        {
+            "Test Date": morning["Test Date"],
+            "Morning BRD": morning["blocking_round_duration"].round(3),
+        }
+    )
+    evening_df = pd.DataFrame(
+        {
+            "Test Date": evening["Test Date"],
+            "Evening BRD": evening["blocking_round_duration"].round(3),
+        }
+    )
 
     combined_df = pd.merge(morning_df, evening_df, on="Test Date", how="outer")
+    chart_df = pd.concat(
+        [
+            downsample(morning_df, "Test Date", "Morning BRD", MAX_CHART_POINTS),
+            downsample(evening_df, "Test Date", "Evening BRD", MAX_CHART_POINTS),
+        ]
+    )
 
     chart = (
-        alt.Chart(combined_df.melt("Test Date", var_name="Period", value_name="BRD"))
+        alt.Chart(
+            chart_df.melt("Test Date", var_name="Period", value_name="BRD").dropna()
+        )
         .mark_line(point=True)
         .encode(
             x="Test Date:T",
@@ -182,8 +366,12 @@ def generate_time_of_day_chart(client_id: str) -> None:
     with tab1:
         st.altair_chart(chart, use_container_width=True)
     with tab2:
-        morning_mean, morning_ci = mean_ci(morning_df["Morning BRD"])
-        evening_mean, evening_ci = mean_ci(evening_df["Evening BRD"])
+        morning_mean, morning_ci = time_of_day_mean_ci(
+            client_id, "morning", morning_df["Morning BRD"]
+        )
+        evening_mean, evening_ci = time_of_day_mean_ci(
+            client_id, "evening", evening_df["Evening BRD"]
+        )
 
         st.write(
             f"**Morning Mean Blocking Round Duration:** {morning_mean} milliseconds"
@@ -229,7 +417,7 @@ def generate_time_of_day_chart(client_id: str) -> None:
         st.dataframe(combined_df)
 
 
-connection = open_db()
+database = get_database()
 
 with st.sidebar:
     selected = option_menu(
@@ -255,17 +443,22 @@ if selected == "Home":
         c3.write("Number of Rounds")
         c4.write("Fatigue Level")
 
+    tests = load_client_tests(client_id)
+
     with c1:
-        generate_cogspeed_test_results_chart(client_id, key="blocking_round_duration")
+        generate_cogspeed_test_results_chart(tests, key="blocking_round_duration")
     with c2:
-        generate_cogspeed_test_results_chart(client_id, key="test_duration")
+        generate_cogspeed_test_results_chart(tests, key="test_duration")
     with c3:
-        generate_cogspeed_test_results_chart(client_id, key="number_of_rounds")
+        generate_cogspeed_test_results_chart(tests, key="number_of_rounds")
     with c4:
-        generate_cogspeed_test_results_chart(client_id, key="fatigue_level")
+        generate_cogspeed_test_results_chart(tests, key="fatigue_level")
+
+    st.subheader("Rounds")
+    generate_rounds_drilldown(client_id, tests)
 
     # Create graph for time of day
-    generate_time_of_day_chart(client_id)
+    generate_time_of_day_chart(client_id, tests)
 
 
 if selected == "Admin":
@@ -284,14 +477,16 @@ if selected == "Admin":
         c3.write("Country Distribution")
         c4.write("Handedness Distribution")
 
+    demographics = load_demographics()
+
     with c1:
-        generate_admin_client_chart(key="gender")
+        generate_admin_client_chart(demographics, key="gender")
     with c2:
-        generate_admin_client_chart(key="age")
+        generate_admin_client_chart(demographics, key="age")
     with c3:
-        generate_admin_client_chart(key="country")
+        generate_admin_client_chart(demographics, key="country")
     with c4:
-        generate_admin_client_chart(key="handedness")
+        generate_admin_client_chart(demographics, key="handedness")
 
-    clients = connection.execute("SELECT full_name, client_id FROM clients").fetchall()
+    clients = database.query("SELECT full_name, client_id FROM clients")
     client_name = st.selectbox("View all clients", [client[0] for client in clients])
@@ -1,6 +1,7 @@
 import hashlib
 from math import trunc
 
+import numpy as np
 import pandas as pd
 import scipy.stats as st
 
@@ -20,3 +21,55 @@ def mean_ci(series: pd.Series, confidence: float = 0.95):
     sem = series.std(ddof=1) / (n**0.5)
     h = sem * st.t.ppf((1 + confidence) / 2, n - 1)
     return trunc(mean), trunc(h)
+
+
+def summary_mean_ci(count: int, mean: float, m2: float, confidence: float = 0.95):
+    """Like `mean_ci`, from the running statistics in `client_cogspeed_summary`."""
+    if count < 2:
+        return trunc(mean), 0
+    sem = (m2 / (count - 1)) ** 0.5 / (count**0.5)
+    h = sem * st.t.ppf((1 + confidence) / 2, count - 1)
+    return trunc(mean), trunc(h)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Returns the indexes of `threshold` points which preserve the shape of a
+    line, chosen by largest-triangle-three-buckets. The same algorithm as
+    `lttb` in app/analytics.py, which the dashboard cannot import.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.intp) + 1
+    edges = np.append(edges, n)
+    indexes = np.empty(threshold, dtype=np.intp)
+    indexes[0], indexes[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_x = x[end : edges[i + 2]].mean()
+        next_y = y[end : edges[i + 2]]
+        next_y = next_y[~np.isnan(next_y)]
+        next_y = next_y.mean() if len(next_y) else y[a]
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        indexes[i + 1] = a
+    return indexes
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int) -> pd.DataFrame:
+    """Keeps the rows of at most `max_points` points of the line of `y` over
+    the dates in `x`, so long series stay quick to draw.
+    """
+    if len(df) <= max_points:
+        return df
+    df = df.dropna(subset=[x]).sort_values(x)
+    dates = df[x].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    return df.iloc[lttb(dates, df[y].to_numpy(dtype=np.float64), max_points)]